@@ -0,0 +1,253 @@
+"""
+Batch rendering of a directory of IR dumps (--from-ir-dir), e.g. one
+`--dump-ir` file per fleet host, in a single invocation:
+
+    <ir_dir>/node-a.json  ->  <output_dir>/node-a/numa_0.pdf, numa_1.pdf, ...
+
+IR files in per-host subdirectories (<ir_dir>/node-a/*.json, as collected
+by run_job_pod.sh) are found too and named after their directory.
+
+Hosts are rendered by worker processes. The parent parses pci.ids and
+loads the name cache once before forking, so every worker starts with
+warm vendor/device/class names; names a worker resolves are sent back and
+merged into the parent's cache. Each host gets its own
+SystemIdentifierResolver built from its IR (the raw captures of
+--collect-only, or the GPU indices and NVLink data of a full dump),
+without probing the local system.
+
+With dedup, every host is first fingerprinted (see topology_fingerprint;
+unfiltered dumps are read into a TopologyTable, not PcieNode trees) and
+only one representative host per distinct topology is rendered, into
+<output_dir>/topologies/<fingerprint>/. The host -> fingerprint index,
+with each host's overrides (BDFs, link state, netdev names, ...), is
+written to <output_dir>/fingerprints.json.
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from device_resolver import get_device_resolver
+from ir_io import IR_EXTENSIONS, load_ir_sections, load_ir_table_sections
+from pcie_node import PcieNode
+from system_identifiers import SystemIdentifierResolver
+from topology_fingerprint import build_fingerprint_index, fingerprint_forest, fingerprint_table, group_by_fingerprint
+
+
+FINGERPRINT_INDEX_NAME = "fingerprints.json"
+
+
+class HostResult:
+    def __init__(self, host: str, path: str):
+        self.host = host
+        self.path = path
+        self.graphs: List[str] = []  # Names of the rendered graphs, e.g. ["numa_0", "numa_1"]
+        self.error: Optional[str] = None
+        self.names: Dict[str, List[Tuple[str, str]]] = {}  # Names resolved by the worker, by cache kind
+        self.fingerprint: Optional[str] = None
+        self.entries: List[Tuple] = []  # Per-node override values, see fingerprint_forest
+
+
+def host_name(path: str) -> str:
+    """Host of an IR file, e.g. "node-a" for ".../node-a.json"."""
+    name = os.path.basename(path)
+    root, ext = os.path.splitext(name)
+    return root if ext.lower() in IR_EXTENSIONS else name
+
+
+def _is_ir_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.lower().endswith(IR_EXTENSIONS) and name != FINGERPRINT_INDEX_NAME and os.path.isfile(path)
+
+
+def find_ir_files(directory: str) -> List[Tuple[str, str]]:
+    """
+    (host, path) of the IR dumps in `directory`, sorted by host: `<host>.json`
+    files, and the IR files of `<host>/` subdirectories.
+    """
+    found = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if _is_ir_file(path):
+            found.append((host_name(path), path))
+        elif os.path.isdir(path):
+            nested = sorted(p for p in (os.path.join(path, n) for n in os.listdir(path)) if _is_ir_file(p))
+            for nested_path in nested:
+                # A subdirectory with several dumps names each one by its file.
+                host = name if len(nested) == 1 else os.path.join(name, host_name(nested_path))
+                found.append((host, nested_path))
+    return sorted(found)
+
+
+def _name_caches() -> Dict[str, Dict[str, str]]:
+    resolver = get_device_resolver()
+    return {"vendor": resolver.vendor_cache, "device": resolver.device_cache, "class": resolver.class_cache}
+
+
+def _load_host(path: str, node_filter=None) -> Tuple[List[PcieNode], SystemIdentifierResolver]:
+    """The trees of one IR file that would be rendered, and the host's resolver."""
+    roots, nvlink_data, host_section = load_ir_sections(path)
+    sys_resolver = SystemIdentifierResolver.from_ir(nvlink_data, host_section)
+    if node_filter is not None:
+        roots = node_filter.filter_trees(roots, sys_resolver)
+    # Ignore childless roots, unless all are (flat VM topologies).
+    return [r for r in roots if r.children] or roots, sys_resolver
+
+
+def fingerprint_host(host: str, path: str, node_filter=None) -> HostResult:
+    """
+    Fingerprints the trees of one IR file, without rendering them. Unless
+    they are filtered, the trees are fingerprinted as a TopologyTable,
+    without building PcieNodes.
+    """
+    result = HostResult(host, path)
+    try:
+        if node_filter is not None:
+            roots, sys_resolver = _load_host(path, node_filter)
+            result.fingerprint, result.entries = fingerprint_forest(roots, sys_resolver)
+        else:
+            table, nvlink_data, host_section = load_ir_table_sections(path)
+            sys_resolver = SystemIdentifierResolver.from_ir(nvlink_data, host_section)
+            # As in _load_host: childless roots are ignored unless all are.
+            roots = [r for r in table.roots if len(table.children(r))] or list(table.roots)
+            result.fingerprint, result.entries = fingerprint_table(table, sys_resolver, roots)
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    return result
+
+
+def render_host(host: str, path: str, output_dir: str, node_filter=None, name: Optional[str] = None) -> HostResult:
+    """Renders the NUMA graphs of one IR file into `<output_dir>/<name>/` (default: the host name)."""
+    from pcie_topo_vis import add_synth_mf_nodes, build_pcie_topology_graph, group_by_numa, render_graph
+
+    result = HostResult(host, path)
+    # Dicts keep insertion order, so the entries past these sizes are the ones resolved for this host.
+    sizes = {kind: len(cache) for kind, cache in _name_caches().items()}
+    try:
+        roots, sys_resolver = _load_host(path, node_filter)
+        for r in roots:
+            add_synth_mf_nodes(r)
+
+        host_dir = os.path.join(output_dir, name or result.host)
+        if roots:
+            os.makedirs(host_dir, exist_ok=True)
+        for numa, numa_roots in group_by_numa(roots).items():
+            graph = build_pcie_topology_graph(numa_roots, numa, host_dir, sys_resolver)
+            render_graph(graph)
+            result.graphs.append(graph.name)
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    result.names = {kind: list(cache.items())[sizes[kind]:] for kind, cache in _name_caches().items()}
+    return result
+
+
+def _run_tasks(function: Callable[..., HostResult], tasks: List[Tuple], jobs: Optional[int] = None) -> Iterator[HostResult]:
+    """
+    Runs `function(*task)` for every task with at most `jobs` worker
+    processes (default: one per CPU) and yields the results in task order.
+    """
+    if not jobs or jobs < 0:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(tasks)))
+
+    get_device_resolver().preload()
+
+    if jobs == 1:
+        for task in tasks:
+            yield function(*task)
+        return
+
+    # Forked workers inherit the parsed pci.ids and the loaded name cache.
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = [pool.submit(function, *task) for task in tasks]
+        for future in futures:
+            result = future.result()
+            for kind, entries in result.names.items():
+                _name_caches()[kind].update(entries)
+            yield result
+
+
+def render_ir_dir(
+    hosts: List[Tuple[str, str]], output_dir: str, jobs: Optional[int] = None, node_filter=None
+) -> Iterator[HostResult]:
+    """Renders the IR file of every (host, path) of `hosts`, yielding each host's result in input order."""
+    return _run_tasks(render_host, [(host, path, output_dir, node_filter) for host, path in hosts], jobs)
+
+
+def _print_result(result: HostResult, detail: str) -> None:
+    if result.error is not None:
+        print(f"✗ {result.host}: {result.error}", flush=True)
+    else:
+        print(f"✓ {result.host}: {detail}", flush=True)
+
+
+def _dedup_batch(hosts: List[Tuple[str, str]], output_dir: str, jobs: Optional[int], node_filter) -> List[HostResult]:
+    """Fingerprints all hosts, renders one representative per topology and writes the index."""
+    results = list(_run_tasks(fingerprint_host, [(host, path, node_filter) for host, path in hosts], jobs))
+    fingerprinted = {r.host: r for r in results if r.error is None}
+    for result in results:
+        if result.error is not None:
+            _print_result(result, "")
+
+    fingerprints = {host: r.fingerprint for host, r in fingerprinted.items()}
+    groups = group_by_fingerprint(fingerprints)
+    print(f"{len(fingerprinted)} host(s) share {len(groups)} distinct topolog{'y' if len(groups) == 1 else 'ies'}", flush=True)
+
+    topologies_dir = os.path.join(output_dir, "topologies")
+    tasks = [
+        (members[0], fingerprinted[members[0]].path, topologies_dir, node_filter, fingerprint)
+        for fingerprint, members in groups.items()
+    ]
+    for fingerprint, rendered in zip(groups, _run_tasks(render_host, tasks, jobs)):
+        members = groups[fingerprint]
+        if rendered.error is not None:
+            for host in members:
+                fingerprinted[host].error = f"rendering {fingerprint} failed: {rendered.error}"
+        for host in members:
+            fingerprinted[host].graphs = rendered.graphs
+        _print_result(rendered, f"{len(rendered.graphs)} graph(s) in topologies/{fingerprint} for {len(members)} host(s)")
+
+    index = build_fingerprint_index(
+        fingerprints,
+        {host: r.entries for host, r in fingerprinted.items()},
+        {host: r.path for host, r in fingerprinted.items()},
+    )
+    index_path = os.path.join(output_dir, FINGERPRINT_INDEX_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+    print(f"✓ Wrote {index_path}", flush=True)
+    return results
+
+
+def run_batch(ir_dir: str, output_dir: str, jobs: Optional[int] = None, node_filter=None, dedup: bool = False) -> List[HostResult]:
+    """Renders all IR files of `ir_dir`, printing progress and the overall throughput."""
+    hosts = find_ir_files(ir_dir)
+    if not hosts:
+        print(f"No IR files ({', '.join(IR_EXTENSIONS)}) found in {ir_dir}.", flush=True)
+        return []
+    print(f"Rendering {len(hosts)} host(s) from {ir_dir}...", flush=True)
+
+    start = time.monotonic()
+    if dedup:
+        results = _dedup_batch(hosts, output_dir, jobs, node_filter)
+    else:
+        results = []
+        for result in render_ir_dir(hosts, output_dir, jobs, node_filter):
+            results.append(result)
+            _print_result(result, f"{len(result.graphs)} graph(s)")
+    elapsed = time.monotonic() - start
+
+    get_device_resolver().save_cache()
+    failed = sum(1 for r in results if r.error is not None)
+    graphs = len({(r.fingerprint, g) for r in results for g in r.graphs}) if dedup else sum(len(r.graphs) for r in results)
+    print(
+        f"Rendered {len(results) - failed} host(s), {graphs} graph(s) in {elapsed:.2f}s "
+        f"({len(results) / elapsed if elapsed > 0 else 0:.1f} hosts/sec)"
+        + (f"; {failed} host(s) failed" if failed else ""),
+        flush=True,
+    )
+    return results
@@ -0,0 +1,72 @@
+"""
+Collector-only mode (--collect-only): the part of the pipeline that must
+run on the node itself, for rendering elsewhere (--from-ir / --from-ir-dir).
+
+Only the sysfs attributes the renderer uses are read (no lspci snapshot),
+the vendor tools' raw outputs and the sysfs identifier names (netdev, RDMA,
+NVMe, DRM) are stored unparsed in the IR's host section, and no names are
+resolved, filters applied or graphs built. The host section is replayed
+centrally through SystemIdentifierResolver.from_ir. JSON Lines dumps are
+written node by node during the sysfs walk, without building the trees.
+"""
+
+import os
+import socket
+import time
+from typing import Dict, List, Optional
+from ir_io import dump_ir, infer_ir_format, write_ir_jsonl_header, write_ir_jsonl_nodes, write_ir_jsonl_sections
+from pcie_node import NODE_FIELDS, iter_tree
+from pcie_topo_gen import get_pcie_trees, iter_pcie_nodes
+from sysfs_index import SysfsIndex, get_sysfs_index
+from system_identifiers import VendorProbes, capture_probes, start_vendor_probes
+
+
+# Node fields read by the collector: everything the renderer shows. The
+# lspci record is only kept in full dumps and would cost an lspci run.
+COLLECT_FIELDS: List[str] = [field for field in NODE_FIELDS if field != "lspci_vmm"]
+
+
+def capture_host_section(probes: VendorProbes, sysfs_index: Optional[SysfsIndex] = None) -> Dict:
+    """The IR host section: host name, sysfs identifier names and raw probe captures."""
+    sysfs_index = sysfs_index if sysfs_index is not None else get_sysfs_index()
+    section = {
+        "hostname": socket.gethostname(),
+        "sysfs_children": sysfs_index.children,
+    }
+    section.update(capture_probes(probes))
+    return section
+
+
+def default_collect_path(output_dir: str = ".") -> str:
+    """`<output_dir>/<hostname>.json`, the name --from-ir-dir expects."""
+    return os.path.join(output_dir, f"{socket.gethostname()}.json")
+
+
+def collect(path: str, fmt: Optional[str] = None, jobs: int = 1, probe_timeouts: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    Discovers the PCIe trees while the vendor tools run, captures the host
+    section and writes both to the IR file `path`. Returns the device count
+    and the time spent: wall time, this process's CPU time since it
+    started, and the vendor tools' CPU time. JSON Lines dumps are streamed
+    from a serial walk, so `jobs` only applies to the other formats.
+    """
+    start = time.monotonic()
+    probes = start_vendor_probes(probe_timeouts)
+    if (fmt or infer_ir_format(path)) == "jsonl":
+        # Each node is written as soon as it is read; the trees are never held.
+        with open(path, "w") as f:
+            write_ir_jsonl_header(f)
+            devices = write_ir_jsonl_nodes(f, iter_pcie_nodes("/sys/devices", COLLECT_FIELDS))
+            write_ir_jsonl_sections(f, None, capture_host_section(probes))
+    else:
+        roots = get_pcie_trees("/sys/devices", jobs=jobs, fields=COLLECT_FIELDS)
+        dump_ir(path, roots, None, fmt, capture_host_section(probes))
+        devices = sum(1 for _ in iter_tree(roots))
+
+    times = os.times()
+    return {
+        "devices": devices,
+        "wall": time.monotonic() - start,
+        "cpu": times.user + times.system,
+        "tools_cpu": times.children_user + times.children_system,
+    }
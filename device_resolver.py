@@ -2,19 +2,83 @@
 Device name resolver for PCI vendor/device IDs.
 """
 
+import hashlib
 import json
 import os
 import subprocess
 from typing import Optional, Dict
+from name_cache import NameCache
+from pci_ids import PciIdsDatabase, find_pci_ids_path, get_pci_ids_database, read_pci_ids_version
 
 
 class DeviceResolver:
-    def __init__(self, known_devices_path: str = "known_devices.json", known_vendors_path: str = "known_vendors.json"):
+    def __init__(self, known_devices_path: str = "known_devices.json", known_vendors_path: str = "known_vendors.json",
+                 pci_ids_path: Optional[str] = None):
         self.device_cache: Dict[str, str] = {}
         self.vendor_cache: Dict[str, str] = {}
         self.class_cache: Dict[str, str] = {}
         self.known_devices = self._load_known_devices(known_devices_path)
         self.known_vendors = self._load_known_vendors(known_vendors_path)
+        self.pci_ids_path = pci_ids_path
+        self._pci_ids: Optional[PciIdsDatabase] = None
+        self._pci_ids_loaded = False
+        self._name_cache: Optional[NameCache] = None
+        self._persisted_sizes = (0, 0, 0)
+    
+    def _sources_fingerprint(self) -> str:
+        """Identifies the pci.ids database and known_*.json contents names are resolved from."""
+        h = hashlib.sha256()
+        pci_ids_path = self.pci_ids_path or find_pci_ids_path()
+        if pci_ids_path:
+            try:
+                st = os.stat(pci_ids_path)
+                h.update(f"{pci_ids_path}:{st.st_size}:{st.st_mtime_ns}".encode())
+            except OSError:
+                pass
+            h.update(f"version:{read_pci_ids_version(pci_ids_path)}".encode())
+        h.update(json.dumps(self.known_devices, sort_keys=True).encode())
+        h.update(json.dumps(self.known_vendors, sort_keys=True).encode())
+        return h.hexdigest()
+    
+    def attach_cache(self, cache: NameCache) -> bool:
+        """
+        Pre-fills the in-memory caches from a persistent cache, which is
+        invalidated if pci.ids or the known_*.json files changed.
+        """
+        if not cache.open(self._sources_fingerprint()):
+            return False
+        self._name_cache = cache
+        self.vendor_cache.update(cache.load("vendor"))
+        self.device_cache.update(cache.load("device"))
+        self.class_cache.update(cache.load("class"))
+        self._persisted_sizes = self._cache_sizes()
+        return True
+    
+    def save_cache(self) -> None:
+        """Writes back the in-memory caches if anything new was resolved."""
+        if self._name_cache is None or self._cache_sizes() == self._persisted_sizes:
+            return
+        self._name_cache.store("vendor", self.vendor_cache)
+        self._name_cache.store("device", self.device_cache)
+        self._name_cache.store("class", self.class_cache)
+        self._persisted_sizes = self._cache_sizes()
+    
+    def _cache_sizes(self) -> tuple:
+        return (len(self.vendor_cache), len(self.device_cache), len(self.class_cache))
+    
+    def preload(self) -> None:
+        """Parses pci.ids now, e.g. before forking workers that then share the parsed database."""
+        self._get_pci_ids()
+
+    def _get_pci_ids(self) -> Optional[PciIdsDatabase]:
+        """Parse pci.ids on first use. Returns None if no database is installed."""
+        if not self._pci_ids_loaded:
+            if self.pci_ids_path:
+                self._pci_ids = PciIdsDatabase.load(self.pci_ids_path)
+            else:
+                self._pci_ids = get_pci_ids_database()
+            self._pci_ids_loaded = True
+        return self._pci_ids
     
     def _load_known_devices(self, path: str) -> Dict:
         try:
@@ -85,8 +149,15 @@ class DeviceResolver:
             self.vendor_cache[vendor_id] = vendor_name
             return vendor_name
         
-        # Try lspci
-        lspci_result = self._query_lspci(vendor_id, "*")
+        pci_ids = self._get_pci_ids()
+        if pci_ids is not None:
+            vendor_name = pci_ids.get_vendor(vendor_id)
+            if vendor_name:
+                self.vendor_cache[vendor_id] = vendor_name
+                return vendor_name
+        
+        # Try lspci only when no pci.ids database is available
+        lspci_result = self._query_lspci(vendor_id, "*") if pci_ids is None else None
         if lspci_result:
             vendor_name, _ = lspci_result
             self.vendor_cache[vendor_id] = vendor_name
@@ -115,8 +186,15 @@ class DeviceResolver:
                 self.device_cache[device_key] = device_name
                 return device_name
         
-        #Try lspci
-        lspci_result = self._query_lspci(vendor_id, device_id)
+        pci_ids = self._get_pci_ids()
+        if pci_ids is not None:
+            device_name = pci_ids.get_device(vendor_id, device_id)
+            if device_name:
+                self.device_cache[device_key] = device_name
+                return device_name
+        
+        #Try lspci only when no pci.ids database is available
+        lspci_result = self._query_lspci(vendor_id, device_id) if pci_ids is None else None
         if lspci_result:
             _, device_name = lspci_result
             self.device_cache[device_key] = device_name
@@ -126,7 +204,7 @@ class DeviceResolver:
         return device_id
     
     def get_class_name(self, vendor_id: str, device_id: str, class_code: Optional[str] = None) -> Optional[str]:
-        """Get human-readable class name from lspci."""
+        """Get human-readable class name from pci.ids, falling back to lspci."""
         if not vendor_id or not device_id:
             return None
         
@@ -134,6 +212,13 @@ class DeviceResolver:
         if class_code and class_code in self.class_cache:
             return self.class_cache[class_code]
         
+        pci_ids = self._get_pci_ids()
+        if class_code and pci_ids is not None:
+            class_name = pci_ids.get_class(class_code)
+            if class_name:
+                self.class_cache[class_code] = class_name
+            return class_name
+        
         vendor_id = vendor_id.replace('0x', '') if vendor_id.startswith('0x') else vendor_id
         device_id = device_id.replace('0x', '') if device_id.startswith('0x') else device_id
         
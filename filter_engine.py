@@ -0,0 +1,270 @@
+"""
+Declarative device filters compiled into integer predicates.
+
+A filter spec selects the PCIe trees to keep. A tree is kept if its root's
+NUMA node is selected and at least one node in the tree matches every node
+criterion that is set:
+  - classes: class code prefixes, e.g. "0x03" (base class), "0x0207"
+    (subclass) or "0x010802" (prog-if), or ranges like "0x030000-0x0302ff".
+  - vendors: vendor IDs, e.g. "0x10de".
+  - netdev:  whether the node has a network interface.
+  - gpu:     whether the node has a GPU index.
+  - numa:    NUMA nodes of the tree's root (tree-level).
+
+Specs come from a JSON/YAML file with these keys, from the --filter string
+(e.g. "class=0x03,0x0207;vendor=0x10de;netdev;numa=0,1"), or from the class
+labels selected in filter_config.py.
+"""
+
+import json
+from bisect import bisect_right
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from mappings import CLASS_CODE_LABELS, parse_class_code
+from pcie_node import PcieNode
+
+
+SPEC_KEYS = ("classes", "vendors", "netdev", "gpu", "numa")
+
+# --filter keys -> spec keys
+_CLI_KEYS = {
+    "class": "classes",
+    "classes": "classes",
+    "vendor": "vendors",
+    "vendors": "vendors",
+    "netdev": "netdev",
+    "gpu": "gpu",
+    "numa": "numa",
+}
+
+
+def _parse_hex(value: str, what: str) -> Tuple[int, int]:
+    """(value, number of hex digits) of "0x.." or bare hex `value`."""
+    digits = value.strip().lower()
+    if digits.startswith("0x"):
+        digits = digits[2:]
+    if not digits or not all(c in "0123456789abcdef" for c in digits):
+        raise ValueError(f"invalid {what} '{value}'")
+    return int(digits, 16), len(digits)
+
+
+def _parse_bool(value, key: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "on", ""):
+        return True
+    if text in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"invalid value '{value}' for '{key}'")
+
+
+def _merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+class FilterSpec:
+    def __init__(
+        self,
+        classes: Optional[List[str]] = None,
+        vendors: Optional[List[str]] = None,
+        netdev: Optional[bool] = None,
+        gpu: Optional[bool] = None,
+        numa: Optional[List[str]] = None,
+    ) -> None:
+        self.classes = classes or []  # Class code prefixes, e.g. ["0x03", "0x0207"]
+        self.vendors = vendors or []  # Vendor IDs, e.g. ["0x10de"]
+        self.netdev = netdev  # None: don't care
+        self.gpu = gpu  # None: don't care
+        self.numa = numa or []  # NUMA nodes as in sysfs, e.g. ["0", "-1"]
+
+    def is_empty(self) -> bool:
+        return (
+            not self.classes and not self.vendors and not self.numa
+            and self.netdev is None and self.gpu is None
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FilterSpec":
+        if not isinstance(data, dict):
+            raise ValueError("filter spec must be a mapping")
+        unknown = set(data) - set(SPEC_KEYS)
+        if unknown:
+            raise ValueError(
+                f"unknown filter key(s): {', '.join(sorted(unknown))}. Valid keys: {', '.join(SPEC_KEYS)}"
+            )
+
+        def as_list(key: str) -> List[str]:
+            value = data.get(key) or []
+            if not isinstance(value, list):
+                value = [value]
+            return [str(v) for v in value]
+
+        netdev = data.get("netdev")
+        gpu = data.get("gpu")
+        return cls(
+            classes=as_list("classes"),
+            vendors=as_list("vendors"),
+            netdev=None if netdev is None else _parse_bool(netdev, "netdev"),
+            gpu=None if gpu is None else _parse_bool(gpu, "gpu"),
+            numa=as_list("numa"),
+        )
+
+    @classmethod
+    def parse(cls, text: str) -> "FilterSpec":
+        """Parses the --filter syntax: "key=v1,v2;flag;..."."""
+        data: Dict = {}
+        for clause in text.split(";"):
+            clause = clause.strip()
+            if not clause:
+                continue
+            key, sep, value = clause.partition("=")
+            key = key.strip().lower()
+            if key not in _CLI_KEYS:
+                raise ValueError(f"unknown filter key '{key}'. Valid keys: {', '.join(sorted(set(_CLI_KEYS)))}")
+            spec_key = _CLI_KEYS[key]
+            if spec_key in ("netdev", "gpu"):
+                data[spec_key] = _parse_bool(value if sep else True, key)
+            else:
+                data.setdefault(spec_key, []).extend(v.strip() for v in value.split(",") if v.strip())
+        return cls.from_dict(data)
+
+    @classmethod
+    def load(cls, path: str) -> "FilterSpec":
+        """Reads a spec from a JSON or (if PyYAML is installed) YAML file."""
+        with open(path, "r") as f:
+            text = f.read()
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"{path}: reading YAML filter specs requires PyYAML")
+            return cls.from_dict(yaml.safe_load(text) or {})
+        return cls.from_dict(json.loads(text))
+
+    @classmethod
+    def from_class_labels(cls, labels: Iterable[str]) -> "FilterSpec":
+        """
+        Spec matching the class codes whose label (see
+        mappings.get_device_class_label) is one of `labels`.
+        """
+        targets = {label.lower().strip() for label in labels}
+        table = {parse_class_code(code): label.lower() for code, label in CLASS_CODE_LABELS.items()}
+        codes: Set[int] = set()
+        for code, label in table.items():
+            if label not in targets:
+                continue
+            if code & 0xFF:
+                codes.add(code)
+                continue
+            # Prog-ifs without their own entry are labeled like their subclass.
+            for prog_if in range(0x100):
+                if (code | prog_if) not in table or table[code | prog_if] in targets:
+                    codes.add(code | prog_if)
+        classes = [f"0x{lo:06x}-0x{hi:06x}" for lo, hi in _merge_ranges((c, c) for c in codes)]
+        return cls(classes=classes)
+
+
+class CompiledFilter:
+    """
+    A FilterSpec compiled into sorted, merged class-code ranges and integer
+    sets. `node_fields` lists the PcieNode attributes the node predicate
+    reads, and `fields` adds the tree-level ones. The netdev/GPU criteria
+    need system identifiers; with `sysfs_only`, only the criteria answered
+    from sysfs are checked, so discovery can filter before the vendor tool
+    probes are joined.
+    """
+
+    def __init__(self, spec: FilterSpec) -> None:
+        ranges = []
+        for prefix in spec.classes:
+            lo_text, sep, hi_text = prefix.partition("-")
+            if sep:
+                ranges.append((_parse_hex(lo_text, "class code")[0], _parse_hex(hi_text, "class code")[0]))
+                continue
+            value, digits = _parse_hex(prefix, "class code prefix")
+            if digits % 2 or digits > 6:
+                raise ValueError(f"invalid class code prefix '{prefix}': expected 2, 4 or 6 hex digits")
+            shift = 4 * (6 - digits)
+            ranges.append((value << shift, ((value + 1) << shift) - 1))
+        merged = _merge_ranges(ranges)
+        self._range_starts = [lo for lo, _ in merged]
+        self._range_ends = [hi for _, hi in merged]
+
+        self.vendors: FrozenSet[int] = frozenset(_parse_hex(v, "vendor ID")[0] for v in spec.vendors)
+        self.netdev = spec.netdev
+        self.gpu = spec.gpu
+        self.numa: FrozenSet[str] = frozenset(str(n).strip() for n in spec.numa)
+
+        self.node_fields: List[str] = []
+        if merged:
+            self.node_fields.append("class_")
+        if self.vendors:
+            self.node_fields.append("vendor")
+        self.fields: List[str] = self.node_fields + (["numa_node"] if self.numa else [])
+        self.needs_system_identifiers = self.netdev is not None or self.gpu is not None
+        self._has_node_criteria = bool(merged or self.vendors or self.needs_system_identifiers)
+
+    def class_matches(self, class_code: Optional[str]) -> bool:
+        if not self._range_starts:
+            return True
+        if not class_code:
+            return False
+        code = parse_class_code(class_code)
+        if code is None:
+            return False
+        i = bisect_right(self._range_starts, code) - 1
+        return i >= 0 and code <= self._range_ends[i]
+
+    def node_matches(self, node: PcieNode, sys_resolver=None, sysfs_only: bool = False) -> bool:
+        """
+        `sys_resolver` resolves netdev/GPU criteria (default: the local
+        system's); with `sysfs_only`, those criteria are not checked.
+        """
+        if not self.class_matches(node.class_):
+            return False
+        if self.vendors:
+            try:
+                if not node.vendor or int(node.vendor, 16) not in self.vendors:
+                    return False
+            except ValueError:
+                return False
+        if self.needs_system_identifiers and not sysfs_only:
+            if node.bdf is None:
+                return False
+            if sys_resolver is None:
+                from system_identifiers import get_system_resolver
+                sys_resolver = get_system_resolver()
+            if self.netdev is not None and (sys_resolver.get_network_interface(node) is not None) != self.netdev:
+                return False
+            if self.gpu is not None and (sys_resolver.get_gpu_index(node) is not None) != self.gpu:
+                return False
+        return True
+
+    def tree_matches(self, root: PcieNode, sys_resolver=None, sysfs_only: bool = False) -> bool:
+        if self.numa and str(root.numa_node) not in self.numa:
+            return False
+        if not self._has_node_criteria:
+            return True
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if self.node_matches(node, sys_resolver, sysfs_only):
+                return True
+            stack.extend(node.children)
+        return False
+
+    def filter_trees(self, roots: List[PcieNode], sys_resolver=None, sysfs_only: bool = False) -> List[PcieNode]:
+        return [root for root in roots if self.tree_matches(root, sys_resolver, sysfs_only)]
+
+
+def compile_filter(spec: Optional[FilterSpec]) -> Optional[CompiledFilter]:
+    """The predicate of `spec`, or None if the spec selects everything."""
+    if spec is None or spec.is_empty():
+        return None
+    return CompiledFilter(spec)
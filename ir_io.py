@@ -0,0 +1,495 @@
+"""
+Reading and writing the PCIe topology IR (--dump-ir / --from-ir).
+
+Formats:
+  - "json": one indented JSON document with nested nodes (default).
+  - "jsonl": one flat JSON record per line, written and read incrementally
+    (--collect-only writes each node as it is discovered). Each node record
+    names its parent by BDF; the host section and NVLink data follow the
+    nodes as "host", "gpu" and "nvlink" records.
+  - "binary": a TopologyTable serialized as little-endian uint32 columns
+    plus one interned string table. The columns are memory-mapped on load,
+    and the nodes (TableNodes) are built and read from them on first access.
+
+Besides the trees, an IR file may hold an NVLink section and a host section
+(see collector.py: raw vendor tool captures and sysfs identifiers recorded
+by --collect-only, from which the identifiers are resolved centrally).
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import islice
+from os.path import basename
+from typing import BinaryIO, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+from pcie_node import PcieNode
+from topology_table import TABLE_FIELDS, StringPool, TopologyTable
+
+
+IR_FORMATS = ("json", "jsonl", "binary")
+# File extensions of each IR format, as written by --dump-ir.
+IR_FORMAT_EXTENSIONS: Dict[str, Tuple[str, ...]] = {
+    "json": (".json",),
+    "jsonl": (".jsonl", ".ndjson"),
+    "binary": (".bin", ".topo"),
+}
+IR_EXTENSIONS: Tuple[str, ...] = tuple(ext for exts in IR_FORMAT_EXTENSIONS.values() for ext in exts)
+
+
+JSONL_FORMAT_NAME = "pcie-topo-ir"
+JSONL_FORMAT_VERSION = 1
+
+
+def invalid_ir_error(path: str, reason) -> ValueError:
+    """The error raised for files that cannot be read as any IR format."""
+    return ValueError(f"{path}: not a valid PCIe topology IR file ({reason})")
+
+
+"""
+NVLink section
+"""
+
+
+def get_nvlink_section(sys_resolver) -> Optional[Dict]:
+    """NVLink data of `sys_resolver` as stored in the IR, or None if there is none."""
+    if not sys_resolver.has_nvlink_topology():
+        return None
+    return {
+        "gpu_to_pci": sys_resolver.gpu_to_pci,
+        "nvlink_connections": sys_resolver.nvlink_connections,
+    }
+
+
+def apply_nvlink_section(sys_resolver, nvlink_data: Dict) -> None:
+    # Convert string keys to integers (JSON uses string keys for object keys)
+    sys_resolver.gpu_to_pci = {
+        int(k): v for k, v in nvlink_data.get("gpu_to_pci", {}).items()
+    }
+    sys_resolver.nvlink_connections = {
+        int(k): {int(k2): v2 for k2, v2 in v.items()}
+        for k, v in nvlink_data.get("nvlink_connections", {}).items()
+    }
+
+
+"""
+Tree traversal
+"""
+
+
+def iter_nodes(roots: List[PcieNode]) -> Iterator[Tuple[PcieNode, Optional[PcieNode]]]:
+    """Yields (node, parent) pairs in pre-order without recursion."""
+    stack: List[Tuple[PcieNode, Optional[PcieNode]]] = [(r, None) for r in reversed(roots)]
+    while stack:
+        node, parent = stack.pop()
+        yield node, parent
+        stack.extend((c, node) for c in reversed(node.children))
+
+
+def node_record(node: PcieNode, parent: Optional[PcieNode]) -> Dict:
+    """Flat IR record of `node`: its to_dict() fields plus the parent BDF instead of children."""
+    return {
+        "type": "node",
+        "parent": basename(parent.path) if parent is not None else None,
+        "path": node.path,
+        "device": node.device,
+        "vendor": node.vendor,
+        "lspci_vmm": node.lspci_vmm,
+        "class": node.class_,
+        "numa_node": node.numa_node,
+        "max_link_speed": node.max_link_speed,
+        "current_link_speed": node.current_link_speed,
+        "max_link_width": node.max_link_width,
+        "current_link_width": node.current_link_width,
+    }
+
+
+"""
+JSON Lines
+"""
+
+
+# Lines decoded at once by read_ir_jsonl.
+_JSONL_BATCH_LINES = 1024
+
+
+def write_ir_jsonl_header(f: IO[str]) -> None:
+    f.write(json.dumps({"type": "header", "format": JSONL_FORMAT_NAME, "version": JSONL_FORMAT_VERSION}) + "\n")
+
+
+def write_ir_jsonl_nodes(f: IO[str], nodes: Iterable[Tuple[PcieNode, Optional[PcieNode]]]) -> int:
+    """
+    Writes one record per (node, parent) pair of `nodes`, in order (parents
+    first), and returns the number of records. `nodes` may be a discovery
+    walk (pcie_topo_gen.iter_pcie_nodes) that yields each node as it is read.
+    """
+    count = 0
+    for node, parent in nodes:
+        f.write(json.dumps(node_record(node, parent)) + "\n")
+        count += 1
+    return count
+
+
+def write_ir_jsonl_sections(f: IO[str], nvlink: Optional[Dict] = None, host: Optional[Dict] = None) -> None:
+    """Writes the host section and the NVLink "gpu" and "nvlink" records."""
+    if host:
+        f.write(json.dumps({"type": "host", "host": host}) + "\n")
+    if nvlink:
+        for gpu_idx, pci in sorted(nvlink.get("gpu_to_pci", {}).items()):
+            f.write(json.dumps({"type": "gpu", "index": int(gpu_idx), "pci": pci}) + "\n")
+        for gpu_idx, peers in sorted(nvlink.get("nvlink_connections", {}).items()):
+            for peer_idx, link_type in sorted(peers.items()):
+                f.write(json.dumps({
+                    "type": "nvlink", "gpu": int(gpu_idx), "peer": int(peer_idx), "link": link_type,
+                }) + "\n")
+
+
+def write_ir_jsonl(f: IO[str], roots: List[PcieNode], nvlink: Optional[Dict] = None, host: Optional[Dict] = None) -> None:
+    """
+    Writes one record per node of the discovered trees. With lazily loaded
+    nodes, each node's attributes are read right before its record is
+    written, so the whole topology is never held as a dict.
+    """
+    write_ir_jsonl_header(f)
+    write_ir_jsonl_nodes(f, iter_nodes(roots))
+    write_ir_jsonl_sections(f, nvlink, host)
+
+
+def _iter_jsonl_records(f: IO[str]) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yields (line number, record) for every non-blank line. Lines are decoded
+    a batch at a time as one JSON array, which is several times faster than
+    one json.loads per line.
+    """
+    line_number = 0
+    while True:
+        lines = list(islice(f, _JSONL_BATCH_LINES))
+        if not lines:
+            return
+        batch = [(line_number + i, line) for i, line in enumerate(lines, start=1) if line.strip()]
+        line_number += len(lines)
+        try:
+            records = json.loads("[" + ",".join(line for _, line in batch) + "]")
+        except ValueError:
+            records = None
+        if records is None or len(records) != len(batch):
+            # Find the offending line.
+            records = []
+            for number, line in batch:
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"line {number}: {e}")
+        yield from zip((number for number, _ in batch), records)
+
+
+def _node_from_record(record: Dict) -> PcieNode:
+    """The node of a flat record (PcieNode.from_dict without the children)."""
+    node = PcieNode(record["path"], auto_load=False)
+    get = record.get
+    node.device = get("device")
+    node.vendor = get("vendor")
+    node.lspci_vmm = get("lspci_vmm")
+    node.class_ = get("class")
+    node.numa_node = get("numa_node")
+    node.max_link_speed = get("max_link_speed")
+    node.current_link_speed = get("current_link_speed")
+    node.max_link_width = get("max_link_width")
+    node.current_link_width = get("current_link_width")
+    return node
+
+
+def read_ir_jsonl(f: IO[str]) -> Tuple[List[PcieNode], Optional[Dict], Optional[Dict]]:
+    """Rebuilds the trees record by record. Parents must precede their children."""
+    host = None
+    roots: List[PcieNode] = []
+    nodes_by_bdf: Dict[str, PcieNode] = {}
+    gpu_to_pci: Dict[int, str] = {}
+    nvlink_connections: Dict[int, Dict[int, str]] = {}
+
+    for line_number, record in _iter_jsonl_records(f):
+        record_type = record.get("type")
+
+        if record_type == "node":
+            node = _node_from_record(record)
+            parent_bdf = record.get("parent")
+            if parent_bdf is None:
+                roots.append(node)
+            else:
+                parent = nodes_by_bdf.get(parent_bdf)
+                if parent is None:
+                    raise ValueError(f"line {line_number}: unknown parent {parent_bdf}")
+                parent.children.append(node)
+                node.parent = parent
+            nodes_by_bdf[basename(node.path)] = node
+        elif record_type == "gpu":
+            gpu_to_pci[int(record["index"])] = record["pci"]
+        elif record_type == "nvlink":
+            nvlink_connections.setdefault(int(record["gpu"]), {})[int(record["peer"])] = record["link"]
+        elif record_type == "host":
+            host = record.get("host")
+
+    nvlink = None
+    if gpu_to_pci or nvlink_connections:
+        nvlink = {"gpu_to_pci": gpu_to_pci, "nvlink_connections": nvlink_connections}
+    return roots, nvlink, host
+
+
+"""
+Nested JSON
+"""
+
+
+def write_ir_json(f: IO[str], roots: List[PcieNode], nvlink: Optional[Dict] = None, host: Optional[Dict] = None) -> None:
+    dump_data = {
+        "pcie_topology": [root.to_dict() for root in roots]
+    }
+    if nvlink:
+        dump_data["nvlink_topology"] = nvlink
+    if host:
+        dump_data["host"] = host
+    json.dump(dump_data, f, indent=2)
+
+
+def read_ir_json(f: IO[str]) -> Tuple[List[PcieNode], Optional[Dict], Optional[Dict]]:
+    ir_data = json.load(f)
+
+    # Handle both old format (list of nodes) and new format (dict with nodes and nvlink)
+    if isinstance(ir_data, dict):
+        roots = [PcieNode.from_dict(node) for node in ir_data.get("pcie_topology", [])]
+        return roots, ir_data.get("nvlink_topology"), ir_data.get("host")
+
+    # Old format: just a list of nodes
+    return [PcieNode.from_dict(node) for node in ir_data], None, None
+
+
+"""
+Binary
+
+Layout (all integers little-endian uint32 unless noted):
+  header:   magic "PCIETOPO", version, node_count, root_count,
+            string_count, lspci_pair_count, nvlink_json_size
+  columns:  roots[root_count], parent[node_count] (int32), dir_ids, name_ids,
+            one column per TABLE_FIELDS entry, child_offsets[node_count + 1],
+            child_index[node_count - root_count], lspci_offsets[node_count + 1],
+            lspci_pairs[2 * lspci_pair_count], string_offsets[string_count]
+  strings:  UTF-8 blob; string i spans string_offsets[i - 1]:string_offsets[i]
+            (string 0 is None and is not stored)
+  nvlink:   the NVLink section as compact JSON (may be empty)
+  host:     the host section as compact JSON, up to the end of the file
+            (optional; readers that do not know it ignore trailing bytes)
+"""
+
+
+BINARY_MAGIC = b"PCIETOPO"
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<8s6I")
+
+
+def _le_bytes(column: array) -> bytes:
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def write_ir_binary(f: BinaryIO, roots: List[PcieNode], nvlink: Optional[Dict] = None, host: Optional[Dict] = None) -> None:
+    table = TopologyTable.from_roots(roots)
+    strings = table.strings.strings[1:]
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = array("I")
+    end = 0
+    for e in encoded:
+        end += len(e)
+        string_offsets.append(end)
+    nvlink_json = json.dumps(nvlink, separators=(",", ":")).encode("utf-8") if nvlink else b""
+
+    f.write(_BINARY_HEADER.pack(
+        BINARY_MAGIC, BINARY_VERSION, len(table), len(table.roots),
+        len(strings), len(table.lspci_pairs) // 2, len(nvlink_json),
+    ))
+    columns = [table.roots, table.parent, table.dir_ids, table.name_ids]
+    columns += [table.columns[field] for field in TABLE_FIELDS]
+    columns += [table.child_offsets, table.child_index, table.lspci_offsets, table.lspci_pairs, string_offsets]
+    for column in columns:
+        f.write(_le_bytes(column))
+    f.write(b"".join(encoded))
+    f.write(nvlink_json)
+    if host:
+        f.write(json.dumps(host, separators=(",", ":")).encode("utf-8"))
+
+
+def load_ir_table(path: str) -> Tuple[TopologyTable, Optional[Dict], Optional[Dict]]:
+    """
+    Memory-maps a binary IR file. The table's fixed-width columns are
+    read-only views into the mapping; only the strings are decoded.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _BINARY_HEADER.size:
+            raise invalid_ir_error(path, f"{size} bytes, shorter than the binary header")
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, node_count, root_count, string_count, pair_count, nvlink_size = (
+        _BINARY_HEADER.unpack_from(buf, 0)
+    )
+    if magic != BINARY_MAGIC:
+        raise invalid_ir_error(path, "no binary IR header")
+    if version != BINARY_VERSION:
+        raise ValueError(f"{path}: unsupported binary IR version {version}")
+    columns_size = 4 * (
+        root_count + (3 + len(TABLE_FIELDS)) * node_count + 2 * (node_count + 1)
+        + (node_count - root_count) + 2 * pair_count + string_count
+    )
+    if root_count > node_count or _BINARY_HEADER.size + columns_size > size:
+        raise invalid_ir_error(path, "truncated binary columns")
+
+    view = memoryview(buf)
+    offset = _BINARY_HEADER.size
+
+    def column(count: int, typecode: str = "I"):
+        nonlocal offset
+        size = 4 * count
+        section = view[offset:offset + size]
+        offset += size
+        if sys.byteorder == "little":
+            return section.cast(typecode)
+        swapped = array(typecode, section.tobytes())
+        swapped.byteswap()
+        return swapped
+
+    table = TopologyTable()
+    table.roots = column(root_count)
+    table.parent = column(node_count, "i")
+    table.dir_ids = column(node_count)
+    table.name_ids = column(node_count)
+    table.columns = {field: column(node_count) for field in TABLE_FIELDS}
+    table.child_offsets = column(node_count + 1)
+    table.child_index = column(node_count - root_count)
+    table.lspci_offsets = column(node_count + 1)
+    table.lspci_pairs = column(2 * pair_count)
+    string_offsets = column(string_count)
+
+    blob_size = string_offsets[-1] if string_count else 0
+    if offset + blob_size + nvlink_size > size:
+        raise invalid_ir_error(path, "truncated binary strings or NVLink section")
+    blob = bytes(view[offset:offset + blob_size])
+    offset += blob_size
+    try:
+        strings: List[Optional[str]] = [None]
+        start = 0
+        for end in string_offsets:
+            strings.append(sys.intern(blob[start:end].decode("utf-8")))
+            start = end
+        table.strings = StringPool.from_strings(strings)
+
+        nvlink = None
+        if nvlink_size:
+            nvlink = json.loads(bytes(view[offset:offset + nvlink_size]).decode("utf-8"))
+        offset += nvlink_size
+        host = None
+        if offset < len(view):
+            host = json.loads(bytes(view[offset:]).decode("utf-8"))
+    except ValueError as e:
+        raise invalid_ir_error(path, e)
+    return table, nvlink, host
+
+
+def read_ir_binary(path: str) -> Tuple[List[PcieNode], Optional[Dict], Optional[Dict]]:
+    """The trees are TableNodes over the mapped table, built as they are visited."""
+    table, nvlink, host = load_ir_table(path)
+    return table.to_roots(lazy=True), nvlink, host
+
+
+"""
+Format dispatch
+"""
+
+
+def detect_ir_format(path: str) -> str:
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            return "binary"
+    try:
+        with open(path, "r") as f:
+            first_line = f.readline()
+        header = json.loads(first_line)
+    except ValueError:
+        return "json"
+    if isinstance(header, dict) and header.get("format") == JSONL_FORMAT_NAME:
+        return "jsonl"
+    return "json"
+
+
+def infer_ir_format(path: str) -> str:
+    """Format to write to `path`, based on its extension."""
+    for fmt in ("jsonl", "binary"):
+        if path.endswith(IR_FORMAT_EXTENSIONS[fmt]):
+            return fmt
+    return "json"
+
+
+def dump_ir(
+    path: str, roots: List[PcieNode], nvlink: Optional[Dict] = None, fmt: Optional[str] = None,
+    host: Optional[Dict] = None,
+) -> None:
+    fmt = fmt or infer_ir_format(path)
+    if fmt == "binary":
+        with open(path, "wb") as f:
+            write_ir_binary(f, roots, nvlink, host)
+        return
+    with open(path, "w") as f:
+        if fmt == "jsonl":
+            write_ir_jsonl(f, roots, nvlink, host)
+        else:
+            write_ir_json(f, roots, nvlink, host)
+
+
+def load_ir_sections(path: str) -> Tuple[List[PcieNode], Optional[Dict], Optional[Dict]]:
+    """
+    Returns the roots, the NVLink section and the host section (or None)
+    stored in the IR file `path`. Raises ValueError for files that are not
+    valid IR, e.g. empty or truncated ones.
+    """
+    fmt = detect_ir_format(path)
+    if fmt == "binary":
+        return read_ir_binary(path)
+    try:
+        with open(path, "r") as f:
+            if fmt == "jsonl":
+                return read_ir_jsonl(f)
+            return read_ir_json(f)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise invalid_ir_error(path, e)
+
+
+def load_ir_table_sections(path: str) -> Tuple[TopologyTable, Optional[Dict], Optional[Dict]]:
+    """
+    Like load_ir_sections, but returns the trees as a TopologyTable without
+    creating PcieNodes: binary dumps are memory-mapped and JSON dumps are
+    built from their parsed dicts. (JSON Lines dumps are read as trees first.)
+    """
+    fmt = detect_ir_format(path)
+    if fmt == "binary":
+        return load_ir_table(path)
+    if fmt == "jsonl":
+        roots, nvlink, host = load_ir_sections(path)
+        return TopologyTable.from_roots(roots), nvlink, host
+    try:
+        with open(path, "r") as f:
+            ir_data = json.load(f)
+        if isinstance(ir_data, dict):
+            table = TopologyTable.from_dicts(ir_data.get("pcie_topology", []))
+            return table, ir_data.get("nvlink_topology"), ir_data.get("host")
+        return TopologyTable.from_dicts(ir_data), None, None
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise invalid_ir_error(path, e)
+
+
+def load_ir(path: str) -> Tuple[List[PcieNode], Optional[Dict]]:
+    """Returns the roots and the NVLink section (or None) stored in the IR file `path`."""
+    roots, nvlink, _ = load_ir_sections(path)
+    return roots, nvlink
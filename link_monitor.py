@@ -0,0 +1,197 @@
+"""
+Link-state polling (--poll-links): re-reads current_link_speed and
+current_link_width of every discovered device at a fixed interval and
+emits one JSON line per device whose link changed, e.g.
+
+    {"time": 1760000000.25, "bdf": "0000:e1:00.0", "path": "/sys/devices/...",
+     "current_link_width": {"old": "16", "new": "8"}, "max_link_width": "16",
+     "current_link_speed": "32.0 GT/s PCIe", "max_link_speed": "32.0 GT/s PCIe",
+     "degraded": true}
+
+The sysfs files are opened once and re-read with pread() at offset 0,
+which makes the kernel regenerate their contents without a new open().
+Only as many files are kept open as RLIMIT_NOFILE allows (with headroom
+for the rest of the process); the remaining ones are reopened on every
+poll, so large SR-IOV hosts are still fully monitored.
+"""
+
+import errno
+import json
+import os
+import sys
+import time
+from typing import Dict, IO, Iterable, List, Optional, Tuple
+from pcie_node import PcieNode, iter_tree
+
+
+LINK_STATE_FIELDS = ("current_link_speed", "current_link_width")
+_READ_SIZE = 64
+_FD_HEADROOM = 64  # File descriptors left for the rest of the process (rendering, output, ...)
+_UNREADABLE = object()  # Marks a read that failed for lack of file descriptors
+
+
+def _fd_budget(wanted: int) -> int:
+    """
+    How many of `wanted` file descriptors can be kept open, raising the soft
+    RLIMIT_NOFILE towards the hard limit if needed.
+    """
+    try:
+        import resource
+    except ImportError:
+        return wanted
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        try:
+            in_use = len(os.listdir("/proc/self/fd"))
+        except OSError:
+            in_use = 0
+        needed = in_use + wanted + _FD_HEADROOM
+        if soft != resource.RLIM_INFINITY and needed > soft:
+            target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+                soft = target
+            except (ValueError, OSError):
+                pass
+        if soft == resource.RLIM_INFINITY:
+            return wanted
+        return max(0, min(wanted, soft - in_use - _FD_HEADROOM))
+    except (ValueError, OSError):
+        return wanted
+
+
+def _speed_value(speed: Optional[str]) -> Optional[float]:
+    """GT/s of a link speed string (e.g., 16.0 for "16.0 GT/s PCIe")."""
+    try:
+        return float(speed.split()[0]) if speed else None
+    except ValueError:
+        return None
+
+
+def _width_value(width: Optional[str]) -> Optional[int]:
+    try:
+        return int(width) if width else None
+    except ValueError:
+        return None
+
+
+def is_degraded(node: PcieNode) -> bool:
+    """Whether the link trained below its maximum speed or width."""
+    current_speed, max_speed = _speed_value(node.current_link_speed), _speed_value(node.max_link_speed)
+    current_width, max_width = _width_value(node.current_link_width), _width_value(node.max_link_width)
+    return (
+        (current_speed is not None and max_speed is not None and current_speed < max_speed)
+        or (current_width is not None and max_width is not None and current_width < max_width)
+    )
+
+
+class LinkMonitor:
+    def __init__(self, roots: Iterable[PcieNode]) -> None:
+        # (node, [(attribute, path, fd), ...]) for every device with link attributes;
+        # fd is None for files reopened on every poll.
+        self.links: List[Tuple[PcieNode, List[Tuple[str, str, Optional[int]]]]] = []
+        self.reopened = 0  # Files reopened on every poll (over the fd budget, or EMFILE)
+        self.failed = 0  # Devices with a link attribute that exists but could not be opened
+
+        candidates = [
+            (node, [(attr, os.path.join(node.path, attr)) for attr in LINK_STATE_FIELDS])
+            for node in iter_tree(roots)
+            if node.bdf is not None
+        ]
+        budget = _fd_budget(sum(len(attrs) for _, attrs in candidates))
+
+        for node, attrs in candidates:
+            files = []
+            failed = False
+            for attr, path in attrs:
+                fd = None
+                if budget > 0:
+                    try:
+                        fd = os.open(path, os.O_RDONLY)
+                        budget -= 1
+                    except OSError as e:
+                        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                            continue  # No such attribute (e.g., a root complex device)
+                        if e.errno not in (errno.EMFILE, errno.ENFILE):
+                            failed = True
+                            continue
+                        budget = 0  # Out of descriptors: reopen the rest on every poll
+                elif not os.path.exists(path):
+                    continue
+                if fd is None:
+                    self.reopened += 1
+                files.append((attr, path, fd))
+                if node.__dict__.get(attr) is None:
+                    # Not read during discovery (e.g., --fields); take the baseline now.
+                    value = self._read(path, fd)
+                    setattr(node, attr, None if value is _UNREADABLE else value)
+            if files:
+                self.links.append((node, files))
+            if failed:
+                self.failed += 1
+
+    @staticmethod
+    def _read(path: str, fd: Optional[int] = None):
+        """Current value of a link attribute; _UNREADABLE if no descriptor was available."""
+        try:
+            if fd is not None:
+                data = os.pread(fd, _READ_SIZE, 0)
+            else:
+                reopened = os.open(path, os.O_RDONLY)
+                try:
+                    data = os.read(reopened, _READ_SIZE)
+                finally:
+                    os.close(reopened)
+        except OSError as e:
+            return _UNREADABLE if e.errno in (errno.EMFILE, errno.ENFILE) else None
+        return data.decode(errors="replace").strip() or None
+
+    def poll(self) -> List[Dict]:
+        """Re-reads every link once; returns a change event per device whose link state changed."""
+        events = []
+        now = time.time()
+        for node, fds in self.links:
+            changes = {}
+            for attr, path, fd in fds:
+                value = self._read(path, fd)
+                if value is _UNREADABLE:
+                    continue
+                old = getattr(node, attr)
+                if value != old:
+                    changes[attr] = {"old": old, "new": value}
+                    setattr(node, attr, value)
+            if not changes:
+                continue
+            event = {"time": round(now, 3), "bdf": node.bdf, "path": node.path}
+            for attr in LINK_STATE_FIELDS:
+                event[attr] = changes.get(attr, getattr(node, attr))
+            event["max_link_speed"] = node.max_link_speed
+            event["max_link_width"] = node.max_link_width
+            event["degraded"] = is_degraded(node)
+            events.append(event)
+        return events
+
+    def run(self, interval: float, out: Optional[IO[str]] = None, count: Optional[int] = None) -> None:
+        """Polls every `interval` seconds (`count` times, or until interrupted), writing events as JSON lines to `out` (stdout)."""
+        out = out or sys.stdout
+        try:
+            polls = 0
+            next_poll = time.monotonic()
+            while count is None or polls < count:
+                for event in self.poll():
+                    out.write(json.dumps(event) + "\n")
+                out.flush()
+                polls += 1
+                next_poll += interval
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for _, fds in self.links:
+            for _, _, fd in fds:
+                if fd is not None:
+                    os.close(fd)
+        self.links = []
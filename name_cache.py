@@ -0,0 +1,76 @@
+"""
+Persistent on-disk cache for resolved vendor/device/class names.
+Entries are dropped whenever the pci.ids database or the known_*.json files change.
+"""
+
+import os
+import sqlite3
+from typing import Dict, Optional
+
+
+def default_cache_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "intrahost-topo", "names.sqlite")
+
+
+class NameCache:
+    """
+    A small sqlite store of `kind -> {key: name}` maps, where kind is
+    "vendor", "device" or "class". All entries belong to one fingerprint
+    of the name sources; opening the cache with a different fingerprint
+    empties it.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or default_cache_path()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self, fingerprint: str) -> bool:
+        """Opens (creating if needed) the cache for `fingerprint`. Returns False if unusable."""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS names "
+                "(kind TEXT, key TEXT, name TEXT, PRIMARY KEY (kind, key))"
+            )
+            row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None or row[0] != fingerprint:
+                with conn:
+                    conn.execute("DELETE FROM names")
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                        (fingerprint,),
+                    )
+            self._conn = conn
+            return True
+        except (sqlite3.Error, OSError):
+            self._conn = None
+            return False
+
+    def load(self, kind: str) -> Dict[str, str]:
+        if self._conn is None:
+            return {}
+        try:
+            rows = self._conn.execute("SELECT key, name FROM names WHERE kind = ?", (kind,))
+            return {key: name for key, name in rows}
+        except sqlite3.Error:
+            return {}
+
+    def store(self, kind: str, entries: Dict[str, str]) -> None:
+        if self._conn is None or not entries:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO names (kind, key, name) VALUES (?, ?, ?)",
+                    ((kind, key, name) for key, name in entries.items()),
+                )
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
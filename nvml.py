@@ -0,0 +1,252 @@
+"""
+Optional NVIDIA GPU discovery through NVML (libnvidia-ml) via ctypes.
+Reads GPU index -> PCIe address and the per-link NVLink peers in one
+in-process NVML session, instead of running and parsing nvidia-smi.
+
+Set $NVML_FIXTURE_PATH to a JSON fixture to use FakeNvmlLibrary instead
+of the real library (e.g., on machines without NVIDIA GPUs):
+
+    {"gpus": [{"bus_id": "00000000:18:00.0",
+               "nvlinks": [{"active": true, "remote": "00000000:2a:00.0"}, ...]},
+              ...]}
+
+NVLink remotes that are not GPUs in the fixture are treated as NVSwitches.
+An optional top-level "init_error" code makes nvmlInit_v2 fail with it.
+"""
+
+import ctypes
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+NVML_LIBRARY_NAMES = ["libnvidia-ml.so.1", "libnvidia-ml.so"]
+
+NVML_SUCCESS = 0
+NVML_ERROR_INVALID_ARGUMENT = 2
+NVML_ERROR_NOT_SUPPORTED = 3
+NVML_FEATURE_ENABLED = 1
+NVML_NVLINK_MAX_LINKS = 18
+
+
+class NvmlPciInfo(ctypes.Structure):
+    # nvmlPciInfo_t
+    _fields_ = [
+        ("busIdLegacy", ctypes.c_char * 16),
+        ("domain", ctypes.c_uint),
+        ("bus", ctypes.c_uint),
+        ("device", ctypes.c_uint),
+        ("pciDeviceId", ctypes.c_uint),
+        ("pciSubSystemId", ctypes.c_uint),
+        ("busId", ctypes.c_char * 32),
+    ]
+
+
+class NvmlError(Exception):
+    def __init__(self, function: str, code: int):
+        super().__init__(f"{function} failed with NVML error {code}")
+        self.function = function
+        self.code = code
+
+
+def normalize_bus_id(bus_id: str) -> str:
+    """NVML bus id (e.g., "00000000:18:00.0") as a sysfs BDF (e.g., "0000:18:00.0")."""
+    bus_id = bus_id.strip().lower()
+    return re.sub(r"^0000([0-9a-f]{4}:)", r"\1", bus_id)
+
+
+class NvmlTopology:
+    def __init__(self) -> None:
+        self.gpu_to_pci: Dict[int, str] = {}  # 0 -> "0000:18:00.0"
+        self.nvlink_connections: Dict[int, Dict[int, str]] = {}  # 0 -> {1: "NV18", ...}, as in `nvidia-smi topo -m`
+
+
+class FakeNvmlLibrary:
+    """
+    Stand-in for the ctypes library handle, driven by a JSON fixture.
+    Implements the NVML calls used by `read_nvml_topology` with the same
+    signatures and return codes; out-parameters are ctypes.byref() objects.
+    """
+
+    def __init__(self, fixture: Dict):
+        self.gpus: List[Dict] = fixture.get("gpus", [])
+        self.init_error: int = fixture.get("init_error", NVML_SUCCESS)
+        self.initialized = False
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeNvmlLibrary":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def _gpu(self, handle) -> Optional[Dict]:
+        index = handle.value - 1 if handle.value else -1
+        return self.gpus[index] if 0 <= index < len(self.gpus) else None
+
+    @staticmethod
+    def _set_pci_info(ref, bus_id: str) -> None:
+        info = ref._obj
+        info.busId = bus_id.encode()
+        info.busIdLegacy = normalize_bus_id(bus_id).encode()
+        domain, bus, device = normalize_bus_id(bus_id).replace(".", ":").split(":")[:3]
+        info.domain, info.bus, info.device = int(domain, 16), int(bus, 16), int(device, 16)
+
+    def nvmlInit_v2(self) -> int:
+        if self.init_error != NVML_SUCCESS:
+            return self.init_error
+        self.initialized = True
+        return NVML_SUCCESS
+
+    def nvmlShutdown(self) -> int:
+        self.initialized = False
+        return NVML_SUCCESS
+
+    def nvmlDeviceGetCount_v2(self, count_ref) -> int:
+        count_ref._obj.value = len(self.gpus)
+        return NVML_SUCCESS
+
+    def nvmlDeviceGetHandleByIndex_v2(self, index, handle_ref) -> int:
+        index = getattr(index, "value", index)
+        if not 0 <= index < len(self.gpus):
+            return NVML_ERROR_INVALID_ARGUMENT
+        handle_ref._obj.value = index + 1
+        return NVML_SUCCESS
+
+    def nvmlDeviceGetPciInfo_v3(self, handle, info_ref) -> int:
+        gpu = self._gpu(handle)
+        if gpu is None:
+            return NVML_ERROR_INVALID_ARGUMENT
+        self._set_pci_info(info_ref, gpu["bus_id"])
+        return NVML_SUCCESS
+
+    def _link(self, handle, link) -> Optional[Dict]:
+        gpu = self._gpu(handle)
+        link = getattr(link, "value", link)
+        links = gpu.get("nvlinks", []) if gpu is not None else []
+        return links[link] if 0 <= link < len(links) else None
+
+    def nvmlDeviceGetNvLinkState(self, handle, link, state_ref) -> int:
+        nvlink = self._link(handle, link)
+        if nvlink is None:
+            return NVML_ERROR_NOT_SUPPORTED
+        state_ref._obj.value = NVML_FEATURE_ENABLED if nvlink.get("active") else 0
+        return NVML_SUCCESS
+
+    def nvmlDeviceGetNvLinkRemotePciInfo_v2(self, handle, link, info_ref) -> int:
+        nvlink = self._link(handle, link)
+        if nvlink is None or not nvlink.get("remote"):
+            return NVML_ERROR_NOT_SUPPORTED
+        self._set_pci_info(info_ref, nvlink["remote"])
+        return NVML_SUCCESS
+
+
+def load_nvml_library():
+    """The NVML library ($NVML_FIXTURE_PATH fake first), or None if unavailable."""
+    fixture = os.environ.get("NVML_FIXTURE_PATH")
+    if fixture:
+        try:
+            return FakeNvmlLibrary.from_file(fixture)
+        except (OSError, ValueError):
+            return None
+    for name in NVML_LIBRARY_NAMES:
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            continue
+    return None
+
+
+def _check(lib, function: str, *args) -> None:
+    code = getattr(lib, function)(*args)
+    if code != NVML_SUCCESS:
+        raise NvmlError(function, code)
+
+
+def _read_bus_id(lib, function: str, *args) -> str:
+    info = NvmlPciInfo()
+    _check(lib, function, *args, ctypes.byref(info))
+    return normalize_bus_id(info.busId.decode(errors="replace"))
+
+
+def _active_link_peers(lib, handle) -> List[str]:
+    """Remote BDF of every active NVLink of `handle`, one entry per link."""
+    remote_pci_info = (
+        "nvmlDeviceGetNvLinkRemotePciInfo_v2"
+        if hasattr(lib, "nvmlDeviceGetNvLinkRemotePciInfo_v2")
+        else "nvmlDeviceGetNvLinkRemotePciInfo"
+    )
+    peers = []
+    for link in range(NVML_NVLINK_MAX_LINKS):
+        state = ctypes.c_int()
+        try:
+            _check(lib, "nvmlDeviceGetNvLinkState", handle, ctypes.c_uint(link), ctypes.byref(state))
+            if state.value != NVML_FEATURE_ENABLED:
+                continue
+            peers.append(_read_bus_id(lib, remote_pci_info, handle, ctypes.c_uint(link)))
+        except NvmlError:
+            # Links past the GPU's link count (or without NVLink at all) are not supported.
+            continue
+    return peers
+
+
+def read_nvml_topology(lib=None) -> Optional[NvmlTopology]:
+    """
+    Reads GPU indices and NVLink connections in one NVML session.
+    Returns None if NVML is unavailable or fails to initialize.
+    """
+    lib = lib if lib is not None else load_nvml_library()
+    if lib is None:
+        return None
+
+    try:
+        _check(lib, "nvmlInit_v2")
+    except (NvmlError, AttributeError):
+        return None
+
+    topology = NvmlTopology()
+    try:
+        count = ctypes.c_uint()
+        _check(lib, "nvmlDeviceGetCount_v2", ctypes.byref(count))
+
+        handles = {}
+        for index in range(count.value):
+            handle = ctypes.c_void_p()
+            try:
+                _check(lib, "nvmlDeviceGetHandleByIndex_v2", ctypes.c_uint(index), ctypes.byref(handle))
+                topology.gpu_to_pci[index] = _read_bus_id(lib, "nvmlDeviceGetPciInfo_v3", handle)
+                handles[index] = handle
+            except NvmlError:
+                continue
+
+        pci_to_gpu = {pci: index for index, pci in topology.gpu_to_pci.items()}
+        gpu_links: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        switch_links: Dict[int, int] = defaultdict(int)
+        for index, handle in handles.items():
+            for remote in _active_link_peers(lib, handle):
+                peer = pci_to_gpu.get(remote)
+                if peer is None:
+                    switch_links[index] += 1
+                elif peer != index:
+                    gpu_links[index][peer] += 1
+
+        # GPUs behind NVSwitches reach each other over all their switch links,
+        # which `nvidia-smi topo -m` reports as NV<links> for every pair.
+        for index, links in switch_links.items():
+            for peer, peer_links in switch_links.items():
+                if peer != index:
+                    gpu_links[index][peer] += min(links, peer_links)
+
+        for index, peers in gpu_links.items():
+            for peer, links in peers.items():
+                topology.nvlink_connections.setdefault(index, {})[peer] = f"NV{links}"
+                topology.nvlink_connections.setdefault(peer, {})[index] = f"NV{links}"
+    except (NvmlError, AttributeError):
+        return None
+    finally:
+        try:
+            lib.nvmlShutdown()
+        except AttributeError:
+            pass
+
+    return topology
@@ -0,0 +1,178 @@
+"""
+Pure-Python loader for the PCI ID database (pci.ids).
+Parses the vendor, device, subsystem and class sections once into indexed dicts.
+"""
+
+import gzip
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+# Locations used by pciutils/hwdata on common distributions.
+PCI_IDS_SEARCH_PATHS: List[str] = [
+    "/usr/share/misc/pci.ids",
+    "/usr/share/hwdata/pci.ids",
+    "/usr/share/pci.ids",
+    "/var/lib/pciutils/pci.ids",
+    "/usr/share/misc/pci.ids.gz",
+    "/usr/share/hwdata/pci.ids.gz",
+]
+
+
+def _strip_hex(value: str) -> str:
+    value = value.strip().lower()
+    return value[2:] if value.startswith("0x") else value
+
+
+def find_pci_ids_path() -> Optional[str]:
+    """Return the first pci.ids found ($PCI_IDS_PATH first), or None."""
+    override = os.environ.get("PCI_IDS_PATH")
+    if override:
+        return override if os.path.exists(override) else None
+    for path in PCI_IDS_SEARCH_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_pci_ids_version(path: str) -> Optional[str]:
+    """Reads the "# Version:" header without parsing the whole database."""
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.startswith("#"):
+                    break
+                if line.startswith("# Version:"):
+                    return line.split(":", 1)[1].strip()
+    except (OSError, EOFError):
+        pass
+    return None
+
+
+class PciIdsDatabase:
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self.version: Optional[str] = None
+        self.vendors: Dict[str, str] = {}  # "10de" -> "NVIDIA Corporation"
+        self.devices: Dict[Tuple[str, str], str] = {}  # ("10de", "2330") -> "GH100 [H100 SXM5 80GB]"
+        self.subsystems: Dict[Tuple[str, str, str, str], str] = {}  # (vendor, device, subvendor, subdevice) -> name
+        self.classes: Dict[str, str] = {}  # "03" -> "Display controller"
+        self.subclasses: Dict[Tuple[str, str], str] = {}  # ("03", "02") -> "3D controller"
+        self.prog_ifs: Dict[Tuple[str, str, str], str] = {}  # ("01", "08", "02") -> "NVM Express"
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["PciIdsDatabase"]:
+        """Parse `path` (or the first pci.ids found). Returns None if unavailable."""
+        path = path or find_pci_ids_path()
+        if not path:
+            return None
+
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+                db = cls()
+                db.path = path
+                db._parse(f)
+                return db
+        except (OSError, EOFError):
+            return None
+
+    def _parse(self, lines) -> None:
+        vendor = None
+        device = None
+        base_class = None
+        subclass = None
+        in_classes = False
+
+        for raw in lines:
+            line = raw.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                if self.version is None and line.startswith("# Version:"):
+                    self.version = line.split(":", 1)[1].strip()
+                continue
+
+            depth = len(line) - len(line.lstrip("\t"))
+            body = line[depth:]
+
+            if depth == 0:
+                vendor = device = base_class = subclass = None
+                if body.startswith("C "):
+                    # Class line: "C 03  Display controller"
+                    in_classes = True
+                    code, _, name = body[2:].partition("  ")
+                    base_class = code.strip().lower()
+                    self.classes[base_class] = name.strip()
+                else:
+                    # Vendor line: "10de  NVIDIA Corporation"
+                    in_classes = False
+                    code, _, name = body.partition("  ")
+                    code = code.strip().lower()
+                    if len(code) == 4 and all(c in "0123456789abcdef" for c in code):
+                        vendor = code
+                        self.vendors[vendor] = name.strip()
+                continue
+
+            code, _, name = body.partition("  ")
+            code = code.strip().lower()
+            name = name.strip()
+
+            if in_classes:
+                if depth == 1 and base_class is not None:
+                    subclass = code
+                    self.subclasses[(base_class, subclass)] = name
+                elif depth == 2 and base_class is not None and subclass is not None:
+                    self.prog_ifs[(base_class, subclass, code)] = name
+            elif vendor is not None:
+                if depth == 1:
+                    device = code
+                    self.devices[(vendor, device)] = name
+                elif depth == 2 and device is not None:
+                    parts = code.split()
+                    if len(parts) == 2:
+                        self.subsystems[(vendor, device, parts[0], parts[1])] = name
+
+    def get_vendor(self, vendor_id: str) -> Optional[str]:
+        return self.vendors.get(_strip_hex(vendor_id))
+
+    def get_device(self, vendor_id: str, device_id: str) -> Optional[str]:
+        return self.devices.get((_strip_hex(vendor_id), _strip_hex(device_id)))
+
+    def get_subsystem(self, vendor_id: str, device_id: str, subvendor_id: str, subdevice_id: str) -> Optional[str]:
+        return self.subsystems.get(
+            (_strip_hex(vendor_id), _strip_hex(device_id), _strip_hex(subvendor_id), _strip_hex(subdevice_id))
+        )
+
+    def get_class(self, class_code: str) -> Optional[str]:
+        """
+        Resolve a sysfs class code (e.g., "0x030200") the way lspci names it:
+        the subclass name, falling back to the base class name.
+        """
+        code = _strip_hex(class_code)
+        if len(code) < 2:
+            return None
+        base_class = code[0:2]
+        subclass = code[2:4]
+        if subclass and (base_class, subclass) in self.subclasses:
+            return self.subclasses[(base_class, subclass)]
+        return self.classes.get(base_class)
+
+    def get_prog_if(self, class_code: str) -> Optional[str]:
+        code = _strip_hex(class_code)
+        if len(code) < 6:
+            return None
+        return self.prog_ifs.get((code[0:2], code[2:4], code[4:6]))
+
+
+# Global instance
+_pci_ids_database = None
+_pci_ids_loaded = False
+
+def get_pci_ids_database() -> Optional[PciIdsDatabase]:
+    global _pci_ids_database, _pci_ids_loaded
+    if not _pci_ids_loaded:
+        _pci_ids_database = PciIdsDatabase.load()
+        _pci_ids_loaded = True
+    return _pci_ids_database
@@ -1,35 +1,219 @@
 import os
+import re
 import subprocess
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# Snapshot of `lspci -vvmm -D`, keyed by domain-qualified BDF (e.g., "0000:e1:00.0").
+_lspci_snapshot: Optional[Dict[str, Dict]] = None
+_lspci_snapshot_lock = threading.Lock()
+
+
+def _parse_lspci_snapshot(output: str) -> Dict[str, Dict]:
+    """
+    Args:
+        output: Output of `lspci -vvmm -D`; one blank-line separated record per device.
+    Return:
+        Hashmap of BDF to tag-value pairs.
+    """
+    records = {}
+    for block in output.split("\n\n"):
+        record = PcieNode._parse_lspci_vmm_output(block)
+        slot = record.get("Slot")
+        if slot:
+            records[slot.lower()] = record
+    return records
+
+
+def load_lspci_snapshot(slot: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Runs lspci once for all devices (or only for the `-s` selector `slot`)
+    and returns the parsed records keyed by BDF.
+    """
+    selector = f" -s {slot}" if slot else ""
+    local_query_cmd = f"lspci -vvmm -D{selector}"
+    central_query_cmd = f"lspci -q -vvmm -D{selector}"
+
+    for cmd in (local_query_cmd, central_query_cmd):
+        try:
+            stdout = subprocess.check_output(
+                cmd, text=True, shell=True, stderr=subprocess.DEVNULL
+            )
+            if stdout:
+                return _parse_lspci_snapshot(stdout)
+        except Exception as _:
+            # Query failed. Try the next one.
+            pass
+
+    return {}
+
+
+def get_lspci_snapshot() -> Dict[str, Dict]:
+    global _lspci_snapshot
+    with _lspci_snapshot_lock:
+        if _lspci_snapshot is None:
+            _lspci_snapshot = load_lspci_snapshot()
+        return _lspci_snapshot
+
+
+def reset_lspci_snapshot() -> None:
+    """Drops the cached snapshot so that the next lookup re-runs lspci."""
+    global _lspci_snapshot
+    with _lspci_snapshot_lock:
+        _lspci_snapshot = None
+
+
+bdf_pattern = re.compile(
+    r"^[0-9a-f]{4}:[0-9a-f]{2}:[0-9a-f]{2}\.[0-7]$"
+)  # E.g., "0000:e1:00.0"
+
+
+def iter_tree(roots: Iterable["PcieNode"]) -> Iterator["PcieNode"]:
+    """Yields every node of the trees with roots `roots` in pre-order, without recursion."""
+    stack = list(roots)[::-1]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+# IR field name -> PcieNode attribute name.
+NODE_FIELDS: Dict[str, str] = {
+    "device": "device",
+    "vendor": "vendor",
+    "lspci_vmm": "lspci_vmm",
+    "class": "class_",
+    "numa_node": "numa_node",
+    "max_link_speed": "max_link_speed",
+    "current_link_speed": "current_link_speed",
+    "max_link_width": "max_link_width",
+    "current_link_width": "current_link_width",
+}
+
+# PcieNode attribute name -> sysfs file. `lspci_vmm` comes from the lspci snapshot.
+_SYSFS_FILES: Dict[str, str] = {
+    "device": "device",
+    "vendor": "vendor",
+    "class_": "class",
+    "numa_node": "numa_node",
+    "max_link_speed": "max_link_speed",
+    "current_link_speed": "current_link_speed",
+    "max_link_width": "max_link_width",
+    "current_link_width": "current_link_width",
+}
+
+
+def resolve_fields(fields: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Maps IR field names (e.g., "class") to PcieNode attribute names.
+    `None` selects every field. Raises ValueError on unknown names.
+    """
+    if fields is None:
+        return list(NODE_FIELDS.values())
+
+    attrs = []
+    unknown = []
+    for field in fields:
+        field = field.strip()
+        if field in NODE_FIELDS:
+            attrs.append(NODE_FIELDS[field])
+        elif field in NODE_FIELDS.values():
+            attrs.append(field)
+        elif field:
+            unknown.append(field)
+    if unknown:
+        raise ValueError(
+            f"Unknown PcieNode field(s): {', '.join(unknown)}. "
+            f"Valid fields: {', '.join(NODE_FIELDS)}"
+        )
+    return attrs
 
 
 class PcieNode:
-    def __init__(self, path: str, auto_load: bool = True) -> None:
+    def __init__(
+        self,
+        path: str,
+        auto_load: bool = True,
+        lazy: bool = False,
+        fields: Optional[Iterable[str]] = None,
+    ) -> None:
+        """
+        Args:
+            path: Sysfs path of the node.
+            auto_load: Whether to read attributes from sysfs on construction.
+            lazy: Leave attributes unread; each one is read from sysfs the
+                first time it is accessed and then memoized.
+            fields: Only read these fields (IR names, e.g., "class") on
+                construction. Without `lazy`, the other fields stay None.
+        """
         self.path: str = path  # E.g., "/sys/devices/pci0000:e0/0000:e0:05.1".
+        self.parent: Optional["PcieNode"] = None  # Set when assigned as a child.
+        # Parsed once from the path; None for synthetic nodes (e.g., "0000:e1:00.x").
+        name = os.path.basename(path).lower()
+        self.bdf: Optional[str] = name if bdf_pattern.match(name) else None
+        self.children: List = []
+
+        if not lazy:
+            self.device: Optional[str] = None
+            self.vendor: Optional[str] = None
+            self.lspci_vmm: Optional[Dict] = (
+                None  # This device's record from `lspci -vvmm -D`.
+            )
+            self.class_: Optional[str] = None
+            self.numa_node: Optional[str] = None
+            self.max_link_speed: Optional[str] = None
+            self.current_link_speed: Optional[str] = None
+            self.max_link_width: Optional[str] = None
+            self.current_link_width: Optional[str] = None
+
+        if auto_load and (not lazy or fields) and os.path.exists(self.path):
+            self.load(fields)
 
-        self.device: Optional[str] = None
-        self.vendor: Optional[str] = None
-        self.lspci_vmm: Optional[Dict] = (
-            None  # Output of `lspci -vvm -d <vendor>:<device>`.
+    def __getattr__(self, name: str):
+        # Only reached for attributes that are not set yet, i.e., unread lazy fields.
+        if name in _SYSFS_FILES or name == "lspci_vmm":
+            if "path" not in self.__dict__:
+                raise AttributeError(name)
+            value = self._read_attribute(name)
+            setattr(self, name, value)
+            return value
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
         )
-        self.class_: Optional[str] = None
-        self.numa_node: Optional[str] = None
-        self.max_link_speed: Optional[str] = None
-        self.current_link_speed: Optional[str] = None
-        self.max_link_width: Optional[str] = None
-        self.current_link_width: Optional[str] = None
-        self.children: List = []
 
-        if auto_load and os.path.exists(self.path):
-            self.set_device()
-            self.set_vendor()
-            self.set_lspci_vmm()
-            self.set_class()
-            self.set_numa_node()
-            self.set_current_link_speed()
-            self.set_max_link_speed()
-            self.set_current_link_width()
-            self.set_max_link_width()
+    @property
+    def children(self) -> List["PcieNode"]:
+        return self._children
+
+    @children.setter
+    def children(self, children: List["PcieNode"]) -> None:
+        # Keep the parent back-references in sync with the child list.
+        self._children = children
+        for child in children:
+            child.parent = self
+
+    def is_loaded(self, field: str) -> bool:
+        """Whether `field` (IR or attribute name) has been read already."""
+        return resolve_fields([field])[0] in self.__dict__
+
+    def load(self, fields: Optional[Iterable[str]] = None) -> None:
+        """
+        Reads the attributes named by `fields` (all by default) from
+        sysfs and the lspci snapshot.
+        """
+        for attr in resolve_fields(fields):
+            setattr(self, attr, self._read_attribute(attr))
+
+    def _read_attribute(self, attr: str):
+        if attr == "lspci_vmm":
+            # Synthetic nodes (e.g., "0000:e1:00.x") have no lspci record.
+            if self.bdf is None:
+                return None
+            # Look the node up by address in the shared snapshot instead of
+            # forking `lspci -d <vendor>:<device>`, which matches every identical device.
+            return get_lspci_snapshot().get(self.bdf)
+        return PcieNode._read_file(os.path.join(self.path, _SYSFS_FILES[attr]))
 
     def to_dict(self) -> Dict:
         return {
@@ -75,7 +259,7 @@ class PcieNode:
     def _parse_lspci_vmm_output(output: str) -> Dict:
         """
         Args:
-            output: Output of `lspci -vvm -d <vendor>:<device>`.
+            output: A single device record of `lspci -vvmm`.
         Return:
             Hashmap of tag-value pairs.
         """
@@ -90,69 +274,31 @@ class PcieNode:
         return hashmap
 
     def set_lspci_vmm(self):
-        if not self.vendor and not self.device:
-            self.lspci_vmm = None
-            return
-
-        local_query_cmd = f"lspci -vvm -d {self.vendor}:{self.device}"
-        central_query_cmd = f"lspci -q -vvm -d {self.vendor}:{self.device}"
-
-        try:
-            local_query_stdout = subprocess.check_output(
-                local_query_cmd, text=True, shell=True
-            )
-            if local_query_stdout:
-                self.lspci_vmm = PcieNode._parse_lspci_vmm_output(local_query_stdout)
-                return
-        except Exception as _:
-            # Local quary failed. Try central quary next.
-            pass
-
-        try:
-            central_query_stdout = subprocess.check_output(
-                central_query_cmd, text=True, shell=True
-            )
-            if central_query_stdout:
-                self.lspci_vmm = PcieNode._parse_lspci_vmm_output(central_query_stdout)
-                return
-        except Exception as _:
-            # Central quary failed.
-            pass
-
-        # Both local and central queries failed.
-        self.lspci_vmm = None
+        self.lspci_vmm = self._read_attribute("lspci_vmm")
 
     def set_vendor(self):
-        file_path = os.path.join(self.path, "vendor")
-        self.vendor = PcieNode._read_file(file_path)
+        self.vendor = self._read_attribute("vendor")
 
     def set_device(self):
-        file_path = os.path.join(self.path, "device")
-        self.device = PcieNode._read_file(file_path)
+        self.device = self._read_attribute("device")
 
     def set_numa_node(self):
-        file_path = os.path.join(self.path, "numa_node")
-        self.numa_node = PcieNode._read_file(file_path)
+        self.numa_node = self._read_attribute("numa_node")
 
     def set_class(self):
-        file_path = os.path.join(self.path, "class")
-        self.class_ = PcieNode._read_file(file_path)
+        self.class_ = self._read_attribute("class_")
 
     def set_current_link_speed(self):
-        file_path = os.path.join(self.path, "current_link_speed")
-        self.current_link_speed = PcieNode._read_file(file_path)
+        self.current_link_speed = self._read_attribute("current_link_speed")
 
     def set_current_link_width(self):
-        file_path = os.path.join(self.path, "current_link_width")
-        self.current_link_width = PcieNode._read_file(file_path)
+        self.current_link_width = self._read_attribute("current_link_width")
 
     def set_max_link_speed(self):
-        file_path = os.path.join(self.path, "current_link_speed")
-        self.current_link_speed = PcieNode._read_file(file_path)
+        self.max_link_speed = self._read_attribute("max_link_speed")
 
     def set_max_link_width(self):
-        file_path = os.path.join(self.path, "current_max_width")
-        self.current_max_width = PcieNode._read_file(file_path)
+        self.max_link_width = self._read_attribute("max_link_width")
 
     def __str__(self) -> str:
         return (
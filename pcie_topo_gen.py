@@ -1,20 +1,28 @@
 import os
 import re  # Regular expression
-from typing import List
-from pcie_node import PcieNode
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from pcie_node import PcieNode, get_lspci_snapshot, iter_tree, reset_lspci_snapshot, resolve_fields
+from sysfs_index import get_sysfs_index, pci_container_pattern
 
-pci_container_pattern = re.compile(
-    r"^pci[0-9a-fA-F]{4}:[0-9a-fA-F]{2}$"
-)  # E.g., "pci0000:00"
 pci_node_pattern = re.compile(
     r"^[0-9a-fA-F]{4}:[0-9a-fA-F]{2}:[0-1][0-9a-fA-F]\.[0-7]$"
 )  # E.g., "0000:e1:00.0"
 
 
-def explore_pcie_container(path: str) -> List[PcieNode]:
+def explore_pcie_container(
+    path: str,
+    auto_load: bool = True,
+    lazy: bool = False,
+    fields: Optional[Iterable[str]] = None,
+    include: Optional[Set[str]] = None,
+) -> List[PcieNode]:
     """
     Args:
         path: Path to container.
+        auto_load: Whether to read node attributes while walking.
+        lazy, fields: Passed to every PcieNode (see PcieNode.__init__).
+        include: If given, only walk the top-level nodes with these paths.
     Return:
         List of nodes found in container.
     """
@@ -28,8 +36,10 @@ def explore_pcie_container(path: str) -> List[PcieNode]:
                 entry_name = entry.name
                 if pci_node_pattern.match(entry_name):
                     entry_path = entry.path
-                    node = PcieNode(entry_path)
-                    node.children = explore_pcie_container(entry_path)
+                    if include is not None and entry_path not in include:
+                        continue
+                    node = PcieNode(entry_path, auto_load=auto_load, lazy=lazy, fields=fields)
+                    node.children = explore_pcie_container(entry_path, auto_load, lazy, fields)
                     nodes.append(node)
     except Exception as e:
         print(f"Error exploring {path}: {e}")
@@ -37,28 +47,47 @@ def explore_pcie_container(path: str) -> List[PcieNode]:
     return nodes
 
 
-def _discover_pci_containers(path: str) -> List[str]:
+def iter_pcie_nodes(
+    path: str = "/sys/devices",
+    fields: Optional[Iterable[str]] = None,
+) -> Iterator[Tuple[PcieNode, Optional[PcieNode]]]:
     """
-    Discover PCI containers (pciXXXX:XX directories) by following symlinks
-    in /sys/bus/pci/devices/ and walking up to find the container parent.
-    Falls back to scanning the top level of `path` directly.
+    Walks the PCIe trees like a serial, unfiltered get_pcie_trees, but
+    yields each (node, parent) pair in pre-order as soon as the node is
+    read. Children are not attached, so a caller that writes each node out
+    (e.g., the JSON Lines IR) only holds the current path from its root.
     """
-    containers: set = set()
+    if fields is not None:
+        fields = resolve_fields(fields)
+    reset_lspci_snapshot()
 
-    # Primary: follow /sys/bus/pci/devices/ symlinks to find containers
-    bus_pci_dir = "/sys/bus/pci/devices"
-    if os.path.exists(bus_pci_dir):
+    def walk(dir_path: str, parent: Optional[PcieNode]) -> Iterator[Tuple[PcieNode, Optional[PcieNode]]]:
         try:
-            for dev in os.listdir(bus_pci_dir):
-                real_path = os.path.realpath(os.path.join(bus_pci_dir, dev))
-                parent = os.path.dirname(real_path)
-                while parent and parent != "/":
-                    if pci_container_pattern.match(os.path.basename(parent)):
-                        containers.add(parent)
-                        break
-                    parent = os.path.dirname(parent)
+            with os.scandir(dir_path) as it:
+                entries = [
+                    e.path for e in it if e.is_dir(follow_symlinks=False) and pci_node_pattern.match(e.name)
+                ]
         except Exception as e:
-            print(f"Error discovering PCI containers from {bus_pci_dir}: {e}")
+            print(f"Error exploring {dir_path}: {e}")
+            return
+        for entry_path in entries:
+            node = PcieNode(entry_path, fields=fields)
+            yield node, parent
+            yield from walk(entry_path, node)
+
+    for container in _discover_pci_containers(path):
+        yield from walk(container, None)
+
+
+def _discover_pci_containers(path: str) -> List[str]:
+    """
+    Discover PCI containers (pciXXXX:XX directories) from the shared
+    index of /sys/bus/pci/devices/, which resolves every device symlink
+    to its container parent in one pass.
+    Falls back to scanning the top level of `path` directly.
+    """
+    # Primary: containers of the devices in /sys/bus/pci/devices/
+    containers: set = set(get_sysfs_index().get_containers())
 
     # Fallback: scan top level of the sysfs devices path
     if not containers:
@@ -75,13 +104,123 @@ def _discover_pci_containers(path: str) -> List[str]:
     return sorted(containers)
 
 
-def get_pcie_trees(path: str = "/sys/devices") -> List[PcieNode]:
+def _prescan_matching_roots(node_filter) -> Optional[Set[str]]:
+    """
+    Cheap first pass for `node_filter`: checks every device of the sysfs
+    index, reading only the fields the filter needs, without walking or
+    building trees. Only sysfs criteria are checked, so the vendor tool
+    probes keep running in the background. Returns the paths of the roots (top-level devices of
+    a container) with a matching device below them, or None if the index
+    is empty. Roots left out cannot match; kept ones are re-checked on
+    their trees.
+    """
+    index = get_sysfs_index()
+    if not index.real_paths:
+        return None
+
+    matching: Set[str] = set()
+    for bdf, real_path in index.real_paths.items():
+        container = index.containers.get(bdf)
+        if container is None:
+            continue
+        root_name = real_path[len(container) + 1:].split("/", 1)[0]
+        root_path = os.path.join(container, root_name)
+        if root_path in matching:
+            continue
+        node = PcieNode(real_path, lazy=True, fields=node_filter.node_fields)
+        if node_filter.node_matches(node, sysfs_only=True):
+            matching.add(root_path)
+    return matching
+
+
+def _explore_containers_concurrently(
+    containers: List[str],
+    jobs: int,
+    lazy: bool = False,
+    fields: Optional[Iterable[str]] = None,
+    include: Optional[Set[str]] = None,
+) -> List[List[PcieNode]]:
+    """
+    Walks the containers in parallel without reading attributes, then
+    loads the attributes of every node in every subtree in parallel.
+    """
+    attrs = [] if lazy and not fields else resolve_fields(fields)
+    if "lspci_vmm" in attrs:
+        # Take the shared lspci snapshot once before the workers need it.
+        get_lspci_snapshot()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        container_nodes = list(
+            pool.map(lambda c: explore_pcie_container(c, auto_load=False, lazy=lazy, include=include), containers)
+        )
+        if attrs:
+            all_nodes = list(iter_tree([n for nodes in container_nodes for n in nodes]))
+            list(pool.map(lambda n: n.load(attrs), all_nodes))
+
+    return container_nodes
+
+
+def _load_trees(
+    roots: List[PcieNode],
+    jobs: int,
+    lazy: bool = False,
+    fields: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    Loads lazily walked trees as a non-lazy walk with `fields` would have:
+    the selected fields are read and, without `lazy`, the others are None.
+    """
+    attrs = resolve_fields(fields)
+    if lazy and fields is None:
+        return
+    skipped = [] if lazy else [a for a in resolve_fields(None) if a not in attrs]
+
+    def load(node: PcieNode) -> None:
+        node.load([a for a in attrs if a not in node.__dict__])
+        for attr in skipped:
+            if attr not in node.__dict__:
+                setattr(node, attr, None)
+
+    nodes = list(iter_tree(roots))
+    if "lspci_vmm" in attrs and jobs > 1:
+        get_lspci_snapshot()
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(load, nodes))
+    else:
+        for node in nodes:
+            load(node)
+
+
+def get_pcie_trees(
+    path: str = "/sys/devices",
+    jobs: Optional[int] = 1,
+    lazy: bool = False,
+    fields: Optional[Iterable[str]] = None,
+    node_filter=None,
+) -> List[PcieNode]:
     """
     Args:
         path: Sysfs path where PCIe devices are mounted.
+        jobs: Number of discovery threads. 1 walks serially;
+            0 or None uses one thread per CPU.
+        lazy: Read node attributes on first access instead of while walking.
+        fields: Only read these fields (IR names, e.g., "class") while walking.
+        node_filter: A filter_engine.CompiledFilter. A first pass reads only
+            the fields it needs for every device; only roots with a matching
+            device are walked, and only trees it accepts are loaded, so the
+            other trees' attributes and lspci records are never read.
+            Netdev/GPU criteria are checked last, after discovery.
     Returns:
         List of roots.
     """
+    if not jobs or jobs < 0:
+        jobs = os.cpu_count() or 1
+    if fields is not None:
+        fields = resolve_fields(fields)
+
+    # Each discovery takes its own lspci snapshot, shared by all nodes.
+    reset_lspci_snapshot()
     containers = _discover_pci_containers(path)
 
     if not containers:
@@ -89,13 +228,37 @@ def get_pcie_trees(path: str = "/sys/devices") -> List[PcieNode]:
     else:
         print(f"  Found {len(containers)} PCI container(s): {[os.path.basename(c) for c in containers]}", flush=True)
 
+    include = None
+    if node_filter is not None:
+        # Walk reading only the fields the filter needs.
+        walk_lazy, walk_fields = True, node_filter.fields or None
+        include = _prescan_matching_roots(node_filter)
+        if include is not None:
+            walked = {os.path.dirname(r) for r in include}
+            containers = [c for c in containers if c in walked]
+    else:
+        walk_lazy, walk_fields = lazy, fields
+
+    if jobs > 1:
+        per_container = _explore_containers_concurrently(containers, jobs, walk_lazy, walk_fields, include)
+    else:
+        per_container = [
+            explore_pcie_container(c, lazy=walk_lazy, fields=walk_fields, include=include) for c in containers
+        ]
+
     nodes: List[PcieNode] = []
-    for container in containers:
-        container_nodes = explore_pcie_container(container)
-        if not container_nodes:
+    for container, container_nodes in zip(containers, per_container):
+        if not container_nodes and include is None:
             print(f"  {os.path.basename(container)}: no PCI nodes found", flush=True)
         nodes.extend(container_nodes)
 
+    if node_filter is not None:
+        nodes = node_filter.filter_trees(nodes, sysfs_only=True)
+        _load_trees(nodes, jobs, lazy, fields)
+        if node_filter.needs_system_identifiers:
+            # Discovery is done; only now wait for the vendor tools.
+            nodes = node_filter.filter_trees(nodes)
+
     return nodes
 
 
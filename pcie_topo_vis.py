@@ -1,14 +1,18 @@
 from graphviz import Digraph
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 from os.path import basename
 from collections import deque
-from pcie_node import PcieNode
+from concurrent.futures import ThreadPoolExecutor
+from pcie_node import PcieNode, iter_tree, resolve_fields
 from pcie_topo_gen import get_pcie_trees
 from collections import defaultdict
+from functools import lru_cache
 from device_resolver import get_class_name
+from ir_io import IR_FORMATS, apply_nvlink_section, dump_ir, get_nvlink_section, load_ir_sections
+from system_identifiers import DEFAULT_PROBE_TIMEOUT, parse_probe_timeouts, start_vendor_probes
 import argparse
-import json
 import os
+import sys
 
 
 """
@@ -17,19 +21,27 @@ get_node_label
 """
 
 
+_GRAPHVIZ_ID_TABLE = str.maketrans({"/": "_", ":": "_", ".": "_", "-": "_"})
+# Enough ids for the largest single host (every node is looked up several
+# times per graph build), bounded for --watch and --from-ir-dir runs.
+_NODE_ID_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=_NODE_ID_CACHE_SIZE)
+def _sanitize_path(path: str) -> str:
+    return path.translate(_GRAPHVIZ_ID_TABLE)
+
+
 def get_node_id(n: PcieNode) -> str:
     """
     In a Graphviz Diagraph, the id of a node must be unique.
     In PCIe topology, sysfs paths are unique to nodes.
     The id for a given PcieNode `n` is its sysfs path.
     "/", ":", ".", and "-" cannot be in a valid Graphviz node id.
+    Ids are cached per path (least recently used ones are evicted).
     """
 
-    uns_p = n.path
-    san_p = (
-        uns_p.replace("/", "_").replace(":", "_").replace(".", "_").replace("-", "_")
-    )
-    return san_p
+    return _sanitize_path(n.path)
 
 
 def is_3d_controller(n: PcieNode):
@@ -80,10 +92,13 @@ def get_class_label(n: PcieNode) -> str:
         return n.class_ if n.class_ is not None else ""
 
 
-def get_node_label(n: PcieNode) -> str:
+def get_node_label(n: PcieNode, identifiers: Optional[Dict[str, Tuple]] = None) -> str:
     """
     Unlike node IDs, labels are displayed
     in the rendered Graphviz image.
+
+    `identifiers` optionally maps node paths to precomputed
+    system identifiers (see SystemIdentifierResolver.resolve_all).
     """
 
     label = basename(n.path) + "\n"
@@ -102,10 +117,11 @@ def get_node_label(n: PcieNode) -> str:
         label += f"device: {device_name} \n"
     
     #System identifiers (network interfaces, RDMA devices, GPU indices)
-    from system_identifiers import get_system_resolver
-    sys_resolver = get_system_resolver()
-    
-    netdev, rdma, gpu_idx, nvme = sys_resolver.get_all_identifiers(n.path)
+    if identifiers is not None and n.path in identifiers:
+        netdev, rdma, gpu_idx, nvme = identifiers[n.path]
+    else:
+        from system_identifiers import get_system_resolver
+        netdev, rdma, gpu_idx, nvme = get_system_resolver().get_all_identifiers(n)
     
     #Add network interface
     if netdev:
@@ -153,23 +169,14 @@ def get_node_parent(root: PcieNode, node: PcieNode) -> Optional[PcieNode]:
     Returns the parent for node `node` in
     tree with root `root`.
 
-    If `node` does not have a parent or
-    `node` parent is not found in tree
-    with root `root`, `None` is returned.
+    If `node` is `root` or does not have
+    a parent, `None` is returned.
     """
 
     if root is node:
         return None
 
-    for child in root.children:
-        if child is node:
-            return root
-
-        parent = get_node_parent(child, node)
-        if parent:
-            return parent
-
-    return None
+    return node.parent
 
 
 def get_node_siblings(root: PcieNode, node: PcieNode) -> Optional[List[PcieNode]]:
@@ -199,16 +206,16 @@ def get_node_mf_siblings(root: PcieNode, node: PcieNode) -> Optional[List[PcieNo
     if siblings is None:
         return None
 
-    node_basename = basename(node.path)
-    prefix = node_basename[:-1]
-    same_device_siblings = []
+    prefix = get_device_prefix(node)
+    return [s for s in siblings if get_device_prefix(s) == prefix]
 
-    for s in siblings:
-        s_basename = basename(s.path)
-        if s_basename.startswith(prefix):
-            same_device_siblings.append(s)
 
-    return same_device_siblings
+def get_device_prefix(n: PcieNode) -> str:
+    """
+    The BDF without the function, e.g., "0000:e1:00." for "0000:e1:00.1".
+    Functions of the same physical device share this prefix.
+    """
+    return basename(n.path)[:-1]
 
 
 """
@@ -286,23 +293,22 @@ def add_synth_mf_nodes(root: PcieNode) -> None:
     if root.children == []:
         return
 
-    processed_children = set()
-    new_children = []
-
+    # Group the children by device prefix in one pass, keeping first-seen order.
+    groups: Dict[str, List[PcieNode]] = {}
     for child in root.children:
-        if child in processed_children:
-            continue
+        groups.setdefault(get_device_prefix(child), []).append(child)
+
+    if len(groups) == len(root.children):
+        return
 
-        multifunction_siblings = get_node_mf_siblings(root, child)
-        if multifunction_siblings and len(multifunction_siblings) > 1:
-            prefix = basename(child.path)[:-1]
+    new_children = []
+    for prefix, multifunction_siblings in groups.items():
+        if len(multifunction_siblings) > 1:
             synth_multifunction_node = PcieNode(f"{prefix}x")
             synth_multifunction_node.children = multifunction_siblings
             new_children.append(synth_multifunction_node)
-            for sibling in multifunction_siblings:
-                processed_children.add(sibling)
         else:
-            new_children.append(child)
+            new_children.append(multifunction_siblings[0])
 
     root.children = new_children
 
@@ -331,104 +337,107 @@ def get_node_color(n: PcieNode) -> str:
     return "white"
 
 
-def graph_tree(root: PcieNode, graph: Digraph) -> None:
+def graph_tree(root: PcieNode, graph: Digraph, identifiers: Optional[Dict[str, Tuple]] = None) -> None:
     root_id = get_node_id(root)
-    root_label = get_node_label(root)
+    root_label = get_node_label(root, identifiers)
     node_color = get_node_color(root)
     graph.node(root_id, label=root_label, style="filled", fillcolor=node_color)
 
     for child in root.children:
         child_id = get_node_id(child)
         graph.edge(root_id, child_id)
-        graph_tree(child, graph)
+        graph_tree(child, graph, identifiers)
 
 
 """
+get_topology_clusters
 get_mf_clusters
 get_switch_clusters
 get_mf_switch_clusters
 """
 
 
-def get_mf_clusters(root: PcieNode) -> Dict:
-    clusters = {}
+def get_topology_clusters(root: PcieNode) -> Tuple[Dict, Dict, Dict]:
+    """
+    Classifies every node of the tree with root `root` once in a
+    single BFS and returns the (mf_switch, switch, mf) cluster maps.
+    """
+    mf_switch_clusters = {}
+    switch_clusters = {}
+    mf_clusters = {}
 
     q = deque()
-    q.append(root)
+    q.append((root, is_bridge(root)))
 
     while q:
-        curr = q.popleft()
-        if is_synth_mf(curr):
-            curr_id = get_node_id(curr)
-            cluster_name = f"mf_cluster_{curr_id}"
-            clusters[cluster_name] = [curr_id]
-            for c in curr.children:
-                c_id = get_node_id(c)
-                clusters[cluster_name].append(c_id)
+        curr, curr_is_bridge = q.popleft()
+        children = [(c, is_bridge(c)) for c in curr.children]
 
-        for c in curr.children:
-            q.append(c)
-
-    return clusters
+        if curr_is_bridge or is_synth_mf(curr):
+            curr_id = get_node_id(curr)
+            bridges = [c for c, c_is_bridge in children if c_is_bridge]
 
+            if curr_is_bridge and len(bridges) > 1:
+                switch_clusters[f"switch_{curr_id}"] = [curr_id] + [
+                    get_node_id(b) for b in bridges
+                ]
 
-def get_switch_clusters(root: PcieNode) -> Dict:
-    clusters = {}
+            if is_synth_mf(curr):
+                child_ids = [get_node_id(c) for c, _ in children]
+                mf_clusters[f"mf_cluster_{curr_id}"] = [curr_id] + child_ids
 
-    q = deque()
-    q.append(root)
+                if bridges and len(bridges) < len(children):
+                    ids = [curr_id]
+                    for b in bridges:
+                        ids.append(get_node_id(b))
+                        ids.extend(get_node_id(c) for c in b.children)
+                    ids.extend(
+                        c_id
+                        for (_, c_is_bridge), c_id in zip(children, child_ids)
+                        if not c_is_bridge
+                    )
+                    mf_switch_clusters[f"mf_switch_{curr_id}"] = ids
 
-    while q:
-        curr = q.popleft()
-        if is_switch(curr):
-            curr_id = get_node_id(curr)
-            cluster_name = f"switch_{curr_id}"
-            clusters[cluster_name] = [curr_id]
-            for c in curr.children:
-                if is_bridge(c):
-                    c_id = get_node_id(c)
-                    clusters[cluster_name].append(c_id)
+        q.extend(children)
 
-        for c in curr.children:
-            q.append(c)
+    return mf_switch_clusters, switch_clusters, mf_clusters
 
-    return clusters
 
+def get_mf_clusters(root: PcieNode) -> Dict:
+    return get_topology_clusters(root)[2]
 
-def get_mf_switch_clusters(root: PcieNode) -> Dict:
-    clusters = {}
 
-    q = deque()
-    q.append(root)
+def get_switch_clusters(root: PcieNode) -> Dict:
+    return get_topology_clusters(root)[1]
 
-    while q:
-        curr = q.popleft()
-        if is_mf_switch(curr):
-            curr_id = get_node_id(curr)
-            cluster_name = f"mf_switch_{curr_id}"
-            clusters[cluster_name] = [curr_id]
 
-            bridges = get_mf_switch_downstream_bridges(curr)
-            nonbridges = get_mf_switch_downstream_nonbridges(curr)
+def get_mf_switch_clusters(root: PcieNode) -> Dict:
+    return get_topology_clusters(root)[0]
 
-            for b in bridges:
-                b_id = get_node_id(b)
-                clusters[cluster_name].append(b_id)
-                for c in b.children:
-                    c_id = get_node_id(c)
-                    clusters[cluster_name].append(c_id)
 
-            for n in nonbridges:
-                n_id = get_node_id(n)
-                clusters[cluster_name].append(n_id)
+def add_clusters(graph: Digraph, clusters: Dict, color: str) -> None:
+    for name, ids in clusters.items():
+        with graph.subgraph(name=name) as cluster:
+            cluster.attr(
+                cluster="true",
+                label=name,
+                style="filled",
+                color=color,
+                pencolor="black",
+            )
 
-        for c in curr.children:
-            q.append(c)
+            for id in ids:
+                cluster.node(id)
 
-    return clusters
 
+def build_pcie_topology_graph(roots: List[PcieNode], numa: str, output_dir: str = ".", sys_resolver=None) -> Digraph:
+    """
+    Builds the Graphviz graph for the trees of NUMA node `numa`
+    without running the (slow) `dot` layout.
 
-def graph_pcie_topology(roots: List[PcieNode], numa: str, output_dir: str = ".") -> None:
+    `sys_resolver` provides the system identifiers and NVLink data
+    (default: the local system's, see get_system_resolver).
+    """
     graph_name = f"numa_{numa}"
     graph_label = f"numa_{numa}"
     graph_format = "pdf"
@@ -438,74 +447,33 @@ def graph_pcie_topology(roots: List[PcieNode], numa: str, output_dir: str = ".")
     # Set the output directory
     graph.directory = output_dir
 
-    for r in roots:
-        graph_tree(r, graph)
+    if sys_resolver is None:
+        from system_identifiers import get_system_resolver
+        sys_resolver = get_system_resolver()
+    identifiers = sys_resolver.resolve_all(iter_tree(roots))
 
     for r in roots:
-        mf_switch_clusters = get_mf_switch_clusters(r)
-        for name, ids in mf_switch_clusters.items():
-            with graph.subgraph(name=name) as mf_switch_cluster:
-                mf_switch_cluster.attr(
-                    cluster="true",
-                    label=name,
-                    style="filled",
-                    color="lightblue",
-                    pencolor="black",
-                )
-
-                for id in ids:
-                    mf_switch_cluster.node(id)
+        graph_tree(r, graph, identifiers)
 
-    for r in roots:
-        switch_clusters = get_switch_clusters(r)
-        for name, ids in switch_clusters.items():
-            with graph.subgraph(name=name) as switch_cluster:
-                switch_cluster.attr(
-                    cluster="true",
-                    label=name,
-                    style="filled",
-                    color="lightblue",
-                    pencolor="black",
-                )
-
-                for id in ids:
-                    switch_cluster.node(id)
+    root_clusters = [get_topology_clusters(r) for r in roots]
 
-    for r in roots:
-        mf_clusters = get_mf_clusters(r)
-        for name, ids in mf_clusters.items():
-            with graph.subgraph(name=name) as mf_cluster:
-                mf_cluster.attr(
-                    cluster="true",
-                    label=name,
-                    style="filled",
-                    color="yellow",
-                    pencolor="black",
-                )
-
-                for id in ids:
-                    mf_cluster.node(id)
+    for mf_switch_clusters, _, _ in root_clusters:
+        add_clusters(graph, mf_switch_clusters, "lightblue")
+
+    for _, switch_clusters, _ in root_clusters:
+        add_clusters(graph, switch_clusters, "lightblue")
+
+    for _, _, mf_clusters in root_clusters:
+        add_clusters(graph, mf_clusters, "yellow")
 
     # Add NVLink connections between GPU nodes
-    from system_identifiers import get_system_resolver
-    sys_resolver = get_system_resolver()
-    
     if sys_resolver.has_nvlink_topology():
         # Build mapping from GPU index to PCIe node ID
         gpu_to_node_id = {}
-        
-        def find_gpu_nodes(node: PcieNode):
-            """Recursively find GPU nodes and map them to GPU indices."""
-            gpu_idx = sys_resolver.get_gpu_index(node.path)
+        for node in iter_tree(roots):
+            gpu_idx = identifiers[node.path][2]
             if gpu_idx is not None:
-                node_id = get_node_id(node)
-                gpu_to_node_id[gpu_idx] = node_id
-            
-            for child in node.children:
-                find_gpu_nodes(child)
-        
-        for r in roots:
-            find_gpu_nodes(r)
+                gpu_to_node_id[gpu_idx] = get_node_id(node)
         
         # Add NVLink edges between GPUs
         processed_pairs = set()
@@ -532,12 +500,57 @@ def graph_pcie_topology(roots: List[PcieNode], numa: str, output_dir: str = ".")
                             constraint="false"  # Allow edge to cross clusters
                         )
 
-    graph.render(graph_name, view=False, cleanup=True)
+    return graph
+
+
+def render_graph(graph: Digraph) -> None:
+    """Runs `dot` on `graph` and writes `<directory>/<name>.pdf`."""
+    graph.render(graph.name, view=False, cleanup=True)
+
+
+def render_graphs(graphs: List[Digraph], jobs: Optional[int] = None) -> Iterator[Digraph]:
+    """
+    Renders `graphs` with at most `jobs` concurrent `dot` processes
+    (default: one per CPU) and yields each graph, in input order, once
+    it has been rendered.
+    """
+    if not jobs or jobs < 0:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(graphs)))
+
+    if jobs == 1:
+        for graph in graphs:
+            render_graph(graph)
+            yield graph
+        return
+
+    # `dot` runs as a subprocess, so threads are enough to overlap the renders.
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(render_graph, graph) for graph in graphs]
+        for graph, future in zip(graphs, futures):
+            future.result()
+            yield graph
+
+
+def get_numa_key(root: PcieNode) -> str:
+    return root.numa_node if root.numa_node is not None else "unknown"
+
+
+def group_by_numa(roots: List[PcieNode]) -> Dict[str, List[PcieNode]]:
+    numa_roots = defaultdict(list)
+    for r in roots:
+        numa_roots[get_numa_key(r)].append(r)
+    return numa_roots
+
+
+def graph_pcie_topology(roots: List[PcieNode], numa: str, output_dir: str = ".") -> None:
+    graph = build_pcie_topology_graph(roots, numa, output_dir)
+    render_graph(graph)
 
 
 if __name__ == "__main__":
     from filter_config import get_active_filters
-    from mappings import filter_trees_by_classes
+    from filter_engine import FilterSpec, compile_filter
     
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Visualize PCIe topology and generate PDF files.")
@@ -557,64 +570,266 @@ if __name__ == "__main__":
         type=str,
         help="Path to a previously dumped PCIe topology JSON file"
     )
+    parser.add_argument(
+        "--collect-only",
+        action="store_true",
+        help="Only collect the topology and the raw vendor tool outputs into an IR file "
+             "(--dump-ir, default: <output-dir>/<hostname>.json) for rendering elsewhere; "
+             "no names are resolved and nothing is rendered"
+    )
+    parser.add_argument(
+        "--from-ir-dir",
+        type=str,
+        metavar="DIR",
+        help="Render every IR dump in DIR (e.g., one per host) into <output-dir>/<host>/numa_N.pdf, "
+             "using --render-jobs worker processes"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="With --from-ir-dir, render each distinct topology once into <output-dir>/topologies/<fingerprint>/ "
+             "and write the host -> fingerprint index (with per-host overrides) to <output-dir>/fingerprints.json"
+    )
+    parser.add_argument(
+        "--diff",
+        nargs="+",
+        metavar="IR",
+        help="Compare IR dumps given as OLD NEW pairs and print the differences as JSON "
+             "(one line per pair when several pairs are given)"
+    )
+    parser.add_argument(
+        "--diff-graph",
+        action="store_true",
+        help="With --diff, also render each NEW topology with the differences highlighted"
+    )
+    parser.add_argument(
+        "--ir-format",
+        choices=IR_FORMATS,
+        help="Format written by --dump-ir: 'json' (nested, indented), 'jsonl' "
+             "(one record per node, streamed) or 'binary' (compact, memory-mapped on load). "
+             "Default: inferred from the file extension; --from-ir detects the format automatically"
+    )
+    parser.add_argument(
+        "--name-cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Persist resolved vendor/device/class names across runs "
+             "(default location: $XDG_CACHE_HOME/intrahost-topo/names.sqlite)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of threads used to discover PCIe trees; 0 uses one per CPU (default: 1)"
+    )
+    parser.add_argument(
+        "--render-jobs",
+        type=int,
+        default=0,
+        help="Maximum number of NUMA graphs (hosts with --from-ir-dir) rendered concurrently; "
+             "0 uses one per CPU (default: 0)"
+    )
+    parser.add_argument(
+        "--filter",
+        type=str,
+        metavar="SPEC",
+        help="Keep only trees with a matching device, e.g. 'class=0x03,0x0207;vendor=0x10de;netdev;numa=0'. "
+             "Overrides filter_config.py"
+    )
+    parser.add_argument(
+        "--filter-file",
+        type=str,
+        metavar="PATH",
+        help="Read the --filter spec from a JSON or YAML file"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After the first run, keep watching for PCI hotplug events and re-render the affected NUMA graphs"
+    )
+    parser.add_argument(
+        "--uevent-source",
+        type=str,
+        default="auto",
+        metavar="SOURCE",
+        help="Event source for --watch: 'auto' (netlink, else polling), 'netlink', 'poll', "
+             "or a file of uevent lines ('-' for stdin) (default: auto)"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between sysfs rescans when --watch polls (default: 2)"
+    )
+    parser.add_argument(
+        "--poll-links",
+        type=float,
+        metavar="SECONDS",
+        help="After the first run, re-read the current link speed/width of every device every SECONDS "
+             "and print changes as JSON lines"
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        action="append",
+        default=[],
+        metavar="[TOOL=]SECONDS",
+        help="Timeout for the vendor tool probes (nvidia-smi, amd-smi, nvidia-smi-topo) and the NVML session (nvml); "
+             "may be repeated to set per-tool timeouts (default: %g)" % DEFAULT_PROBE_TIMEOUT
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Read node attributes from sysfs only when they are first needed"
+    )
+    parser.add_argument(
+        "--fields",
+        type=str,
+        help="Comma-separated node fields to read during discovery, e.g. 'vendor,device,class' (default: all)"
+    )
     args = parser.parse_args()
 
-    if args.dump_ir and args.from_ir:
-        parser.error("Specify only one of --dump-ir or --from-ir.")
+    if sum(1 for a in (args.dump_ir, args.from_ir, args.from_ir_dir) if a) > 1:
+        parser.error("Specify only one of --dump-ir, --from-ir or --from-ir-dir.")
+
+    if args.diff:
+        if len(args.diff) % 2:
+            parser.error("--diff takes OLD NEW pairs of IR files.")
+        from topology_diff import build_diff_graph, diff_ir_files, write_diff
+        if args.output_dir != ".":
+            os.makedirs(args.output_dir, exist_ok=True)
+        pairs = list(zip(args.diff[0::2], args.diff[1::2]))
+        diff_graphs = []
+        for i, (old_path, new_path) in enumerate(pairs):
+            try:
+                report, new_roots = diff_ir_files(old_path, new_path)
+            except (OSError, ValueError) as e:
+                parser.error(f"--diff: {e}")
+            write_diff(sys.stdout, report, compact=len(pairs) > 1)
+            if args.diff_graph:
+                name = "topology_diff" if len(pairs) == 1 else f"topology_diff_{i}"
+                diff_graphs.append(build_diff_graph(new_roots, report, name, args.output_dir))
+        for graph in render_graphs(diff_graphs, args.render_jobs):
+            print(f"✓ Generated {graph.name}.pdf", file=sys.stderr, flush=True)
+        exit(0)
+    if args.watch and (args.from_ir or args.from_ir_dir):
+        parser.error("--watch needs a live sysfs and cannot be combined with --from-ir or --from-ir-dir.")
+    if args.poll_links is not None:
+        if args.from_ir or args.from_ir_dir or args.watch:
+            parser.error("--poll-links cannot be combined with --from-ir, --from-ir-dir or --watch.")
+        if args.poll_links <= 0:
+            parser.error("--poll-links must be positive.")
+    if args.dedup and not args.from_ir_dir:
+        parser.error("--dedup requires --from-ir-dir.")
+    if args.collect_only and (args.from_ir or args.from_ir_dir or args.watch or args.poll_links is not None):
+        parser.error("--collect-only cannot be combined with --from-ir, --from-ir-dir, --watch or --poll-links.")
+
+    try:
+        probe_timeouts = parse_probe_timeouts(args.probe_timeout)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.collect_only:
+        from collector import collect, default_collect_path
+        if args.output_dir != ".":
+            os.makedirs(args.output_dir, exist_ok=True)
+        ir_path = args.dump_ir or default_collect_path(args.output_dir)
+        print(f"Collecting PCIe topology into {ir_path}...", flush=True)
+        stats = collect(ir_path, args.ir_format, args.jobs, probe_timeouts)
+        print(
+            f"✓ Collected {stats['devices']} device(s) in {stats['wall']:.2f}s "
+            f"(CPU: {stats['cpu']:.2f}s collector, {stats['tools_cpu']:.2f}s vendor tools)",
+            flush=True,
+        )
+        exit(0)
+
+    if args.filter and args.filter_file:
+        parser.error("Specify only one of --filter or --filter-file.")
+
+    try:
+        if args.filter:
+            filter_spec = FilterSpec.parse(args.filter)
+        elif args.filter_file:
+            filter_spec = FilterSpec.load(args.filter_file)
+        else:
+            # Class labels selected in filter_config.py
+            filter_spec = FilterSpec.from_class_labels(get_active_filters())
+        node_filter = compile_filter(filter_spec)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid filter: {e}")
+
+    node_fields = None
+    if args.fields:
+        try:
+            node_fields = resolve_fields(args.fields.split(","))
+        except ValueError as e:
+            parser.error(str(e))
     
     # Create output directory if it doesn't exist
     if args.output_dir != ".":
         os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.name_cache is not None:
+        from device_resolver import get_device_resolver
+        from name_cache import NameCache
+        if not get_device_resolver().attach_cache(NameCache(args.name_cache or None)):
+            print("Warning: name cache is unavailable; resolving names without it", flush=True)
+
+    if args.from_ir_dir:
+        from batch_render import run_batch
+        if not os.path.isdir(args.from_ir_dir):
+            parser.error(f"--from-ir-dir: {args.from_ir_dir} is not a directory.")
+        results = run_batch(args.from_ir_dir, args.output_dir, args.render_jobs, node_filter, args.dedup)
+        exit(1 if any(r.error is not None for r in results) else 0)
     
     if args.from_ir:
         print(f"Loading PCIe topology from {args.from_ir}...", flush=True)
-        with open(args.from_ir, "r") as f:
-            ir_data = json.load(f)
-        
-        # Handle both old format (list of nodes) and new format (dict with nodes and nvlink)
-        if isinstance(ir_data, dict):
-            roots = [PcieNode.from_dict(node) for node in ir_data.get("pcie_topology", [])]
+        try:
+            roots, nvlink_data, host_section = load_ir_sections(args.from_ir)
+        except (OSError, ValueError) as e:
+            parser.error(f"--from-ir: {e}")
+        if host_section is not None:
+            # Collected with --collect-only: resolve the host's identifiers from its raw captures.
+            from system_identifiers import SystemIdentifierResolver, set_system_resolver
+            set_system_resolver(SystemIdentifierResolver.from_ir(nvlink_data, host_section))
+            print(f"✓ Loaded identifiers collected on {host_section.get('hostname', 'unknown host')}", flush=True)
+        else:
+            # Older dumps carry no captures; GPU indices come from this host's vendor tools.
+            start_vendor_probes(probe_timeouts)
             # Restore NVLink topology if present
-            if "nvlink_topology" in ir_data:
+            if nvlink_data is not None:
                 from system_identifiers import get_system_resolver
-                sys_resolver = get_system_resolver()
-                nvlink_data = ir_data["nvlink_topology"]
-                # Convert string keys to integers (JSON uses string keys for object keys)
-                sys_resolver.gpu_to_pci = {
-                    int(k): v for k, v in nvlink_data.get("gpu_to_pci", {}).items()
-                }
-                sys_resolver.nvlink_connections = {
-                    int(k): {int(k2): v2 for k2, v2 in v.items()}
-                    for k, v in nvlink_data.get("nvlink_connections", {}).items()
-                }
+                apply_nvlink_section(get_system_resolver(), nvlink_data)
                 print("✓ Loaded NVLink topology", flush=True)
-        else:
-            # Old format: just a list of nodes
-            roots = [PcieNode.from_dict(node) for node in ir_data]
         print("✓ Loaded PCIe topology", flush=True)
+        if node_filter is not None:
+            roots = node_filter.filter_trees(roots)
     else:
+        # Vendor tools run in the background while sysfs is scanned.
+        start_vendor_probes(probe_timeouts)
         print("Scanning PCIe device trees...", flush=True)
-        roots = get_pcie_trees("/sys/devices")
+        # The IR dump and --watch hold the whole topology, so only prune without them.
+        roots = get_pcie_trees(
+            "/sys/devices", jobs=args.jobs, lazy=args.lazy, fields=node_fields,
+            node_filter=None if args.dump_ir or args.watch else node_filter,
+        )
         print(f"✓ PCIe device trees scanned ({len(roots)} root device(s) found)", flush=True)
         if args.dump_ir:
             print(f"Writing PCIe topology to {args.dump_ir}...", flush=True)
             # Include NVLink topology in dump if available
             from system_identifiers import get_system_resolver
-            sys_resolver = get_system_resolver()
-            dump_data = {
-                "pcie_topology": [root.to_dict() for root in roots]
-            }
-            if sys_resolver.has_nvlink_topology():
-                dump_data["nvlink_topology"] = {
-                    "gpu_to_pci": sys_resolver.gpu_to_pci,
-                    "nvlink_connections": sys_resolver.nvlink_connections
-                }
-            with open(args.dump_ir, "w") as f:
-                json.dump(dump_data, f, indent=2)
+            dump_ir(args.dump_ir, roots, get_nvlink_section(get_system_resolver()), args.ir_format)
             print("✓ Topology dump completed", flush=True)
+    all_roots = roots
+    if node_filter is not None and (args.dump_ir or args.watch):
+        roots = node_filter.filter_trees(roots)
     
-    if not roots:
-        print("No PCIe devices found in /sys/devices. Nothing to visualize.", flush=True)
+    if not roots and not args.watch:
+        if node_filter is not None:
+            print("No trees match the active filters.", flush=True)
+        else:
+            print("No PCIe devices found in /sys/devices. Nothing to visualize.", flush=True)
         exit(0)
 
     # Ignore childless roots.
@@ -623,26 +838,16 @@ if __name__ == "__main__":
         if r.children != []:
             roots_with_children.append(r)
 
-    if len(roots_with_children) == 0:
+    if len(roots_with_children) == 0 and roots:
         print(f"No PCIe device trees found (all {len(roots)} root(s) are childless). This is likely a VM with a flat PCIe topology.", flush=True)
         roots_with_children = roots
 
-    # Add synthetic multifunction nodes.
-    for r in roots_with_children:
+    # Add synthetic multifunction nodes (to every tree when watching, so all can be patched).
+    for r in (all_roots if args.watch else roots_with_children):
         add_synth_mf_nodes(r)
 
-    """
-    Apply the filters specified in the filter_config.py file.
-    """
-    
-    active_filters = get_active_filters()
-    if active_filters:
-        filtered_roots = filter_trees_by_classes(roots_with_children, active_filters)
-        if not filtered_roots:
-            print("No trees match the active filters.", flush=True)
-            exit(0)
-    else:
-        filtered_roots = roots_with_children
+    # Trees were already filtered (--filter, --filter-file or filter_config.py) during discovery.
+    filtered_roots = roots_with_children
 
     # Check for NVLink topology (will be integrated into NUMA graphs)
     from system_identifiers import get_system_resolver
@@ -650,18 +855,55 @@ if __name__ == "__main__":
     if sys_resolver.has_nvlink_topology():
         print("NVLink connections detected - will be displayed in NUMA topology graphs", flush=True)
     
-    numa_roots = defaultdict(list)
-    for r in filtered_roots:
-        numa_key = r.numa_node if r.numa_node is not None else "unknown"
-        numa_roots[numa_key].append(r)
+    numa_roots = group_by_numa(filtered_roots)
 
-    if not numa_roots:
+    if not numa_roots and not args.watch:
         print("No devices to visualize after NUMA grouping.", flush=True)
         exit(0)
 
     print(f"NUMA grouping: {{{', '.join(f'{k}: {len(v)} device(s)' for k, v in numa_roots.items())}}}", flush=True)
 
+    numa_graphs = []
     for numa, roots in numa_roots.items():
         print(f"Generating topology visualization for NUMA node {numa}...", flush=True)
-        graph_pcie_topology(roots, numa, args.output_dir)
-        print(f"✓ Generated numa_{numa}.pdf", flush=True)
\ No newline at end of file
+        numa_graphs.append(build_pcie_topology_graph(roots, numa, args.output_dir))
+
+    from device_resolver import get_device_resolver
+    get_device_resolver().save_cache()
+
+    for graph in render_graphs(numa_graphs, args.render_jobs):
+        print(f"✓ Generated {graph.name}.pdf", flush=True)
+
+    if args.watch:
+        from topology_watch import TopologyWatcher, open_uevent_source
+
+        def render_numa(numa: str, roots: List[PcieNode]) -> None:
+            if not roots:
+                pdf_path = os.path.join(args.output_dir, f"numa_{numa}.pdf")
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
+                print(f"✓ Removed {pdf_path} (no devices left)", flush=True)
+                return
+            graph = build_pcie_topology_graph(roots, numa, args.output_dir)
+            # Persist the names of hot-added devices (a no-op if none are new).
+            get_device_resolver().save_cache()
+            render_graph(graph)
+            print(f"✓ Regenerated {graph.name}.pdf", flush=True)
+
+        try:
+            source = open_uevent_source(args.uevent_source, args.poll_interval)
+        except OSError as e:
+            print(f"Error: cannot open uevent source {args.uevent_source}: {e}", flush=True)
+            exit(1)
+        print("Watching for PCI hotplug events (Ctrl-C to stop)...", flush=True)
+        TopologyWatcher(all_roots, render_numa, node_filter).run(source)
+
+    if args.poll_links is not None:
+        from link_monitor import LinkMonitor
+        monitor = LinkMonitor(filtered_roots)
+        print(f"Polling {len(monitor.links)} link(s) every {args.poll_links:g}s (Ctrl-C to stop)...", flush=True)
+        if monitor.reopened:
+            print(f"  {monitor.reopened} link file(s) over the open-file limit are reopened on every poll", flush=True)
+        if monitor.failed:
+            print(f"Warning: {monitor.failed} link(s) could not be opened; their changes are not reported", flush=True)
+        monitor.run(args.poll_links)
\ No newline at end of file
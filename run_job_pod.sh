@@ -2,12 +2,31 @@
 
 # This script will create a pod that will run the topo-vis-container and then copy the output files to the client.
 # Usage: ./run_job_pod.sh <node-name> [--request-nvidia-gpus <N>] [--request-amd-gpus <N>] [--request-rdma <resource_key: count>] [--debug]
+#
+# Fleet mode: collect from many nodes at once, one uniquely named pod per node,
+# at most --parallel pods at a time. Output goes to <output-dir>/<node-name>/.
+#   ./run_job_pod.sh --nodes <n1,n2,...> | --nodes-file <file> | --selector <label-selector> | <n1> <n2> ...
+#                    [--parallel <N>] [--output-dir <dir>] [--dump-ir | --collect-only] [other options as above]
+#
+# Set $KUBECTL to use another kubectl binary (e.g., a stub for testing).
+
+KUBECTL="${KUBECTL:-kubectl}"
 
 nvidia_gpu_count=""
 amd_gpu_count=""
 rdma_resource=""
 debug_mode=false
-NODE_NAME=""
+dump_ir=false
+collect_only=false
+parallel=8
+output_dir=""
+node_selector=""
+NODES=()
+
+usage() {
+    echo "Usage: $0 <node-name> [--request-nvidia-gpus <N>] [--request-amd-gpus <N>] [--request-rdma <resource_key: count>] [--debug]"
+    echo "       $0 --nodes <n1,n2,...> | --nodes-file <file> | --selector <label-selector> | <n1> <n2> ... [--parallel <N>] [--output-dir <dir>] [--dump-ir | --collect-only] [...]"
+}
 
 while [[ $# -gt 0 ]]; do
     case $1 in
@@ -27,21 +46,70 @@ while [[ $# -gt 0 ]]; do
             debug_mode=true
             shift
             ;;
-        *)
-            if [ -z "$NODE_NAME" ]; then
-                NODE_NAME="$1"
-            else
-                echo "Error: Unknown argument '$1'"
-                echo "Usage: $0 <node-name> [--request-nvidia-gpus <N>] [--request-amd-gpus <N>] [--request-rdma <resource_key: count>] [--debug]"
+        --nodes)
+            IFS=',' read -r -a listed_nodes <<< "$2"
+            NODES+=("${listed_nodes[@]}")
+            shift 2
+            ;;
+        --nodes-file)
+            if [ ! -r "$2" ]; then
+                echo "Error: Cannot read node list '$2'"
                 exit 1
             fi
+            # One node name per line; blank lines and '#' comments are ignored
+            while read -r node _; do
+                [ -n "$node" ] && [[ "$node" != \#* ]] && NODES+=("$node")
+            done < "$2"
+            shift 2
+            ;;
+        --selector)
+            node_selector="$2"
+            shift 2
+            ;;
+        --parallel)
+            parallel="$2"
+            shift 2
+            ;;
+        --output-dir)
+            output_dir="$2"
+            shift 2
+            ;;
+        --dump-ir)
+            dump_ir=true
+            shift
+            ;;
+        --collect-only)
+            collect_only=true
+            shift
+            ;;
+        -*)
+            echo "Error: Unknown argument '$1'"
+            usage
+            exit 1
+            ;;
+        *)
+            NODES+=("$1")
             shift
             ;;
     esac
 done
 
-if [ -z "$NODE_NAME" ]; then
-    echo "Usage: $0 <node-name> [--request-nvidia-gpus <N>] [--request-amd-gpus <N>] [--request-rdma <resource_key: count>] [--debug]"
+if [ -n "$node_selector" ]; then
+    selected_nodes=$("$KUBECTL" get nodes -l "$node_selector" -o jsonpath='{.items[*].metadata.name}')
+    if [ $? -ne 0 ]; then
+        echo "Error: Failed to list nodes matching '$node_selector'"
+        exit 1
+    fi
+    if [ -z "$selected_nodes" ]; then
+        echo "Error: No nodes match '$node_selector'"
+        exit 1
+    fi
+    read -r -a selected_nodes <<< "$selected_nodes"
+    NODES+=("${selected_nodes[@]}")
+fi
+
+if [ ${#NODES[@]} -eq 0 ]; then
+    usage
     echo ""
     echo "Arguments:"
     echo "  <node-name>                          Name of the Kubernetes node to deploy the pod on"
@@ -49,23 +117,49 @@ if [ -z "$NODE_NAME" ]; then
     echo "  --request-amd-gpus <N>               Optional: Number of AMD GPUs to request (omitted if not specified)"
     echo "  --request-rdma <resource_key: count> Optional: RDMA resource to request, e.g. \"rdma/shared_ib: 1\" (omitted if not specified)"
     echo "  --debug                              Optional: Show container logs and output directory listing"
+    echo ""
+    echo "Fleet mode:"
+    echo "  --nodes <n1,n2,...>                  Comma-separated node names (or pass several node names)"
+    echo "  --nodes-file <file>                  File with one node name per line"
+    echo "  --selector <label-selector>          Collect from all nodes matching a label selector, e.g. \"nvidia.com/gpu.present=true\""
+    echo "  --parallel <N>                       Maximum number of pods running at once (default: 8)"
+    echo "  --output-dir <dir>                   Directory for the per-node output directories (default: ./topo-output)"
+    echo "  --dump-ir                            Also collect the topology IR (topology.json) of every node"
+    echo "  --collect-only                       Only collect the IR (topology.json) on the nodes; render it locally with"
+    echo "                                       python3 pcie_topo_vis.py --from-ir-dir <output-dir>"
     exit 1
 fi
 
-TEMP_YAML="job-pod-temp.yaml"
+if ! [[ "$parallel" =~ ^[1-9][0-9]*$ ]]; then
+    echo "Error: --parallel must be a positive integer"
+    exit 1
+fi
+
+# A single node without --output-dir keeps the original <node>_<file> output in the current directory
+fleet_mode=false
+if [ ${#NODES[@]} -gt 1 ] || [ -n "$node_selector" ] || [ -n "$output_dir" ]; then
+    fleet_mode=true
+    output_dir="${output_dir:-./topo-output}"
+    mkdir -p "$output_dir" || exit 1
+fi
+
+# Pods of this run are labeled with its ID so they can be cleaned up together
+RUN_ID="$(date +%s)-$$"
+TEMP_DIR=$(mktemp -d)
 
 # Cleanup function
 cleanup() {
   echo "Cleaning up..."
-  kubectl delete pod host-topo-job 2>/dev/null || true
-  rm -f "$TEMP_YAML"
+  "$KUBECTL" delete pod -l "host-topo-run=$RUN_ID" --wait=false >/dev/null 2>&1 || true
+  rm -rf "$TEMP_DIR"
 }
 
 # Set trap to cleanup on exit
 trap cleanup EXIT
+trap 'exit 130' INT TERM
 
 # Build sed command using '|' as delimiter to avoid conflicts with '/' in resource names
-sed_cmd="s|REPLACE_NODE_NAME|$NODE_NAME|"
+sed_cmd="s|REPLACE_RUN_ID|$RUN_ID|"
 
 # Handle NVIDIA GPU: substitute if provided, delete lines if not
 if [ -n "$nvidia_gpu_count" ]; then
@@ -93,6 +187,15 @@ if [ -z "$nvidia_gpu_count" ] && [ -z "$amd_gpu_count" ] && [ -z "$rdma_resource
     sed_cmd="$sed_cmd;/^    resources:$/d;/^      requests:$/d;/^      limits:$/d"
 fi
 
+# Extra arguments of the visualizer
+if [ "$collect_only" = true ]; then
+    sed_cmd="$sed_cmd;s|REPLACE_CONTAINER_ARGS|[\"--collect-only\", \"--dump-ir\", \"/output/topology.json\"]|"
+elif [ "$dump_ir" = true ]; then
+    sed_cmd="$sed_cmd;s|REPLACE_CONTAINER_ARGS|[\"--dump-ir\", \"/output/topology.json\"]|"
+else
+    sed_cmd="$sed_cmd;s|REPLACE_CONTAINER_ARGS|[]|"
+fi
+
 # Build resource info message
 resource_info=""
 if [ -n "$nvidia_gpu_count" ]; then
@@ -107,84 +210,154 @@ if [ -n "$rdma_resource" ]; then
     resource_info="${resource_info}$rdma_resource"
 fi
 
-echo "Applying pod configuration for node: $NODE_NAME"
-if [ -n "$resource_info" ]; then
-    echo "  Requesting: $resource_info"
-fi
+# Unique, DNS-compatible pod name for a node: host-topo-<node>-<hash>, at most 63 characters
+pod_name() {
+    local node="$1"
+    local slug hash
+    slug=$(echo "$node" | tr '[:upper:]' '[:lower:]' | tr -c 'a-z0-9-\n' '-' | cut -c1-40)
+    hash=$(printf '%s-%s' "$RUN_ID" "$node" | cksum | cut -d' ' -f1)
+    echo "host-topo-${slug%-}-${hash}"
+}
 
-# Create a temporary YAML with substitutions applied
-sed -e "$sed_cmd" job-pod.yaml > "$TEMP_YAML"
-kubectl apply -f "$TEMP_YAML"
-
-# Wait for the pod to be scheduled (assigned to a node)
-echo "Waiting for pod to be scheduled..."
-kubectl wait --for=condition=PodScheduled pod/host-topo-job --timeout=300s
-
-# For DEBUGGING: Check for image pull errors in all containers
-# echo "Checking for image pull errors..."
-# for i in {1..30}; do
-#   sleep 2
-#   IMAGE_PULL_ERRORS=$(kubectl get pod host-topo-job -o jsonpath='{.status.containerStatuses[*].state.waiting.reason}' 2>/dev/null)
-#   if echo "$IMAGE_PULL_ERRORS" | grep -q "ImagePullBackOff\|ErrImagePull"; then
-#     echo "Error: Failed to pull container image(s)"
-#     kubectl describe pod host-topo-job | grep -A 10 "Events:"
-#     exit 1
-#   fi
-  
-#   # Check if both containers are ready or at least running
-#   CONTAINERS_READY=$(kubectl get pod host-topo-job -o jsonpath='{.status.containerStatuses[*].ready}' 2>/dev/null)
-#   if [ ! -z "$CONTAINERS_READY" ]; then
-#     # At least one status exists, images are pulling or pulled
-#     break
-#   fi
-# done
-
-# Wait for the topo-vis-container to finish generating the PDFs
-# (The helper container keeps the pod alive for file copying)
-echo "Waiting for topo-vis-container to complete..."
-while true; do
-  sleep 2  # check every 2 seconds
-  CONTAINER_STATE=$(kubectl get pod host-topo-job -o jsonpath='{.status.containerStatuses[?(@.name=="topo-vis-container")].state}')
-  if echo "$CONTAINER_STATE" | grep -q "terminated"; then
-    EXIT_CODE=$(kubectl get pod host-topo-job -o jsonpath='{.status.containerStatuses[?(@.name=="topo-vis-container")].state.terminated.exitCode}')
-    if [ "$EXIT_CODE" = "0" ]; then
-      echo "topo-vis-container completed successfully"
-      break
+# Blocks until topo-vis-container terminates, watching the pod instead of polling it.
+# Prints the container's exit code (empty on timeout).
+wait_for_container() {
+    local pod="$1"
+    local exit_code=""
+    local watch_fd watcher
+    exec {watch_fd}< <("$KUBECTL" get pod "$pod" --watch --request-timeout=3600s \
+        -o jsonpath='{.status.containerStatuses[?(@.name=="topo-vis-container")].state.terminated.exitCode}{"\n"}' 2>/dev/null)
+    watcher=$!
+    while read -r -u "$watch_fd" exit_code; do
+        [ -n "$exit_code" ] && break
+    done
+    kill "$watcher" 2>/dev/null
+    exec {watch_fd}<&-
+    echo "$exit_code"
+}
+
+# Runs the visualizer pod on one node and copies its output files.
+# Files are copied to <dest_dir>/<prefix><file>.
+collect_node() {
+    local node="$1"
+    local dest_dir="$2"
+    local prefix="$3"
+    local pod
+    pod=$(pod_name "$node")
+    local pod_yaml="$TEMP_DIR/$pod.yaml"
+
+    echo "Applying pod configuration for node: $node (pod $pod)"
+    if [ -n "$resource_info" ]; then
+        echo "  Requesting: $resource_info"
+    fi
+
+    # Create a temporary YAML with substitutions applied
+    sed -e "$sed_cmd;s|REPLACE_NODE_NAME|$node|;s|REPLACE_POD_NAME|$pod|" job-pod.yaml > "$pod_yaml"
+    if ! "$KUBECTL" apply -f "$pod_yaml"; then
+        echo "Error: Failed to create pod $pod"
+        return 1
+    fi
+
+    # Wait for the pod to be scheduled (assigned to a node)
+    echo "Waiting for pod to be scheduled..."
+    if ! "$KUBECTL" wait --for=condition=PodScheduled "pod/$pod" --timeout=300s; then
+        echo "Error: Pod $pod was not scheduled"
+        "$KUBECTL" delete pod "$pod" --wait=false >/dev/null 2>&1
+        return 1
+    fi
+
+    # Wait for the topo-vis-container to finish generating the PDFs
+    # (The helper container keeps the pod alive for file copying)
+    echo "Waiting for topo-vis-container to complete..."
+    local exit_code
+    exit_code=$(wait_for_container "$pod")
+    if [ "$exit_code" = "0" ]; then
+        echo "topo-vis-container completed successfully"
+    elif [ -z "$exit_code" ]; then
+        echo "Error: Timed out waiting for topo-vis-container"
+        "$KUBECTL" delete pod "$pod" --wait=false >/dev/null 2>&1
+        return 1
     else
-      echo "Error: topo-vis-container failed with exit code $EXIT_CODE"
-      exit 1
+        echo "Error: topo-vis-container failed with exit code $exit_code"
+        "$KUBECTL" logs "$pod" -c topo-vis-container 2>/dev/null | tail -n 20
+        "$KUBECTL" delete pod "$pod" --wait=false >/dev/null 2>&1
+        return 1
     fi
-  fi
-done
 
-sleep 2
-
-if [ "$debug_mode" = true ]; then
-  echo ""
-  echo "=== topo-vis-container logs ==="
-  kubectl logs host-topo-job -c topo-vis-container
-  echo "=== end logs ==="
-  echo ""
-  echo "Contents of /output directory:"
-  kubectl exec host-topo-job -c helper-container -- ls -la /output
-  echo ""
-fi
+    if [ "$debug_mode" = true ]; then
+      echo ""
+      echo "=== topo-vis-container logs ==="
+      "$KUBECTL" logs "$pod" -c topo-vis-container
+      echo "=== end logs ==="
+      echo ""
+      echo "Contents of /output directory:"
+      "$KUBECTL" exec "$pod" -c helper-container -- ls -la /output
+      echo ""
+    fi
+
+    # List the output files (get just the filenames, not full paths)
+    echo "Listing generated files..."
+    local output_files
+    output_files=$("$KUBECTL" exec "$pod" -c helper-container -- find /output -type f \( -name "*.pdf" -o -name "*.json" \) -exec basename {} \;)
+
+    local expected="pdf"
+    [ "$collect_only" = true ] && expected="json"
+    if ! echo "$output_files" | grep -q "\.$expected\$"; then
+      echo "Error: No ${expected^^} files found in /output directory"
+      "$KUBECTL" delete pod "$pod" --wait=false >/dev/null 2>&1
+      return 1
+    fi
 
-# List the output files (get just the filenames, not full paths)
-echo "Listing generated PDF files..."
-output_files=$(kubectl exec host-topo-job -c helper-container -- find /output -name "*.pdf" -type f -exec basename {} \;)
+    echo -e "Found files:\n${output_files}"
 
-if [ -z "$output_files" ]; then
-  echo "Error: No PDF files found in /output directory"
-  exit 1
+    # Copy the output files from the helper container (which has access to the shared volume)
+    local file status=0
+    for file in $output_files; do
+      echo "Copying $file to $dest_dir/$prefix$file"
+      "$KUBECTL" cp "$pod:/output/$file" "$dest_dir/$prefix$file" -c helper-container || status=1
+    done
+
+    "$KUBECTL" delete pod "$pod" --wait=false >/dev/null 2>&1
+    return $status
+}
+
+if [ "$fleet_mode" = false ]; then
+    collect_node "${NODES[0]}" "." "${NODES[0]}_" || exit 1
+    echo "Done!"
+    exit 0
 fi
 
-echo -e "Found PDF files:\n${output_files}"
+# Fleet mode: one background collection per node, at most $parallel at a time
+echo "Collecting from ${#NODES[@]} node(s), up to $parallel at a time, into $output_dir"
+running=0
+for node in "${NODES[@]}"; do
+    if [ "$running" -ge "$parallel" ]; then
+        wait -n
+        running=$((running - 1))
+    fi
+    node_dir="$output_dir/$node"
+    mkdir -p "$node_dir"
+    rm -f "$node_dir/FAILED"
+    (
+        if collect_node "$node" "$node_dir" "" > "$node_dir/collect.log" 2>&1; then
+            echo "✓ $node"
+        else
+            touch "$node_dir/FAILED"
+            echo "✗ $node (see $node_dir/collect.log)"
+        fi
+    ) &
+    running=$((running + 1))
+done
+wait
 
-# Copy the output files from the helper container (which has access to the shared volume)
-for file in $output_files; do
-  echo "Copying $file to ${NODE_NAME}_$file"
-  kubectl cp host-topo-job:/output/$file ${NODE_NAME}_$file -c helper-container
+failed_nodes=()
+for node in "${NODES[@]}"; do
+    [ -e "$output_dir/$node/FAILED" ] && failed_nodes+=("$node")
 done
 
+echo "Collected $(( ${#NODES[@]} - ${#failed_nodes[@]} ))/${#NODES[@]} node(s) into $output_dir"
+if [ ${#failed_nodes[@]} -gt 0 ]; then
+    echo "Failed: ${failed_nodes[*]}"
+    exit 1
+fi
 echo "Done!"
@@ -0,0 +1,104 @@
+"""
+Single-pass index of /sys/bus/pci/devices.
+Maps each PCIe address (BDF) to its real sysfs path, its pciXXXX:XX container
+and the names of its net, infiniband, nvme and drm children.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional
+
+
+pci_container_pattern = re.compile(
+    r"^pci[0-9a-fA-F]{4}:[0-9a-fA-F]{2}$"
+)  # E.g., "pci0000:00"
+
+# Child directories of a PCI device that name system identifiers.
+CHILD_SUBSYSTEMS = ("net", "infiniband", "nvme", "drm")
+
+
+class SysfsIndex:
+    def __init__(self, pci_devices_dir: str = "/sys/bus/pci/devices"):
+        self.pci_devices_dir = pci_devices_dir
+        self.real_paths: Dict[str, str] = {}  # BDF -> "/sys/devices/pci0000:00/.../0000:e1:00.0"
+        self.containers: Dict[str, str] = {}  # BDF -> "/sys/devices/pci0000:00"
+        self.children: Dict[str, Dict[str, List[str]]] = {
+            subsystem: {} for subsystem in CHILD_SUBSYSTEMS
+        }  # subsystem -> BDF -> child names (e.g., "net" -> "0000:3f:00.0" -> ["enp63s0f0np0"])
+        self._scan()
+
+    @classmethod
+    def from_children(cls, children: Dict[str, Dict[str, List[str]]]) -> "SysfsIndex":
+        """An index of another host holding only its recorded child names (see `children`)."""
+        index = cls.__new__(cls)
+        index.pci_devices_dir = None
+        index.real_paths = {}
+        index.containers = {}
+        index.children = {subsystem: dict(children.get(subsystem, {})) for subsystem in CHILD_SUBSYSTEMS}
+        return index
+
+    @staticmethod
+    def _find_container(real_path: str) -> Optional[str]:
+        parent = os.path.dirname(real_path)
+        while parent and parent != "/":
+            if pci_container_pattern.match(os.path.basename(parent)):
+                return parent
+            parent = os.path.dirname(parent)
+        return None
+
+    def _scan(self) -> None:
+        try:
+            with os.scandir(self.pci_devices_dir) as it:
+                for entry in it:
+                    bdf = entry.name.lower()
+                    real_path = os.path.realpath(entry.path)
+                    self.real_paths[bdf] = real_path
+
+                    container = self._find_container(real_path)
+                    if container:
+                        self.containers[bdf] = container
+
+                    self._scan_device(bdf, real_path)
+        except (OSError, PermissionError):
+            pass
+
+    def _scan_device(self, bdf: str, real_path: str) -> None:
+        # One directory listing per device instead of one exists() probe per subsystem.
+        try:
+            with os.scandir(real_path) as it:
+                subsystem_dirs = [
+                    e for e in it
+                    if e.name in CHILD_SUBSYSTEMS and e.is_dir(follow_symlinks=False)
+                ]
+        except (OSError, PermissionError):
+            return
+
+        for subsystem_dir in subsystem_dirs:
+            try:
+                names = os.listdir(subsystem_dir.path)
+            except (OSError, PermissionError):
+                continue
+            if names:
+                self.children[subsystem_dir.name][bdf] = names
+
+    def get_children(self, subsystem: str, bdf: str) -> List[str]:
+        return self.children.get(subsystem, {}).get(bdf, [])
+
+    def get_containers(self) -> List[str]:
+        return sorted(set(self.containers.values()))
+
+
+# Global instance
+_sysfs_index = None
+
+def get_sysfs_index() -> SysfsIndex:
+    global _sysfs_index
+    if _sysfs_index is None:
+        _sysfs_index = SysfsIndex()
+    return _sysfs_index
+
+def refresh_sysfs_index(pci_devices_dir: str = "/sys/bus/pci/devices") -> SysfsIndex:
+    """Rescans sysfs, e.g., after devices were added or removed."""
+    global _sysfs_index
+    _sysfs_index = SysfsIndex(pci_devices_dir)
+    return _sysfs_index
@@ -6,12 +6,251 @@ Maps PCIe bus addresses to system identifiers like network interfaces, RDMA devi
 import os
 import subprocess
 import re
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from os.path import basename
+from nvml import NvmlTopology, load_nvml_library, read_nvml_topology
+from pcie_node import PcieNode, bdf_pattern
+from sysfs_index import SysfsIndex, get_sysfs_index
+
+
+# Vendor tools probed for GPU indices and NVLink topology, by probe name.
+VENDOR_PROBE_COMMANDS: Dict[str, List[str]] = {
+    "nvidia-smi": ["nvidia-smi", "--query-gpu=index,pci.bus_id", "--format=csv,noheader,nounits"],
+    "amd-smi": ["amd-smi"],
+    "nvidia-smi-topo": ["nvidia-smi", "topo", "-m"],
+}
+DEFAULT_PROBE_TIMEOUT = 10.0  # Seconds
+# The in-process NVML session, timed like a probe.
+NVML_PROBE = "nvml"
+PROBE_NAMES: List[str] = [*VENDOR_PROBE_COMMANDS, NVML_PROBE]
+# Probes whose data NVML provides directly.
+NVML_REPLACED_PROBES = ("nvidia-smi", "nvidia-smi-topo")
+
+
+class ProbeResult:
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.returncode: Optional[int] = None
+        self.stdout: Optional[str] = None
+        self.timed_out = False
+
+
+def _run_probe(name: str, cmd: List[str], timeout: float) -> ProbeResult:
+    result = ProbeResult(name, timeout)
+    try:
+        completed = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        result.returncode = completed.returncode
+        result.stdout = completed.stdout
+    except subprocess.TimeoutExpired:
+        result.timed_out = True
+    except (FileNotFoundError, Exception):
+        pass
+    return result
+
+
+def _run_in_background(function, *args) -> Future:
+    """
+    Runs `function(*args)` in a daemon thread, so that a pending probe never
+    keeps the process alive after the main thread is done.
+    """
+    future: Future = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"probe-{getattr(function, '__name__', 'task')}", daemon=True).start()
+    return future
+
+
+class VendorProbes:
+    """
+    Runs all vendor tool probes concurrently in background (daemon) threads
+    as soon as it is created. Results are joined only when they are first needed.
+    When NVML is available, it is queried instead of the nvidia-smi probes;
+    those are started as soon as the NVML session fails or exceeds its timeout.
+    """
+
+    def __init__(self, timeouts: Optional[Dict[str, float]] = None, use_nvml: bool = True):
+        self.timeouts: Dict[str, float] = {name: DEFAULT_PROBE_TIMEOUT for name in PROBE_NAMES}
+        self.timeouts.update(timeouts or {})
+        self._use_nvml = use_nvml
+        self._lock = threading.Lock()
+        self._nvml_result = ProbeResult(NVML_PROBE, self.timeouts[NVML_PROBE])
+        nvml_library = load_nvml_library() if use_nvml else None
+        deferred = NVML_REPLACED_PROBES if nvml_library is not None else ()
+        self._futures = {
+            name: _run_in_background(_run_probe, name, cmd, self.timeouts[name])
+            for name, cmd in VENDOR_PROBE_COMMANDS.items()
+            if name not in deferred
+        }
+        self._nvml: Optional[Future] = None
+        if nvml_library is not None:
+            self._nvml_deadline = time.monotonic() + self.timeouts[NVML_PROBE]
+            self._nvml = _run_in_background(read_nvml_topology, nvml_library)
+            self._nvml.add_done_callback(self._on_nvml_done)
+
+    def _on_nvml_done(self, future: Future) -> None:
+        if future.exception() is not None or future.result() is None:
+            self._start_replaced_probes()
+
+    def _start_replaced_probes(self) -> None:
+        """Starts the probes deferred in favor of NVML (once)."""
+        with self._lock:
+            for name in NVML_REPLACED_PROBES:
+                if name not in self._futures:
+                    self._futures[name] = _run_in_background(
+                        _run_probe, name, VENDOR_PROBE_COMMANDS[name], self.timeouts[name]
+                    )
+
+    def nvml_topology(self) -> Optional[NvmlTopology]:
+        """
+        GPU indices and NVLink connections read through NVML, or None if
+        NVML is unavailable, fails or does not answer within its timeout.
+        """
+        if self._nvml is None or self._nvml_result.timed_out:
+            return None
+        try:
+            topology = self._nvml.result(timeout=max(0.0, self._nvml_deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._nvml_result.timed_out = True
+            topology = None
+        except Exception:
+            topology = None
+        if topology is None:
+            self._start_replaced_probes()
+        return topology
+
+    def result(self, name: str) -> ProbeResult:
+        if name not in self._futures:
+            # Deferred in favor of NVML; started once NVML is found unusable.
+            self.nvml_topology()
+            self._start_replaced_probes()
+        return self._futures[name].result()
+
+    def rerun(self) -> "VendorProbes":
+        """Probes started anew with the same settings, e.g. after a GPU was hot-added."""
+        return VendorProbes(self.timeouts, self._use_nvml)
+
+    def get_stdout(self, name: str) -> Optional[str]:
+        """Stdout of probe `name` if it succeeded, else None."""
+        result = self.result(name)
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    def timed_out(self) -> List[ProbeResult]:
+        """Probes that were killed (or NVML abandoned) at their timeout (joins all probes)."""
+        self.nvml_topology()
+        timed_out = [self._nvml_result] if self._nvml_result.timed_out else []
+        return timed_out + [r for r in (self.result(name) for name in list(self._futures)) if r.timed_out]
+
+
+class RecordedProbes(VendorProbes):
+    """
+    Probe results replayed from the raw captures of another host (the
+    "probes" and "nvml" entries of an IR host section, see capture_probes).
+    Probes that were not captured have no output; nothing is run locally.
+    """
+
+    def __init__(self, captures: Dict):
+        self.timeouts = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._nvml_result = ProbeResult(NVML_PROBE, DEFAULT_PROBE_TIMEOUT)
+        self._nvml_deadline = 0.0
+        for name, captured in captures.get("probes", {}).items():
+            result = ProbeResult(name, captured.get("timeout", DEFAULT_PROBE_TIMEOUT))
+            result.returncode = captured.get("returncode")
+            result.stdout = captured.get("stdout")
+            result.timed_out = bool(captured.get("timed_out"))
+            self.timeouts[name] = result.timeout
+            self._futures[name] = Future()
+            self._futures[name].set_result(result)
+
+        self._nvml = None
+        nvml = captures.get("nvml")
+        if nvml is not None:
+            topology = NvmlTopology()
+            topology.gpu_to_pci = {int(k): v for k, v in nvml.get("gpu_to_pci", {}).items()}
+            topology.nvlink_connections = {
+                int(k): {int(k2): v2 for k2, v2 in v.items()}
+                for k, v in nvml.get("nvlink_connections", {}).items()
+            }
+            self._nvml = Future()
+            self._nvml.set_result(topology)
+
+    def result(self, name: str) -> ProbeResult:
+        if name not in self._futures:
+            return ProbeResult(name, DEFAULT_PROBE_TIMEOUT)
+        return self._futures[name].result()
+
+    def rerun(self) -> "RecordedProbes":
+        # The captures of another host cannot be refreshed.
+        return self
+
+
+def capture_probes(probes: VendorProbes) -> Dict:
+    """
+    Raw results of every probe that ran (and the NVML topology, if read),
+    as stored in an IR host section and replayed by RecordedProbes.
+    """
+    nvml_topology = probes.nvml_topology()
+    captured = {}
+    for name in VENDOR_PROBE_COMMANDS:
+        if nvml_topology is not None and name in NVML_REPLACED_PROBES:
+            continue
+        result = probes.result(name)
+        captured[name] = {
+            "returncode": result.returncode,
+            "stdout": result.stdout,
+            "timed_out": result.timed_out,
+            "timeout": result.timeout,
+        }
+    nvml = None
+    if nvml_topology is not None:
+        nvml = {
+            "gpu_to_pci": nvml_topology.gpu_to_pci,
+            "nvlink_connections": nvml_topology.nvlink_connections,
+        }
+    return {"probes": captured, "nvml": nvml}
+
+
+def parse_probe_timeouts(specs: List[str]) -> Dict[str, float]:
+    """
+    Parses "SECONDS" (all probes) or "TOOL=SECONDS" values into probe -> timeout.
+    "nvml" bounds the NVML session, after which the nvidia-smi probes are used instead.
+    """
+    timeouts: Dict[str, float] = {}
+    for spec in specs:
+        name, sep, value = spec.rpartition("=")
+        try:
+            seconds = float(value)
+        except ValueError:
+            raise ValueError(f"invalid probe timeout '{spec}'")
+        if seconds <= 0:
+            raise ValueError(f"invalid probe timeout '{spec}': must be positive")
+        if not sep:
+            timeouts.update({probe: seconds for probe in PROBE_NAMES})
+        elif name in PROBE_NAMES:
+            timeouts[name] = seconds
+        else:
+            raise ValueError(
+                f"unknown probe '{name}' (valid probes: {', '.join(PROBE_NAMES)})"
+            )
+    return timeouts
 
 
 class SystemIdentifierResolver:
-    def __init__(self):
+    def __init__(self, sysfs_index: Optional[SysfsIndex] = None, probes: Optional[VendorProbes] = None):
+        self.sysfs_index = sysfs_index if sysfs_index is not None else get_sysfs_index()
+        self.probes = probes if probes is not None else VendorProbes()
         self.pci_to_netdev: Dict[str, str] = {}  # PCIe address -> network interface (e.g., "enp63s0f0np0")
         self.pci_to_rdma: Dict[str, str] = {}  # PCIe address -> RDMA device (e.g., "mlx5_1")
         self.pci_to_gpu: Dict[str, int] = {}  # PCIe address -> GPU index
@@ -38,46 +277,64 @@ class SystemIdentifierResolver:
             return f"0000:{address.lower()}"
         return address.lower()
     
-    def _load_network_interfaces(self):
-        pci_devices_dir = "/sys/bus/pci/devices"
-        
-        if not os.path.exists(pci_devices_dir):
+    @classmethod
+    def from_ir(cls, nvlink_data: Optional[Dict] = None, host: Optional[Dict] = None) -> "SystemIdentifierResolver":
+        """
+        Resolver for another host's IR dump, without local sysfs reads or
+        vendor probes. With a host section (--collect-only), the recorded
+        sysfs identifiers and raw probe outputs are parsed as on the host;
+        otherwise only the IR's GPU indices and NVLink connections are used.
+        """
+        if host is not None:
+            return cls(SysfsIndex.from_children(host.get("sysfs_children", {})), RecordedProbes(host))
+
+        resolver = cls.__new__(cls)
+        resolver.sysfs_index = None
+        resolver.probes = None
+        resolver.pci_to_netdev = {}
+        resolver.pci_to_rdma = {}
+        resolver.pci_to_gpu = {}
+        resolver.pci_to_nvme = {}
+        resolver.gpu_to_pci = {}
+        resolver.nvlink_connections = {}
+        if nvlink_data is not None:
+            from ir_io import apply_nvlink_section
+            apply_nvlink_section(resolver, nvlink_data)
+            resolver.pci_to_gpu = {pci_addr: gpu_idx for gpu_idx, pci_addr in resolver.gpu_to_pci.items()}
+        return resolver
+
+    def refresh_sysfs(self, sysfs_index: SysfsIndex) -> None:
+        """Reloads the sysfs-based maps (netdev, RDMA, NVMe) from a fresh index, e.g., after hotplug."""
+        self.sysfs_index = sysfs_index
+        self.pci_to_netdev = {}
+        self.pci_to_rdma = {}
+        self.pci_to_nvme = {}
+        self._load_network_interfaces()
+        self._load_rdma_devices()
+        self._load_nvme_devices()
+    
+    def refresh_gpus(self) -> None:
+        """
+        Re-runs the vendor probes and reloads the GPU indices and NVLink
+        connections, e.g. after a GPU was hot-added or re-seated.
+        """
+        if self.probes is None:
             return
-        
-        try:
-            for pci_addr in os.listdir(pci_devices_dir):
-                normalized_addr = pci_addr.lower()
-                net_dir = os.path.join(pci_devices_dir, pci_addr, "net")
-                if os.path.exists(net_dir):
-                    try:
-                        net_interfaces = os.listdir(net_dir)
-                        if net_interfaces:
-                            self.pci_to_netdev[normalized_addr] = net_interfaces[0]
-                    except (OSError, PermissionError):
-                        continue
-        except (OSError, PermissionError):
-            pass
+        self.probes = self.probes.rerun()
+        self.pci_to_gpu = {}
+        self.gpu_to_pci = {}
+        self.nvlink_connections = {}
+        self._load_gpu_indices()
+        self._load_nvlink_topology()
+    
+    def _load_network_interfaces(self):
+        for pci_addr, net_interfaces in self.sysfs_index.children["net"].items():
+            self.pci_to_netdev[pci_addr] = net_interfaces[0]
     
     def _load_rdma_devices(self):
-        pci_devices_dir = "/sys/bus/pci/devices"
-        
-        if not os.path.exists(pci_devices_dir):
-            return
-        
-        try:
-            for pci_addr in os.listdir(pci_devices_dir):
-                normalized_addr = pci_addr.lower()
-                rdma_dir = os.path.join(pci_devices_dir, pci_addr, "infiniband")
-                if os.path.exists(rdma_dir):
-                    try:
-                        rdma_devices = os.listdir(rdma_dir)
-                        if rdma_devices:
-                            # Typically only 1 infiniband device per controller
-                            self.pci_to_rdma[normalized_addr] = rdma_devices[0]
-                    except (OSError, PermissionError):
-                        continue
-        except (OSError, PermissionError):
-            pass
+        for pci_addr, rdma_devices in self.sysfs_index.children["infiniband"].items():
+            # Typically only 1 infiniband device per controller
+            self.pci_to_rdma[pci_addr] = rdma_devices[0]
     
     def _load_gpu_indices(self):
         """Load GPU indices for both NVIDIA and AMD GPUs."""
@@ -85,17 +342,22 @@ class SystemIdentifierResolver:
         self._load_amd_gpu_indices()
     
     def _load_nvidia_gpu_indices(self):
-        """Load NVIDIA GPU indices using nvidia-smi."""
+        """Load NVIDIA GPU indices from NVML, falling back to the nvidia-smi probe."""
+        nvml_topology = self.probes.nvml_topology()
+        if nvml_topology is not None:
+            # NVML bus ids are already full sysfs BDFs
+            for gpu_idx, pci_addr in nvml_topology.gpu_to_pci.items():
+                self.pci_to_gpu[pci_addr] = gpu_idx
+            return
+        stdout = self.probes.get_stdout("nvidia-smi")
+        if stdout is not None:
+            self._parse_nvidia_gpu_indices(stdout)
+    
+    def _parse_nvidia_gpu_indices(self, stdout: str):
+        """Parse `nvidia-smi --query-gpu=index,pci.bus_id --format=csv,noheader,nounits`."""
         try:
-            result = subprocess.run(
-                ["nvidia-smi", "--query-gpu=index,pci.bus_id", "--format=csv,noheader,nounits"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0:
-                for line in result.stdout.splitlines():
+            if stdout:
+                for line in stdout.splitlines():
                     parts = line.split(',')
                     if len(parts) >= 2:
                         gpu_index = parts[0].strip()
@@ -114,24 +376,20 @@ class SystemIdentifierResolver:
             pass
     
     def _load_amd_gpu_indices(self):
-        """Load AMD GPU indices using amd-smi."""
+        """Load AMD GPU indices from the amd-smi probe."""
+        stdout = self.probes.get_stdout("amd-smi")
+        if stdout is not None:
+            self._parse_amd_gpu_indices(stdout)
+    
+    def _parse_amd_gpu_indices(self, stdout: str):
+        """Parse the default `amd-smi` table."""
         try:
-            result = subprocess.run(
-                ["amd-smi"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                return
-            
             # Parse amd-smi output format:
             # | 0000:11:00.0    AMD Instinct MI300X | ... |
             # |   0       0       1        SPX/NPS1 | ... |
             # BDF line contains the PCIe address, next line has GPU index as first number
             
-            lines = result.stdout.splitlines()
+            lines = stdout.splitlines()
             current_bdf = None
             
             for line in lines:
@@ -166,50 +424,48 @@ class SystemIdentifierResolver:
             pass
     
     def _load_nvme_devices(self):
-        pci_devices_dir = "/sys/bus/pci/devices"
-        
-        if not os.path.exists(pci_devices_dir):
-            return
-        
-        try:
-            for pci_addr in os.listdir(pci_devices_dir):
-                normalized_addr = pci_addr.lower()
-                nvme_dir = os.path.join(pci_devices_dir, pci_addr, "nvme")
-                if os.path.exists(nvme_dir):
-                    try:
-                        nvme_devices = os.listdir(nvme_dir)
-                        if nvme_devices:
-                            # Typically one NVMe device per controller
-                            self.pci_to_nvme[normalized_addr] = nvme_devices[0]
-                    except (OSError, PermissionError):
-                        continue
-        except (OSError, PermissionError):
-            pass
+        for pci_addr, nvme_devices in self.sysfs_index.children["nvme"].items():
+            # Typically one NVMe device per controller
+            self.pci_to_nvme[pci_addr] = nvme_devices[0]
     
-    def get_network_interface(self, node_path: str) -> Optional[str]:
+    def _get_normalized_address(self, node) -> Optional[str]:
+        """
+        `node` is a PcieNode (its parsed `bdf` is used as is), a BDF,
+        or a sysfs path from which the last PCIe address is extracted.
+        """
+        if isinstance(node, PcieNode):
+            if node.bdf is not None:
+                return node.bdf
+            node_path = node.path
+        else:
+            node_path = node.lower()
+            if bdf_pattern.match(node_path):
+                return node_path
         pci_addr = self._extract_pci_address(node_path)
         if not pci_addr:
             return None
-        
-        normalized = self._normalize_pci_address(pci_addr)
+        return self._normalize_pci_address(pci_addr)
+    
+    def get_network_interface(self, node: Union[str, PcieNode]) -> Optional[str]:
+        normalized = self._get_normalized_address(node)
+        if not normalized:
+            return None
         return self.pci_to_netdev.get(normalized)
     
-    def get_rdma_device(self, node_path: str) -> Optional[str]:
+    def get_rdma_device(self, node: Union[str, PcieNode]) -> Optional[str]:
         """Get RDMA device name for a PCIe node, or None if not found."""
-        pci_addr = self._extract_pci_address(node_path)
-        if not pci_addr:
+        normalized = self._get_normalized_address(node)
+        if not normalized:
             return None
-        
-        normalized = self._normalize_pci_address(pci_addr)
         return self.pci_to_rdma.get(normalized)
     
-    def get_gpu_index(self, node_path: str) -> Optional[int]:
-        pci_addr = self._extract_pci_address(node_path)
-        if not pci_addr:
+    def get_gpu_index(self, node: Union[str, PcieNode]) -> Optional[int]:
+        normalized = self._get_normalized_address(node)
+        if not normalized:
             return None
-        
-        normalized = self._normalize_pci_address(pci_addr)
-        
+        return self._lookup_gpu_index(normalized)
+    
+    def _lookup_gpu_index(self, normalized: str) -> Optional[int]:
         gpu_idx = self.pci_to_gpu.get(normalized)
         if gpu_idx is not None:
             return gpu_idx
@@ -219,47 +475,58 @@ class SystemIdentifierResolver:
         
         return None
     
-    def get_nvme_device(self, node_path: str) -> Optional[str]:
+    def get_nvme_device(self, node: Union[str, PcieNode]) -> Optional[str]:
         """Get NVMe device name for a PCIe node, or None if not found."""
-        pci_addr = self._extract_pci_address(node_path)
-        if not pci_addr:
+        normalized = self._get_normalized_address(node)
+        if not normalized:
             return None
-        
-        normalized = self._normalize_pci_address(pci_addr)
         return self.pci_to_nvme.get(normalized)
     
-    def get_all_identifiers(self, node_path: str) -> Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]:
+    def get_all_identifiers(self, node: Union[str, PcieNode]) -> Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]:
         """
-        Get all system identifiers for a PCIe node.
+        Get all system identifiers for a PCIe node (or its path or BDF).
         Returns: (network_interface, rdma_device, gpu_index, nvme_device)
         """
-        netdev = self.get_network_interface(node_path)
-        rdma = self.get_rdma_device(node_path)
-        gpu_idx = self.get_gpu_index(node_path)
-        nvme = self.get_nvme_device(node_path)
+        normalized = self._get_normalized_address(node)
+        if not normalized:
+            return (None, None, None, None)
+        
+        netdev = self.pci_to_netdev.get(normalized)
+        rdma = self.pci_to_rdma.get(normalized)
+        gpu_idx = self._lookup_gpu_index(normalized)
+        nvme = self.pci_to_nvme.get(normalized)
         
         return (netdev, rdma, gpu_idx, nvme)
     
+    def resolve_all(self, nodes: Iterable[PcieNode]) -> Dict[str, Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]]:
+        """
+        Resolves the identifiers of many nodes in one pass.
+        Returns: node path -> (network_interface, rdma_device, gpu_index, nvme_device)
+        """
+        return {node.path: self.get_all_identifiers(node) for node in nodes}
+    
     def _load_nvlink_topology(self):
+        for pci_addr, gpu_idx in self.pci_to_gpu.items():
+            self.gpu_to_pci[gpu_idx] = pci_addr
+        
+        if not self.gpu_to_pci:
+            return
+        
+        nvml_topology = self.probes.nvml_topology()
+        if nvml_topology is not None:
+            for gpu_idx, peers in nvml_topology.nvlink_connections.items():
+                self.nvlink_connections[gpu_idx] = dict(peers)
+            return
+        
+        stdout = self.probes.get_stdout("nvidia-smi-topo")
+        if stdout is not None:
+            self._parse_nvlink_topology(stdout)
+    
+    def _parse_nvlink_topology(self, stdout: str):
+        """Parse the `nvidia-smi topo -m` matrix."""
         try:
-            for pci_addr, gpu_idx in self.pci_to_gpu.items():
-                self.gpu_to_pci[gpu_idx] = pci_addr
-            
-            if not self.gpu_to_pci:
-                return
-            
-            result = subprocess.run(
-                ["nvidia-smi", "topo", "-m"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                return
-            
             #nvidia-smi topo -m outputs a matrix where:
-            lines = [line for line in result.stdout.splitlines() if line.strip()]
+            lines = [line for line in stdout.splitlines() if line.strip()]
             ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
             clean_lines = [ansi_escape.sub('', line) for line in lines]
             
@@ -345,12 +612,34 @@ class SystemIdentifierResolver:
         return sorted(self.gpu_to_pci.keys())
 
 
-# Global instance
+# Global instances
 _system_resolver = None
+_vendor_probes = None
+
+def start_vendor_probes(timeouts: Optional[Dict[str, float]] = None) -> VendorProbes:
+    """Launches the vendor tool probes in the background for the global resolver."""
+    global _vendor_probes
+    if _vendor_probes is None:
+        _vendor_probes = VendorProbes(timeouts)
+    return _vendor_probes
+
+def set_system_resolver(resolver: SystemIdentifierResolver) -> None:
+    """Replaces the global resolver, e.g. with one built from an IR host section."""
+    global _system_resolver
+    _system_resolver = resolver
+
+def warn_probe_timeouts(probes: VendorProbes) -> None:
+    """Prints a warning for every probe of `probes` that timed out."""
+    for probe in probes.timed_out():
+        if probe.name == NVML_PROBE:
+            print(f"Warning: NVML did not answer within {probe.timeout:g}s; using nvidia-smi instead", flush=True)
+        else:
+            print(f"Warning: {probe.name} probe timed out after {probe.timeout:g}s; its identifiers are missing", flush=True)
 
 def get_system_resolver() -> SystemIdentifierResolver:
     global _system_resolver
     if _system_resolver is None:
-        _system_resolver = SystemIdentifierResolver()
+        _system_resolver = SystemIdentifierResolver(probes=start_vendor_probes())
+        warn_probe_timeouts(_system_resolver.probes)
     return _system_resolver
 
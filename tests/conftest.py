@@ -0,0 +1,26 @@
+import os
+import sys
+
+# The modules live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def add_sysfs_device(sys_root, rel_path, attrs, children=None):
+    """
+    Creates <sys_root>/devices/<rel_path> with the attribute files `attrs`
+    and the child devices `children` (e.g., {"net": ["eth0"]}), linked
+    from <sys_root>/bus/pci/devices.
+    """
+    path = sys_root / "devices" / rel_path
+    path.mkdir(parents=True)
+    for name, value in attrs.items():
+        (path / name).write_text(value + "\n")
+    for subsystem, names in (children or {}).items():
+        for name in names:
+            (path / subsystem / name).mkdir(parents=True)
+    devices = sys_root / "bus" / "pci" / "devices"
+    devices.mkdir(parents=True, exist_ok=True)
+    (devices / path.name).symlink_to(path)
+    return path
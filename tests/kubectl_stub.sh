@@ -0,0 +1,82 @@
+#! /bin/bash
+
+# Stand-in for kubectl, for running run_job_pod.sh without a cluster:
+#   KUBECTL=tests/kubectl_stub.sh KUBECTL_STUB_STATE=<dir> ./run_job_pod.sh ...
+#
+# Pods "run" on the node named in their YAML. The node name selects the outcome:
+#   *fail*     topo-vis-container exits with code 3
+#   *nosched*  the pod is never scheduled
+#   *hang*     topo-vis-container never terminates
+#   otherwise  it succeeds and writes numa_0.pdf, numa_1.pdf (unless --collect-only)
+#              and topology.json (with --dump-ir)
+#
+# State in $KUBECTL_STUB_STATE: calls (one line per invocation), pods/<pod>.yaml,
+# running/<pod> (created pods not deleted yet) and max_running (peak number of those).
+# `get nodes` lists $KUBECTL_STUB_NODES.
+
+state="${KUBECTL_STUB_STATE:?KUBECTL_STUB_STATE is not set}"
+mkdir -p "$state/pods" "$state/running"
+echo "$*" >> "$state/calls"
+
+pod_node() {
+    sed -n 's/^ *nodeName: "\(.*\)".*/\1/p' "$state/pods/$1.yaml" 2>/dev/null
+}
+
+case "$1" in
+    get)
+        if [ "$2" = nodes ]; then
+            echo "${KUBECTL_STUB_NODES:-}"
+            exit 0
+        fi
+        # get pod <pod> --watch ...: a few updates before the container terminates
+        node=$(pod_node "$3")
+        echo ""
+        sleep 0.2
+        echo ""
+        case "$node" in
+            *fail*) echo 3 ;;
+            *hang*) ;;
+            *) echo 0 ;;
+        esac
+        # A watch stays open until it is killed
+        exec sleep 60
+        ;;
+    apply)
+        pod=$(sed -n 's/^  name: \([^ ]*\).*/\1/p' "$3" | head -n 1)
+        cp "$3" "$state/pods/$pod.yaml"
+        (
+            flock 9
+            touch "$state/running/$pod"
+            count=$(ls "$state/running" | wc -l)
+            [ "$count" -gt "$(cat "$state/max_running" 2>/dev/null || echo 0)" ] && echo "$count" > "$state/max_running"
+        ) 9> "$state/lock"
+        echo "pod/$pod created"
+        ;;
+    wait)
+        pod="${3#pod/}"
+        [[ "$(pod_node "$pod")" == *nosched* ]] && exit 1
+        sleep 0.3
+        echo "$3 condition met"
+        ;;
+    exec)
+        pod="$2"
+        if ! grep -q -- '^ *args: \[[^]]*--collect-only' "$state/pods/$pod.yaml"; then
+            printf 'numa_0.pdf\nnuma_1.pdf\n'
+        fi
+        if grep -q -- '^ *args: \[[^]]*--dump-ir' "$state/pods/$pod.yaml"; then
+            echo topology.json
+        fi
+        ;;
+    cp)
+        echo "${2#*:}" > "$3"
+        ;;
+    delete)
+        if [ "$2" = pod ] && [ "$3" != "-l" ]; then
+            rm -f "$state/running/$3"
+        fi
+        ;;
+    logs)
+        echo "stub log of $2"
+        ;;
+esac
+exit 0
@@ -0,0 +1,78 @@
+import os
+import shutil
+import pytest
+import pcie_node
+import sysfs_index
+import system_identifiers
+from conftest import FIXTURES, add_sysfs_device
+from collector import collect
+from ir_io import iter_nodes, load_ir_sections
+from nvml import FakeNvmlLibrary
+from pcie_topo_gen import get_pcie_trees
+from system_identifiers import SystemIdentifierResolver, VendorProbes
+
+
+# Two NVLinked GPUs, a dual-port RDMA NIC and an NVMe drive.
+DEVICES = [
+    ("pci0000:00/0000:00:01.0", {"class": "0x060400", "numa_node": "0"}, None),
+    ("pci0000:00/0000:00:01.0/0000:01:00.0", {"class": "0x010802", "vendor": "0x144d"}, {"nvme": ["nvme0"]}),
+    ("pci0000:80/0000:80:01.0", {"class": "0x060400", "numa_node": "1"}, None),
+    ("pci0000:80/0000:80:01.0/0000:81:00.0", {"class": "0x030200", "vendor": "0x10de"}, None),
+    ("pci0000:80/0000:80:02.0", {"class": "0x060400", "numa_node": "1"}, None),
+    ("pci0000:80/0000:80:02.0/0000:82:00.0", {"class": "0x030200", "vendor": "0x10de"}, None),
+    ("pci0000:80/0000:80:03.0", {"class": "0x060400", "numa_node": "1"}, None),
+    ("pci0000:80/0000:80:03.0/0000:83:00.0", {"class": "0x020700", "vendor": "0x15b3"},
+     {"net": ["ibp131s0f0"], "infiniband": ["mlx5_0"]}),
+    ("pci0000:80/0000:80:03.0/0000:83:00.1", {"class": "0x020700", "vendor": "0x15b3"},
+     {"net": ["ibp131s0f1"], "infiniband": ["mlx5_1"]}),
+]
+
+NVML_FIXTURE = {"gpus": [
+    {"bus_id": "00000000:81:00.0", "nvlinks": [{"active": True, "remote": "00000000:82:00.0"}] * 12},
+    {"bus_id": "00000000:82:00.0", "nvlinks": [{"active": True, "remote": "00000000:81:00.0"}] * 12},
+]}
+
+
+@pytest.fixture(params=["nvidia-smi", "nvml"])
+def host(request, tmp_path, monkeypatch):
+    """A synthetic host whose vendor tools replay recorded outputs (or NVML a fixture)."""
+    sys_root = tmp_path / "sys"
+    for rel_path, attrs, children in DEVICES:
+        add_sysfs_device(sys_root, rel_path, attrs, children)
+    monkeypatch.setattr(pcie_node, "load_lspci_snapshot", lambda: {})
+    monkeypatch.setattr(sysfs_index, "_sysfs_index", sysfs_index.SysfsIndex(str(sys_root / "bus" / "pci" / "devices")))
+    monkeypatch.setattr(system_identifiers, "_vendor_probes", None)
+    monkeypatch.setattr(system_identifiers, "VENDOR_PROBE_COMMANDS", {
+        "nvidia-smi": ["cat", os.path.join(FIXTURES, "nvidia_smi_query.txt")],
+        "amd-smi": ["false"],
+        "nvidia-smi-topo": ["cat", os.path.join(FIXTURES, "nvidia_smi_topo.txt")],
+    })
+    nvml = FakeNvmlLibrary(NVML_FIXTURE) if request.param == "nvml" else None
+    monkeypatch.setattr(system_identifiers, "load_nvml_library", lambda: nvml)
+    return sys_root
+
+
+@pytest.mark.parametrize("ir_name", ["host.json", "host.jsonl", "host.bin"])
+def test_collect_then_render_centrally(host, tmp_path, monkeypatch, ir_name):
+    live = SystemIdentifierResolver(sysfs_index.get_sysfs_index(), VendorProbes())
+    live_roots = get_pcie_trees("/sys/devices")
+
+    ir_path = str(tmp_path / ir_name)
+    stats = collect(ir_path)
+    assert stats["devices"] == len(DEVICES)
+
+    # Render "elsewhere": neither this sysfs tree nor the vendor tools are available.
+    shutil.rmtree(host)
+    missing_tools = {name: ["false"] for name in system_identifiers.VENDOR_PROBE_COMMANDS}
+    monkeypatch.setattr(system_identifiers, "VENDOR_PROBE_COMMANDS", missing_tools)
+    roots, nvlink_data, host_section = load_ir_sections(ir_path)
+    assert host_section is not None
+    central = SystemIdentifierResolver.from_ir(nvlink_data, host_section)
+
+    assert [r.to_dict() for r in roots] == [r.to_dict() for r in live_roots]
+    for node, _ in iter_nodes(roots):
+        assert central.get_all_identifiers(node) == live.get_all_identifiers(node), node.bdf
+    assert central.gpu_to_pci == live.gpu_to_pci == {0: "0000:81:00.0", 1: "0000:82:00.0"}
+    assert central.nvlink_connections == live.nvlink_connections == {0: {1: "NV12"}, 1: {0: "NV12"}}
+    assert central.get_all_identifiers("0000:83:00.1") == ("ibp131s0f1", "mlx5_1", None, None)
+    assert central.get_all_identifiers("0000:01:00.0") == (None, None, None, "nvme0")
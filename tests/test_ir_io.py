@@ -0,0 +1,56 @@
+import pytest
+from ir_io import dump_ir, load_ir_sections
+from pcie_node import PcieNode
+from topology_table import TableNode
+
+
+def _roots():
+    root = PcieNode("/sys/devices/pci0000:00/0000:00:01.0", auto_load=False)
+    root.class_, root.numa_node = "0x060400", "0"
+    child = PcieNode("/sys/devices/pci0000:00/0000:00:01.0/0000:01:00.0", auto_load=False)
+    child.class_, child.vendor = "0x020000", "0x15b3"
+    root.children = [child]
+    return [root]
+
+
+@pytest.mark.parametrize("name", ["ir.json", "ir.jsonl", "ir.bin"])
+def test_empty_or_truncated_files(tmp_path, name):
+    path = tmp_path / name
+    dump_ir(str(path), _roots(), {"gpu_to_pci": {}}, host={"hostname": "node-a"})
+    data = path.read_bytes()
+    assert load_ir_sections(str(path))[2] == {"hostname": "node-a"}
+
+    for size in (0, 8, 40, len(data) // 2, len(data) - 3):
+        path.write_bytes(data[:size])
+        with pytest.raises(ValueError, match="not a valid PCIe topology IR file"):
+            load_ir_sections(str(path))
+
+
+def test_binary_nodes_are_read_on_access(tmp_path):
+    path = str(tmp_path / "ir.bin")
+    dump_ir(path, _roots())
+    roots, _, _ = load_ir_sections(path)
+
+    assert all(isinstance(r, TableNode) for r in roots)
+    assert "_children" not in roots[0].__dict__ and not roots[0].is_loaded("class")
+    (child,) = roots[0].children
+    assert child.parent is roots[0] and child.bdf == "0000:01:00.0"
+    assert child.vendor == "0x15b3" and child.is_loaded("numa_node") and not child.is_loaded("lspci_vmm")
+    assert [r.to_dict() for r in roots] == [r.to_dict() for r in _roots()]
+
+
+def test_jsonl_across_batches(tmp_path):
+    root = PcieNode("/sys/devices/pci0000:00/0000:00:01.0", auto_load=False)
+    root.children = [PcieNode(f"{root.path}/0000:{bus:02x}:{dev:02x}.0", auto_load=False)
+                     for bus in range(1, 65) for dev in range(32)]
+    path = tmp_path / "ir.jsonl"
+    dump_ir(str(path), [root], {"gpu_to_pci": {0: "0000:01:00.0"}}, host={"hostname": "node-a"})
+    roots, nvlink, host = load_ir_sections(str(path))
+    assert [r.to_dict() for r in roots] == [root.to_dict()]
+    assert (nvlink["gpu_to_pci"], host) == ({0: "0000:01:00.0"}, {"hostname": "node-a"})
+
+    lines = path.read_text().splitlines(keepends=True)
+    lines[1500] = lines[1500][:20] + "\n"
+    path.write_text("".join(lines))
+    with pytest.raises(ValueError, match="line 1501:"):
+        load_ir_sections(str(path))
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+import pytest
+import system_identifiers
+from conftest import FIXTURES
+from nvml import FakeNvmlLibrary, load_nvml_library, read_nvml_topology
+from sysfs_index import SysfsIndex
+from system_identifiers import SystemIdentifierResolver, VendorProbes, parse_probe_timeouts
+
+
+NVSWITCH_FIXTURE = os.path.join(FIXTURES, "nvml_nvswitch.json")
+
+
+def test_nvswitch_matrix():
+    # GPUs 0-2 have 4, 4 and 2 active NVSwitch links; GPUs 0 and 1 share one
+    # direct link, and GPU 3 is only linked to GPU 0, over two links.
+    topology = read_nvml_topology(FakeNvmlLibrary.from_file(NVSWITCH_FIXTURE))
+
+    assert topology.gpu_to_pci == {
+        0: "0000:18:00.0",
+        1: "0000:2a:00.0",
+        2: "0000:3b:00.0",
+        3: "0000:5d:00.0",
+    }
+    assert topology.nvlink_connections == {
+        0: {1: "NV5", 2: "NV2", 3: "NV2"},
+        1: {0: "NV5", 2: "NV2"},
+        2: {0: "NV2", 1: "NV2"},
+        3: {0: "NV2"},
+    }
+
+
+def test_session_is_closed():
+    lib = FakeNvmlLibrary.from_file(NVSWITCH_FIXTURE)
+    read_nvml_topology(lib)
+    assert not lib.initialized
+
+
+def test_init_error():
+    assert read_nvml_topology(FakeNvmlLibrary({"gpus": [], "init_error": 9})) is None
+
+
+def test_fixture_from_environment(monkeypatch):
+    monkeypatch.setenv("NVML_FIXTURE_PATH", NVSWITCH_FIXTURE)
+    assert isinstance(load_nvml_library(), FakeNvmlLibrary)
+    monkeypatch.setenv("NVML_FIXTURE_PATH", os.path.join(FIXTURES, "missing.json"))
+    assert load_nvml_library() is None
+
+
+class HangingNvmlLibrary(FakeNvmlLibrary):
+    """A driver whose nvmlInit_v2 does not return until `release` is set."""
+
+    def __init__(self, fixture):
+        super().__init__(fixture)
+        self.release = threading.Event()
+
+    def nvmlInit_v2(self):
+        self.release.wait()
+        return super().nvmlInit_v2()
+
+
+@pytest.fixture
+def smi_probes(monkeypatch):
+    """nvidia-smi replays the recorded outputs; other tools are missing."""
+    monkeypatch.setattr(system_identifiers, "VENDOR_PROBE_COMMANDS", {
+        "nvidia-smi": ["cat", os.path.join(FIXTURES, "nvidia_smi_query.txt")],
+        "amd-smi": ["false"],
+        "nvidia-smi-topo": ["cat", os.path.join(FIXTURES, "nvidia_smi_topo.txt")],
+    })
+
+
+def test_hanging_nvml_falls_back_to_nvidia_smi(monkeypatch, smi_probes):
+    lib = HangingNvmlLibrary({"gpus": []})
+    monkeypatch.setattr(system_identifiers, "load_nvml_library", lambda: lib)
+    try:
+        start = time.monotonic()
+        probes = VendorProbes(parse_probe_timeouts(["nvml=0.2"]))
+        resolver = SystemIdentifierResolver(SysfsIndex.from_children({}), probes)
+        assert time.monotonic() - start < 5
+        assert [(p.name, p.timeout) for p in probes.timed_out()] == [("nvml", 0.2)]
+        assert resolver.gpu_to_pci == {0: "0000:81:00.0", 1: "0000:82:00.0"}
+        assert resolver.nvlink_connections == {0: {1: "NV12"}, 1: {0: "NV12"}}
+
+        # An answer after the timeout is ignored.
+        lib.release.set()
+        probes._nvml.result(timeout=5)
+        assert probes.nvml_topology() is None
+    finally:
+        lib.release.set()
+
+
+def test_failing_nvml_starts_nvidia_smi_at_once(monkeypatch, smi_probes):
+    monkeypatch.setattr(
+        system_identifiers, "load_nvml_library", lambda: FakeNvmlLibrary({"gpus": [], "init_error": 9})
+    )
+    probes = VendorProbes()
+    probes._nvml.result(timeout=5)
+    # Started by the failure itself, not by the first result() call.
+    assert set(system_identifiers.NVML_REPLACED_PROBES) <= set(probes._futures)
+    assert probes.nvml_topology() is None
+    assert probes.get_stdout("nvidia-smi").startswith("0, 00000000:81:00.0")
+    assert probes.timed_out() == []
+
+
+def test_nvml_probe_timeout():
+    assert parse_probe_timeouts(["3", "nvml=30"])["nvml"] == 30
+    with pytest.raises(ValueError, match="valid probes: .*nvml"):
+        parse_probe_timeouts(["nvm=3"])
@@ -0,0 +1,34 @@
+import pytest
+import pcie_node
+from conftest import add_sysfs_device
+from pcie_node import PcieNode
+
+
+RECORD = {"Slot": "0000:01:00.0", "Class": "Ethernet controller", "Vendor": "Mellanox Technologies"}
+
+
+@pytest.fixture
+def device(tmp_path, monkeypatch):
+    monkeypatch.setattr(pcie_node, "_lspci_snapshot", None)
+    monkeypatch.setattr(pcie_node, "load_lspci_snapshot", lambda: {"0000:01:00.0": RECORD})
+    path = add_sysfs_device(
+        tmp_path, "pci0000:00/0000:00:01.0/0000:01:00.0", {"vendor": "0x15b3", "device": "0x1017", "class": "0x020000"}
+    )
+    return str(path)
+
+
+@pytest.mark.parametrize("fields", [["lspci_vmm"], ["vendor", "lspci_vmm"], None])
+def test_lspci_record_with_field_subset(device, fields):
+    node = PcieNode(device, fields=fields)
+    assert node.lspci_vmm == RECORD
+    assert node.vendor == ("0x15b3" if fields != ["lspci_vmm"] else None)
+
+
+def test_lazy_lspci_record(device):
+    node = PcieNode(device, lazy=True, fields=["lspci_vmm"])
+    assert node.is_loaded("lspci_vmm") and not node.is_loaded("vendor")
+    assert node.lspci_vmm == RECORD
+
+
+def test_synthetic_node_has_no_lspci_record(device):
+    assert PcieNode(device[:-1] + "x", auto_load=False, lazy=True).lspci_vmm is None
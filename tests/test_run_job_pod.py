@@ -0,0 +1,126 @@
+import os
+import shutil
+import signal
+import subprocess
+import time
+import pytest
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO, "run_job_pod.sh")
+STUB = os.path.join(REPO, "tests", "kubectl_stub.sh")
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("bash") is None or shutil.which("flock") is None, reason="needs bash and flock"
+)
+
+
+def _env(state, **extra):
+    env = dict(os.environ, KUBECTL=STUB, KUBECTL_STUB_STATE=str(state))
+    env.update(extra)
+    return env
+
+
+def _run(tmp_path, *args, **env):
+    state = tmp_path / "state"
+    completed = subprocess.run(
+        [SCRIPT, *args], cwd=REPO, env=_env(state, **env), capture_output=True, text=True, timeout=120
+    )
+    calls = (state / "calls").read_text().splitlines()
+    return completed, state, calls
+
+
+def _cleanup_calls(calls):
+    return [c for c in calls if c.startswith("delete pod -l host-topo-run=")]
+
+
+def test_fleet_with_failing_nodes(tmp_path):
+    out = tmp_path / "out"
+    nodes = ["gpu-a", "gpu-b", "gpu-fail", "gpu-c", "gpu-nosched"]
+    completed, state, calls = _run(
+        tmp_path, "--nodes", ",".join(nodes), "--parallel", "2", "--output-dir", str(out), "--dump-ir"
+    )
+
+    assert completed.returncode == 1, completed.stdout
+    assert "Collected 3/5 node(s)" in completed.stdout
+    assert "Failed: gpu-fail gpu-nosched" in completed.stdout
+    for node in nodes:
+        failed = (out / node / "FAILED").exists()
+        assert failed == (node in ("gpu-fail", "gpu-nosched")), node
+        assert (out / node / "collect.log").exists()
+        if not failed:
+            assert sorted(p.name for p in (out / node).iterdir()) == [
+                "collect.log", "numa_0.pdf", "numa_1.pdf", "topology.json",
+            ]
+    assert "exit code 3" in (out / "gpu-fail" / "collect.log").read_text()
+
+    # --parallel bounds the pods alive at once, and the wait -n fan-out fills every slot.
+    assert int((state / "max_running").read_text()) == 2
+    assert not list((state / "running").iterdir())
+
+    # One pod per node, all labeled with the run ID the exit trap deletes by.
+    pods = sorted((state / "pods").glob("*.yaml"))
+    assert len(pods) == len(nodes)
+    cleanup = _cleanup_calls(calls)
+    assert len(cleanup) == 1
+    run_id = cleanup[0].split("=", 1)[1].split()[0]
+    for pod in pods:
+        assert f"host-topo-run: {run_id}" in pod.read_text()
+
+
+def test_fleet_collect_only(tmp_path):
+    out = tmp_path / "out"
+    completed, state, _ = _run(
+        tmp_path, "--selector", "gpu=true", "--collect-only", "--output-dir", str(out),
+        KUBECTL_STUB_NODES="gpu-a gpu-b",
+    )
+
+    assert completed.returncode == 0, completed.stdout
+    for node in ("gpu-a", "gpu-b"):
+        assert sorted(p.name for p in (out / node).iterdir()) == ["collect.log", "topology.json"]
+    for pod in (state / "pods").glob("*.yaml"):
+        assert '["--collect-only", "--dump-ir", "/output/topology.json"]' in pod.read_text()
+
+
+def test_single_node_keeps_legacy_output(tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    shutil.copy(os.path.join(REPO, "job-pod.yaml"), work)
+    state = tmp_path / "state"
+    completed = subprocess.run(
+        [SCRIPT, "gpu-a"], cwd=work, env=_env(state), capture_output=True, text=True, timeout=60
+    )
+
+    assert completed.returncode == 0, completed.stdout
+    assert sorted(p.name for p in work.iterdir() if p.name != "job-pod.yaml") == [
+        "gpu-a_numa_0.pdf", "gpu-a_numa_1.pdf",
+    ]
+
+
+def test_interrupt_deletes_run_pods(tmp_path):
+    state = tmp_path / "state"
+    log = tmp_path / "run.log"
+    with open(log, "w") as out:
+        process = subprocess.Popen(
+            [SCRIPT, "gpu-hang", "gpu-hang-2", "--output-dir", str(tmp_path / "out")],
+            cwd=REPO, env=_env(state), stdout=out, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+    try:
+        deadline = time.monotonic() + 30
+        while len(list(state.glob("pods/*.yaml"))) < 2:
+            assert time.monotonic() < deadline, "pods were not created"
+            time.sleep(0.1)
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+    finally:
+        # The pending collections (and the stub's watches) are left behind by the exit.
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+    output = log.read_text()
+    assert process.returncode == 130, output
+    assert "Cleaning up..." in output
+    assert len(_cleanup_calls((state / "calls").read_text().splitlines())) == 1
@@ -0,0 +1,42 @@
+import re
+from pcie_node import PcieNode
+from topology_diff import build_diff_graph, diff_topologies
+
+
+def _node(path, vendor, device, children=()):
+    node = PcieNode(path, auto_load=False)
+    node.vendor, node.device, node.class_, node.numa_node = vendor, device, "0x060400", "0"
+    node.children = list(children)
+    return node
+
+
+def _declared_and_edges(graph):
+    declared, edges = set(), []
+    for line in graph.body:
+        edge = re.match(r"\s*(\S+) -> (\S+)", line)
+        if edge:
+            edges.append(edge.groups())
+            continue
+        node = re.match(r"\s*(\S+) \[", line)
+        if node and node.group(1) not in ("graph", "node", "edge"):
+            declared.add(node.group(1))
+    return declared, edges
+
+
+def test_removed_child_of_moved_switch():
+    # A switch re-seated from 01:00.0 to 02:00.0 lost its downstream port 03:00.0 on the way.
+    base = "/sys/devices/pci0000:00/0000:00:01.0"
+    old = [_node(base, "0x8086", "0x1", [
+        _node(f"{base}/0000:01:00.0", "0x1000", "0xc010", [_node(f"{base}/0000:01:00.0/0000:03:00.0", "0x1000", "0xc011")]),
+    ])]
+    new = [_node(base, "0x8086", "0x1", [_node(f"{base}/0000:02:00.0", "0x1000", "0xc010")])]
+
+    report = diff_topologies(old, new)
+    assert [(m["old_bdf"], m["new_bdf"]) for m in report["moved"]] == [("0000:01:00.0", "0000:02:00.0")]
+    assert [(r["bdf"], r["parent"]) for r in report["removed"]] == [("0000:03:00.0", "0000:01:00.0")]
+
+    graph = build_diff_graph(new, report, "diff")
+    declared, edges = _declared_and_edges(graph)
+    assert all(a in declared and b in declared for a, b in edges), edges
+    assert not any("removed_0000_01_00_0" in line for line in graph.body)
+    assert any(b == "removed_0000_03_00_0" and "0000_02_00_0" in a for a, b in edges)
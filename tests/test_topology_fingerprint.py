@@ -0,0 +1,46 @@
+import pytest
+from batch_render import fingerprint_host
+from ir_io import dump_ir, load_ir_sections, load_ir_table_sections
+from pcie_node import PcieNode
+from system_identifiers import SystemIdentifierResolver
+from topology_fingerprint import fingerprint_forest
+
+
+NVLINK = {"gpu_to_pci": {0: "0000:18:00.0", 1: "0000:19:00.0"}, "nvlink_connections": {0: {1: "NV4"}, 1: {0: "NV4"}}}
+
+
+def _node(path, class_, **attrs):
+    node = PcieNode(path, auto_load=False)
+    node.class_ = class_
+    node.max_link_speed, node.max_link_width = "32.0 GT/s PCIe", "16"
+    for name, value in attrs.items():
+        setattr(node, name, value)
+    return node
+
+
+def _roots():
+    port = _node("/sys/devices/pci0000:10/0000:10:01.0", "0x060400", numa_node="0")
+    port.children = [
+        _node(f"{port.path}/0000:18:00.0", "0x030200", vendor="0x10de", current_link_width="8"),
+        _node(f"{port.path}/0000:19:00.0", "0x030200", vendor="0x10de"),
+    ]
+    # A childless root, which is left out.
+    return [port, _node("/sys/devices/pci0000:00/0000:00:00.0", "0x060000", numa_node="0")]
+
+
+@pytest.mark.parametrize("name", ["host.json", "host.jsonl", "host.bin"])
+def test_table_fingerprint_matches_trees(tmp_path, name):
+    path = str(tmp_path / name)
+    dump_ir(path, _roots(), NVLINK)
+    roots, nvlink_data, _ = load_ir_sections(path)
+    expected = fingerprint_forest([r for r in roots if r.children], SystemIdentifierResolver.from_ir(nvlink_data))
+
+    result = fingerprint_host("host", path)
+    assert result.error is None
+    assert (result.fingerprint, result.entries) == expected
+    assert [e[:3] + (e[5],) for e in result.entries] == [
+        ("0000:10:01.0", None, None, None),
+        ("0000:18:00.0", None, "8", 0),
+        ("0000:19:00.0", None, None, 1),
+    ]
+    assert len(load_ir_table_sections(path)[0]) == 4
@@ -0,0 +1,114 @@
+import io
+import os
+import pytest
+import pcie_node
+import sysfs_index
+import system_identifiers
+from conftest import FIXTURES, add_sysfs_device
+from pcie_topo_gen import explore_pcie_container
+from pcie_topo_vis import add_synth_mf_nodes
+from system_identifiers import RecordedProbes, SystemIdentifierResolver, VendorProbes
+from topology_watch import FileUeventSource, TopologyWatcher
+
+
+# Sysfs before the replay: a dual-port NIC below 00:01.0 (NUMA 0) and an
+# empty root port 80:01.0 (NUMA 1).
+DEVICES = {
+    "pci0000:00/0000:00:01.0": {"class": "0x060400", "numa_node": "0"},
+    "pci0000:00/0000:00:01.0/0000:01:00.0": {"class": "0x020000", "vendor": "0x15b3", "current_link_width": "16"},
+    "pci0000:00/0000:00:01.0/0000:01:00.1": {"class": "0x020000", "vendor": "0x15b3"},
+    "pci0000:80/0000:80:01.0": {"class": "0x060400", "numa_node": "1"},
+}
+
+
+def _remove_device(sys_root, rel_path):
+    path = sys_root / "devices" / rel_path
+    (sys_root / "bus" / "pci" / "devices" / path.name).unlink()
+    for child in path.iterdir():
+        child.unlink()
+    path.rmdir()
+
+
+def _shape(node):
+    """(name, children) of a tree, with children in BDF order."""
+    return (os.path.basename(node.path), sorted(_shape(c) for c in node.children))
+
+
+@pytest.fixture
+def sys_root(tmp_path, monkeypatch):
+    root = tmp_path / "sys"
+    for rel_path, attrs in DEVICES.items():
+        add_sysfs_device(root, rel_path, attrs)
+    # No lspci records, no local identifiers or probes.
+    monkeypatch.setattr(pcie_node, "load_lspci_snapshot", lambda: {})
+    monkeypatch.setattr(sysfs_index, "_sysfs_index", sysfs_index.SysfsIndex(str(root / "bus" / "pci" / "devices")))
+    monkeypatch.setattr(
+        system_identifiers, "_system_resolver",
+        SystemIdentifierResolver(sysfs_index.get_sysfs_index(), RecordedProbes({})),
+    )
+    return root
+
+
+def test_replay(sys_root):
+    roots = []
+    for container in ("pci0000:00", "pci0000:80"):
+        roots += explore_pcie_container(str(sys_root / "devices" / container))
+    for root in roots:
+        add_synth_mf_nodes(root)
+
+    renders = []
+    watcher = TopologyWatcher(
+        roots, lambda numa, numa_roots: renders.append((numa, [_shape(r) for r in numa_roots])), sysfs_root=str(sys_root)
+    )
+    assert [_shape(r) for r in watcher.visible_roots()] == [
+        ("0000:00:01.0", [("0000:01:00.x", [("0000:01:00.0", []), ("0000:01:00.1", [])])]),
+    ]
+
+    # Sysfs after the replayed events: a GPU hot-added below 80:01.0, the NIC's
+    # second function removed, and its first one retrained at x8 with a netdev.
+    add_sysfs_device(sys_root, "pci0000:80/0000:80:01.0/0000:81:00.0", {"class": "0x030200", "vendor": "0x10de"})
+    _remove_device(sys_root, "pci0000:00/0000:00:01.0/0000:01:00.1")
+    nic = sys_root / "devices" / "pci0000:00/0000:00:01.0/0000:01:00.0"
+    (nic / "current_link_width").write_text("8\n")
+    (nic / "net" / "eth0").mkdir(parents=True)
+
+    with open(os.path.join(FIXTURES, "uevents_hotplug.txt")) as f:
+        watcher.run(FileUeventSource(f), debounce=0)
+
+    # One render per burst and affected NUMA node; the last burst only has ignored events.
+    nic_tree = ("0000:00:01.0", [("0000:01:00.0", [])])
+    assert renders == [
+        ("1", [("0000:80:01.0", [("0000:81:00.0", [])])]),
+        ("0", [nic_tree]),
+        ("0", [nic_tree]),
+    ]
+    assert [_shape(r) for r in watcher.visible_roots()] == [nic_tree, renders[0][1][0]]
+
+    node = watcher.nodes[str(nic)]
+    assert node.current_link_width == "8"
+    assert str(sys_root / "devices/pci0000:00/0000:00:01.0/0000:01:00.1") not in watcher.nodes
+    assert system_identifiers.get_system_resolver().get_network_interface(node) == "eth0"
+
+
+def test_gpu_hot_add_reprobes(sys_root, monkeypatch):
+    # nvidia-smi lists no GPU until one is plugged in.
+    monkeypatch.setattr(system_identifiers, "VENDOR_PROBE_COMMANDS", {
+        "nvidia-smi": ["true"], "amd-smi": ["false"], "nvidia-smi-topo": ["true"],
+    })
+    resolver = SystemIdentifierResolver(sysfs_index.get_sysfs_index(), VendorProbes(use_nvml=False))
+    monkeypatch.setattr(system_identifiers, "_system_resolver", resolver)
+    roots = explore_pcie_container(str(sys_root / "devices" / "pci0000:00"))
+    roots += explore_pcie_container(str(sys_root / "devices" / "pci0000:80"))
+    renders = []
+    watcher = TopologyWatcher(roots, lambda numa, numa_roots: renders.append(numa), sysfs_root=str(sys_root))
+
+    add_sysfs_device(sys_root, "pci0000:80/0000:80:01.0/0000:81:00.0", {"class": "0x030200", "vendor": "0x10de"})
+    monkeypatch.setitem(
+        system_identifiers.VENDOR_PROBE_COMMANDS, "nvidia-smi", ["cat", os.path.join(FIXTURES, "nvidia_smi_query.txt")]
+    )
+    watcher.run(FileUeventSource(io.StringIO("add@/devices/pci0000:80/0000:80:01.0/0000:81:00.0 SUBSYSTEM=pci\n")), debounce=0)
+
+    gpu = watcher.nodes[str(sys_root / "devices/pci0000:80/0000:80:01.0/0000:81:00.0")]
+    assert resolver.get_gpu_index(gpu) == 0
+    # The GPU map changed, so every graph is re-rendered.
+    assert sorted(renders) == ["0", "1"]
@@ -0,0 +1,210 @@
+"""
+Differences between two PCIe topology IR snapshots (--diff OLD NEW).
+
+Nodes are joined on their BDF through one dict per snapshot. The report
+lists devices that were:
+  - added / removed: BDF present in only one snapshot.
+  - moved: same BDF under a different parent, or a removed and an added
+    device with the same vendor, device and class (e.g., a re-seated
+    card that came back at another address), when that pairing is unique.
+  - changed: same BDF and parent, with different vendor, device, class,
+    NUMA node or link speed/width.
+"""
+
+import json
+from collections import defaultdict
+from os.path import basename
+from typing import Dict, IO, List, Optional, Tuple
+from graphviz import Digraph
+from ir_io import iter_nodes, load_ir
+from pcie_node import NODE_FIELDS, PcieNode
+
+
+# IR fields compared between matched devices.
+DIFF_FIELDS = (
+    "vendor", "device", "class", "numa_node",
+    "max_link_speed", "current_link_speed", "max_link_width", "current_link_width",
+)
+
+# Delta graph colors.
+ADDED_COLOR = "palegreen"
+REMOVED_COLOR = "lightpink"
+MOVED_COLOR = "lightskyblue"
+CHANGED_COLOR = "orange"
+UNCHANGED_COLOR = "white"
+
+
+def _index_by_bdf(roots: List[PcieNode]) -> Dict[str, Tuple[PcieNode, Optional[str]]]:
+    """BDF -> (node, parent BDF) for every node of the forest."""
+    index = {}
+    for node, parent in iter_nodes(roots):
+        index[basename(node.path).lower()] = (node, basename(parent.path).lower() if parent is not None else None)
+    return index
+
+
+def _field(node: PcieNode, field: str):
+    return getattr(node, NODE_FIELDS[field])
+
+
+def _summary(node: PcieNode, parent: Optional[str]) -> Dict:
+    return {
+        "bdf": basename(node.path).lower(),
+        "parent": parent,
+        "vendor": node.vendor,
+        "device": node.device,
+        "class": node.class_,
+    }
+
+
+def diff_topologies(old_roots: List[PcieNode], new_roots: List[PcieNode]) -> Dict:
+    old = _index_by_bdf(old_roots)
+    new = _index_by_bdf(new_roots)
+
+    added = [bdf for bdf in new if bdf not in old]
+    removed = [bdf for bdf in old if bdf not in new]
+    moved: List[Dict] = []
+    changed: List[Dict] = []
+
+    for bdf, (new_node, new_parent) in new.items():
+        entry = old.get(bdf)
+        if entry is None:
+            continue
+        old_node, old_parent = entry
+        if old_parent != new_parent:
+            moved.append({
+                "old_bdf": bdf, "new_bdf": bdf,
+                "old_parent": old_parent, "new_parent": new_parent,
+                "vendor": new_node.vendor, "device": new_node.device,
+            })
+            continue
+        changes = {}
+        for field in DIFF_FIELDS:
+            old_value, new_value = _field(old_node, field), _field(new_node, field)
+            if old_value != new_value:
+                changes[field] = {"old": old_value, "new": new_value}
+        if changes:
+            changed.append({"bdf": bdf, "parent": new_parent, "changes": changes})
+
+    # Pair removed and added devices that are the same part, when unambiguous.
+    def identity(node: PcieNode) -> Tuple:
+        return (node.vendor, node.device, node.class_)
+
+    removed_by_identity: Dict[Tuple, List[str]] = defaultdict(list)
+    for bdf in removed:
+        removed_by_identity[identity(old[bdf][0])].append(bdf)
+    added_by_identity: Dict[Tuple, List[str]] = defaultdict(list)
+    for bdf in added:
+        added_by_identity[identity(new[bdf][0])].append(bdf)
+
+    paired = set()
+    for key, old_bdfs in removed_by_identity.items():
+        new_bdfs = added_by_identity.get(key, [])
+        if len(old_bdfs) == 1 and len(new_bdfs) == 1 and key[0] is not None:
+            old_bdf, new_bdf = old_bdfs[0], new_bdfs[0]
+            paired.update((old_bdf, new_bdf))
+            moved.append({
+                "old_bdf": old_bdf, "new_bdf": new_bdf,
+                "old_parent": old[old_bdf][1], "new_parent": new[new_bdf][1],
+                "vendor": key[0], "device": key[1],
+            })
+
+    added_entries = [_summary(*new[bdf]) for bdf in added if bdf not in paired]
+    removed_entries = [_summary(*old[bdf]) for bdf in removed if bdf not in paired]
+
+    return {
+        "summary": {
+            "old_devices": len(old),
+            "new_devices": len(new),
+            "added": len(added_entries),
+            "removed": len(removed_entries),
+            "moved": len(moved),
+            "changed": len(changed),
+        },
+        "added": added_entries,
+        "removed": removed_entries,
+        "moved": moved,
+        "changed": changed,
+    }
+
+
+def diff_ir_files(old_path: str, new_path: str) -> Tuple[Dict, List[PcieNode]]:
+    """The diff report of two IR files and the roots of the new one."""
+    old_roots, _ = load_ir(old_path)
+    new_roots, _ = load_ir(new_path)
+    report = {"old": old_path, "new": new_path}
+    report.update(diff_topologies(old_roots, new_roots))
+    return report, new_roots
+
+
+def write_diff(f: IO[str], report: Dict, compact: bool = False) -> None:
+    if compact:
+        f.write(json.dumps(report, separators=(",", ":")) + "\n")
+    else:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def build_diff_graph(new_roots: List[PcieNode], report: Dict, name: str, output_dir: str = ".") -> Digraph:
+    """
+    The new topology with added, moved and changed devices highlighted,
+    and removed devices drawn dashed under their old parent.
+    """
+    from pcie_topo_vis import (
+        add_clusters, add_synth_mf_nodes, get_node_id, get_topology_clusters, graph_tree,
+    )
+
+    for root in new_roots:
+        add_synth_mf_nodes(root)
+    nodes = {basename(n.path).lower(): n for n, _ in iter_nodes(new_roots)}
+    # The local system's identifiers do not apply to another host's snapshot.
+    identifiers = {n.path: (None, None, None, None) for n in nodes.values()}
+
+    graph = Digraph(name=name, filename=name, format="pdf")
+    graph.attr(compound="true")
+    graph.directory = output_dir
+    for root in new_roots:
+        graph_tree(root, graph, identifiers)
+    for root in new_roots:
+        mf_switch_clusters, switch_clusters, mf_clusters = get_topology_clusters(root)
+        add_clusters(graph, mf_switch_clusters, "lightblue")
+        add_clusters(graph, switch_clusters, "lightblue")
+        add_clusters(graph, mf_clusters, "yellow")
+
+    # Re-declared nodes keep their label and take the new attributes.
+    for node in nodes.values():
+        graph.node(get_node_id(node), fillcolor=UNCHANGED_COLOR)
+    for entry in report["added"]:
+        if entry["bdf"] in nodes:
+            graph.node(get_node_id(nodes[entry["bdf"]]), fillcolor=ADDED_COLOR, penwidth="3")
+    for entry in report["moved"]:
+        if entry["new_bdf"] in nodes:
+            xlabel = f"moved from {entry['old_bdf']}" if entry["old_bdf"] != entry["new_bdf"] else "moved"
+            graph.node(get_node_id(nodes[entry["new_bdf"]]), fillcolor=MOVED_COLOR, penwidth="3", xlabel=xlabel)
+    for entry in report["changed"]:
+        if entry["bdf"] in nodes:
+            changes = "\n".join(f"{k}: {v['old']} -> {v['new']}" for k, v in entry["changes"].items())
+            graph.node(get_node_id(nodes[entry["bdf"]]), fillcolor=CHANGED_COLOR, penwidth="3", xlabel=changes)
+
+    def removed_node_id(bdf: str) -> str:
+        return f"removed_{bdf.replace(':', '_').replace('.', '_')}"
+
+    # Old parent BDFs of removed devices are drawn where they are now: at
+    # their new BDF if they were paired as moved, or as removed nodes.
+    new_bdf_of = {entry["old_bdf"]: entry["new_bdf"] for entry in report["moved"]}
+    removed_bdfs = {entry["bdf"] for entry in report["removed"]}
+    for entry in report["removed"]:
+        removed_id = removed_node_id(entry["bdf"])
+        graph.node(
+            removed_id, label=f"{entry['bdf']}\n(removed)",
+            style="filled,dashed", fillcolor=REMOVED_COLOR,
+        )
+        parent_bdf = entry["parent"]
+        if parent_bdf is None:
+            continue
+        parent = nodes.get(new_bdf_of.get(parent_bdf, parent_bdf))
+        if parent is not None:
+            graph.edge(get_node_id(parent), removed_id, style="dashed", color="red")
+        elif parent_bdf in removed_bdfs:
+            graph.edge(removed_node_id(parent_bdf), removed_id, style="dashed", color="red")
+
+    return graph
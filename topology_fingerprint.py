@@ -0,0 +1,153 @@
+"""
+Address-agnostic structural fingerprints of PCIe forests, used to render
+each distinct topology of a fleet once (--from-ir-dir --dedup).
+
+A node's signature hashes its class, vendor/device, maximum link speed and
+width, device/function number, which system identifiers it has (netdev,
+RDMA, GPU, NVMe) and the sorted signatures of its children. PCI domains and
+bus numbers, current link state and the identifier values themselves are
+left out: they only change labels, and are recorded as per-host overrides.
+
+Nodes are put in a canonical order (pre-order, children sorted by signature
+then BDF), computed in the same pass. The NVLink matrix is hashed in terms
+of the GPUs' canonical positions, and two hosts with the same fingerprint
+are matched node by node through that order.
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+from pcie_node import PcieNode, bdf_pattern
+from topology_table import TopologyTable
+
+
+FINGERPRINT_SIZE = 8  # Bytes; fingerprints are 16 hex digits.
+
+# Per-node values that may differ between hosts sharing a fingerprint.
+OVERRIDE_FIELDS = ("bdf", "current_link_speed", "current_link_width", "netdev", "rdma", "gpu", "nvme")
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=FINGERPRINT_SIZE).hexdigest()
+
+
+def _bdf(table: TopologyTable, i: int) -> Optional[str]:
+    name = table.name(i).lower()
+    return name if bdf_pattern.match(name) else None
+
+
+def _slot(bdf: Optional[str]) -> str:
+    """Device/function part of the BDF (e.g., "02.1"), which is stable across hosts of one SKU."""
+    return bdf.split(":", 2)[2] if bdf is not None else ""
+
+
+def fingerprint_forest(roots: List[PcieNode], sys_resolver) -> Tuple[str, List[Tuple]]:
+    """Fingerprint of the trees `roots`, see fingerprint_table."""
+    return fingerprint_table(TopologyTable.from_roots(roots), sys_resolver)
+
+
+def fingerprint_table(table: TopologyTable, sys_resolver, roots: Optional[Iterable[int]] = None) -> Tuple[str, List[Tuple]]:
+    """
+    Fingerprint of the trees of `table` with root indices `roots` (default:
+    all) and, in canonical order, each node's override values (see
+    OVERRIDE_FIELDS). `sys_resolver` provides the system identifiers and
+    NVLink connections.
+    """
+    roots = list(table.roots if roots is None else roots)
+    nodes = [i for r in roots for i in table.subtree(r)]
+    bdfs = {i: _bdf(table, i) for i in nodes}
+    identifiers = {
+        i: sys_resolver.get_all_identifiers(bdfs[i] if bdfs[i] is not None else table.path(i)) for i in nodes
+    }
+
+    # Children come after their parent in pre-order, so reversed order hashes them first.
+    signatures: Dict[int, str] = {}
+    for i in reversed(nodes):
+        present = "".join("1" if value is not None else "0" for value in identifiers[i])
+        children = sorted(signatures[c] for c in table.children(i))
+        fields = [
+            table.get(i, "class"), table.get(i, "vendor"), table.get(i, "device"),
+            table.get(i, "max_link_speed"), table.get(i, "max_link_width"),
+            _slot(bdfs[i]), present,
+            table.get(i, "numa_node") if table.parent[i] < 0 else "",
+        ]
+        signatures[i] = _digest("|".join(f or "" for f in fields) + "[" + ",".join(children) + "]")
+
+    def sort_key(i: int) -> Tuple[str, str]:
+        return (signatures[i], table.name(i))
+
+    ordered: List[int] = []
+    stack = sorted(roots, key=sort_key, reverse=True)
+    while stack:
+        i = stack.pop()
+        ordered.append(i)
+        stack.extend(sorted(table.children(i), key=sort_key, reverse=True))
+
+    # NVLink edges between canonical GPU positions.
+    position = {}
+    for pos, i in enumerate(ordered):
+        gpu_idx = identifiers[i][2]
+        if gpu_idx is not None and gpu_idx not in position:
+            position[gpu_idx] = pos
+    nvlinks = sorted(
+        (position[gpu_idx], position[peer], link_type)
+        for gpu_idx in position
+        for peer, link_type in sys_resolver.get_nvlink_connections(gpu_idx).items()
+        if peer in position
+    )
+
+    fingerprint = _digest(
+        ",".join(sorted(signatures[r] for r in roots))
+        + "|nvlink:" + ";".join(f"{a}-{b}:{t}" for a, b, t in nvlinks)
+    )
+    entries = [
+        (table.name(i), table.get(i, "current_link_speed"), table.get(i, "current_link_width")) + tuple(identifiers[i])
+        for i in ordered
+    ]
+    return fingerprint, entries
+
+
+def host_overrides(representative: List[Tuple], host: List[Tuple]) -> Dict[str, Dict]:
+    """
+    Values of `host` that differ from the representative's, keyed by the
+    representative's node name (BDF), e.g. {"0000:18:00.0": {"bdf": "0000:19:00.0", "netdev": "eth2"}}.
+    """
+    overrides: Dict[str, Dict] = {}
+    for rep_entry, host_entry in zip(representative, host):
+        changed = {
+            field: host_value
+            for field, rep_value, host_value in zip(OVERRIDE_FIELDS, rep_entry, host_entry)
+            if rep_value != host_value
+        }
+        if changed:
+            overrides[rep_entry[0]] = changed
+    return overrides
+
+
+def group_by_fingerprint(fingerprints: Dict[str, str]) -> Dict[str, List[str]]:
+    """Fingerprint -> sorted hosts, from host -> fingerprint."""
+    groups: Dict[str, List[str]] = {}
+    for host in sorted(fingerprints):
+        groups.setdefault(fingerprints[host], []).append(host)
+    return groups
+
+
+def build_fingerprint_index(
+    fingerprints: Dict[str, str], entries: Dict[str, List[Tuple]], paths: Optional[Dict[str, str]] = None
+) -> Dict:
+    """
+    The host -> fingerprint index written by --dedup: each topology with its
+    representative (rendered) host, and each host with its overrides.
+    """
+    topologies = {}
+    hosts = {}
+    for fingerprint, members in group_by_fingerprint(fingerprints).items():
+        representative = members[0]
+        topologies[fingerprint] = {"representative": representative, "hosts": members}
+        for host in members:
+            hosts[host] = {
+                "fingerprint": fingerprint,
+                "overrides": host_overrides(entries[representative], entries[host]),
+            }
+            if paths is not None:
+                hosts[host]["ir"] = paths[host]
+    return {"topologies": topologies, "hosts": hosts}
@@ -0,0 +1,309 @@
+"""
+Compact, struct-of-arrays representation of a PCIe forest.
+Used to hold many topologies (e.g., IR dumps aggregated from a fleet) in
+memory: it backs the binary IR format and is what --from-ir-dir --dedup
+fingerprints (see topology_fingerprint.fingerprint_table).
+"""
+
+import sys
+from array import array
+from itertools import chain
+from os.path import basename, dirname
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pcie_node import NODE_FIELDS, PcieNode, bdf_pattern
+
+
+# Columns holding string ids, in IR field order (without `lspci_vmm`).
+TABLE_FIELDS: Tuple[str, ...] = tuple(f for f in NODE_FIELDS if f != "lspci_vmm")
+# PcieNode attribute name -> IR field name.
+_ATTR_FIELDS: Dict[str, str] = {attr: field for field, attr in NODE_FIELDS.items()}
+
+
+class StringPool:
+    """Interns strings into dense integer ids. Id 0 is reserved for None."""
+
+    def __init__(self) -> None:
+        self.strings: List[Optional[str]] = [None]
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            value = sys.intern(value)
+            self.strings.append(value)
+            self.ids[value] = string_id
+        return string_id
+
+    @classmethod
+    def from_strings(cls, strings: List[Optional[str]]) -> "StringPool":
+        """Rebuilds a pool whose ids are the positions in `strings` (strings[0] is None)."""
+        pool = cls()
+        pool.strings = strings
+        pool.ids = {s: i for i, s in enumerate(strings) if s is not None}
+        return pool
+
+    def __getitem__(self, string_id: int) -> Optional[str]:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class TableNode(PcieNode):
+    """
+    A PcieNode backed by row `index` of a TopologyTable (e.g., a memory-mapped
+    binary IR). Its path, BDF, children and fields are read from the table
+    the first time they are accessed, so only the nodes that are visited
+    are ever built.
+    """
+
+    def __init__(self, table: "TopologyTable", index: int, parent: Optional[PcieNode] = None) -> None:
+        # PcieNode.__init__ is skipped: everything it sets is read on first access.
+        self._table = table
+        self._index = index
+        self.parent = parent
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes that are not set yet.
+        if "_table" not in self.__dict__:
+            raise AttributeError(name)
+        table, index = self._table, self._index
+        if name == "path":
+            value = table.path(index)
+        elif name == "bdf":
+            bdf = table.name(index).lower()
+            value = bdf if bdf_pattern.match(bdf) else None
+        elif name == "_children":
+            value = [TableNode(table, c, self) for c in table.children(index)]
+        elif name == "lspci_vmm":
+            value = table.lspci(index)
+        elif name in _ATTR_FIELDS:
+            # Read the whole row at once: the other fields are usually needed too.
+            strings = table.strings.strings
+            for attr, column in table._attr_columns():
+                if attr not in self.__dict__:
+                    self.__dict__[attr] = strings[column[index]]
+            return self.__dict__[name]
+        else:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        self.__dict__[name] = value
+        return value
+
+    def _read_attribute(self, attr: str):
+        if attr == "lspci_vmm":
+            return self._table.lspci(self._index)
+        return self._table.get(self._index, _ATTR_FIELDS[attr])
+
+
+class TopologyTable:
+    """
+    Nodes are stored in pre-order, so every subtree is a contiguous range.
+    Each node `i` has:
+      - `parent[i]`: index of its parent, or -1 for roots.
+      - children `child_index[child_offsets[i]:child_offsets[i + 1]]` (CSR).
+      - one interned string id per field in `columns[field][i]`.
+      - lspci tag/value id pairs in `lspci_pairs[2 * lspci_offsets[i]:2 * lspci_offsets[i + 1]]`.
+      - its sysfs path split into interned `dir_ids[i]` and `name_ids[i]`.
+    Columns are arrays, or read-only memoryviews over a memory-mapped
+    binary IR file (see `ir_io.load_ir_table`).
+    """
+
+    def __init__(self) -> None:
+        self.strings = StringPool()
+        self.roots = array("I")
+        self.parent = array("i")
+        self.dir_ids = array("I")
+        self.name_ids = array("I")
+        self.columns: Dict[str, array] = {field: array("I") for field in TABLE_FIELDS}
+        self.child_offsets = array("I", [0])
+        self.child_index = array("I")
+        self.lspci_offsets = array("I", [0])
+        self.lspci_pairs = array("I")
+        # name_id -> index of the first node with that name; built with the
+        # table, or on the first `find` for tables loaded from a binary IR.
+        self._name_index: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def from_roots(cls, roots: Iterable[PcieNode]) -> "TopologyTable":
+        """Builds a table from the roots returned by `get_pcie_trees`."""
+        return cls._build(
+            roots,
+            children=lambda n: n.children,
+            path=lambda n: n.path,
+            field=lambda n, f: getattr(n, NODE_FIELDS[f]),
+            lspci=lambda n: n.lspci_vmm,
+        )
+
+    @classmethod
+    def from_dicts(cls, roots: Iterable[Dict]) -> "TopologyTable":
+        """Builds a table straight from `PcieNode.to_dict` output, without creating nodes."""
+        return cls._build(
+            roots,
+            children=lambda d: d.get("children", []),
+            path=lambda d: d["path"],
+            field=lambda d, f: d.get(f),
+            lspci=lambda d: d.get("lspci_vmm"),
+        )
+
+    @classmethod
+    def _build(
+        cls,
+        roots: Iterable,
+        children: Callable,
+        path: Callable,
+        field: Callable,
+        lspci: Callable,
+    ) -> "TopologyTable":
+        table = cls()
+        intern = table.strings.intern
+        child_lists: List[List[int]] = []
+        table._name_index = {}
+
+        stack = [(r, -1) for r in reversed(list(roots))]
+        while stack:
+            obj, parent_idx = stack.pop()
+            idx = len(table.parent)
+            table.parent.append(parent_idx)
+            child_lists.append([])
+            if parent_idx < 0:
+                table.roots.append(idx)
+            else:
+                child_lists[parent_idx].append(idx)
+
+            node_path = path(obj)
+            table.dir_ids.append(intern(dirname(node_path)))
+            name_id = intern(basename(node_path))
+            table.name_ids.append(name_id)
+            table._name_index.setdefault(name_id, idx)
+            for f in TABLE_FIELDS:
+                table.columns[f].append(intern(field(obj, f)))
+
+            record = lspci(obj) or {}
+            for tag, value in record.items():
+                table.lspci_pairs.append(intern(tag))
+                table.lspci_pairs.append(intern(value))
+            table.lspci_offsets.append(table.lspci_offsets[-1] + len(record))
+
+            stack.extend((c, idx) for c in reversed(list(children(obj))))
+
+        for child_list in child_lists:
+            table.child_index.extend(child_list)
+            table.child_offsets.append(len(table.child_index))
+
+        return table
+
+    def to_roots(self, lazy: bool = False) -> List[PcieNode]:
+        """
+        Materializes the forest back into PcieNode trees. With `lazy`, only
+        the roots are built; they are TableNodes, which build their
+        children and read their fields from the table on first access.
+        """
+        if lazy:
+            return [TableNode(self, r) for r in self.roots]
+
+        strings = self.strings.strings
+        dir_ids = self.dir_ids.tolist()
+        name_ids = self.name_ids.tolist()
+        columns = [(NODE_FIELDS[f], self.columns[f].tolist()) for f in TABLE_FIELDS]
+        lspci_offsets = self.lspci_offsets.tolist()
+        lspci_pairs = self.lspci_pairs.tolist()
+
+        nodes: List[PcieNode] = []
+        for i in range(len(self)):
+            node = PcieNode(f"{strings[dir_ids[i]]}/{strings[name_ids[i]]}", auto_load=False)
+            for attr, column in columns:
+                setattr(node, attr, strings[column[i]])
+            start, end = 2 * lspci_offsets[i], 2 * lspci_offsets[i + 1]
+            if start != end:
+                node.lspci_vmm = {
+                    strings[lspci_pairs[k]]: strings[lspci_pairs[k + 1]] for k in range(start, end, 2)
+                }
+            nodes.append(node)
+
+        child_offsets = self.child_offsets.tolist()
+        child_index = self.child_index.tolist()
+        for i, node in enumerate(nodes):
+            start, end = child_offsets[i], child_offsets[i + 1]
+            if start != end:
+                node.children = [nodes[c] for c in child_index[start:end]]
+        return [nodes[r] for r in self.roots]
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def path(self, i: int) -> str:
+        return f"{self.strings[self.dir_ids[i]]}/{self.strings[self.name_ids[i]]}"
+
+    def name(self, i: int) -> str:
+        """Basename of the sysfs path, i.e., the BDF (e.g., "0000:e1:00.0")."""
+        return self.strings[self.name_ids[i]]
+
+    def _attr_columns(self) -> List[Tuple[str, array]]:
+        """(PcieNode attribute, column) of every TABLE_FIELDS entry."""
+        return [(NODE_FIELDS[f], self.columns[f]) for f in TABLE_FIELDS]
+
+    def get(self, i: int, field: str) -> Optional[str]:
+        """Value of IR field `field` (e.g., "class") for node `i`."""
+        return self.strings[self.columns[field][i]]
+
+    def lspci(self, i: int) -> Optional[Dict[str, str]]:
+        start = 2 * self.lspci_offsets[i]
+        end = 2 * self.lspci_offsets[i + 1]
+        if start == end:
+            return None
+        pairs = self.lspci_pairs[start:end]
+        return {self.strings[pairs[k]]: self.strings[pairs[k + 1]] for k in range(0, len(pairs), 2)}
+
+    def find(self, bdf: str) -> Optional[int]:
+        """Index of the node whose BDF is `bdf`, or None."""
+        name_id = self.strings.ids.get(bdf.lower())
+        if name_id is None:
+            return None
+        if self._name_index is None:
+            self._name_index = {}
+            for i, n in enumerate(self.name_ids):
+                self._name_index.setdefault(n, i)
+        return self._name_index.get(name_id)
+
+    def children(self, i: int) -> array:
+        return self.child_index[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def subtree(self, i: int) -> range:
+        """Indices of the subtree rooted at `i` (contiguous in pre-order)."""
+        # The subtree ends at the first later node whose parent precedes `i`.
+        end = i + 1
+        while end < len(self) and self.parent[end] >= i:
+            end += 1
+        return range(i, end)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the table: the column buffers (with their
+        spare capacity), the string pool and the name index, including the
+        strings and int objects they hold (each object counted once).
+        """
+        arrays = [
+            self.roots, self.parent, self.dir_ids, self.name_ids,
+            self.child_offsets, self.child_index, self.lspci_offsets, self.lspci_pairs,
+            *self.columns.values(),
+        ]
+        # Memory-mapped columns are views into the file's pages.
+        total = sum(sys.getsizeof(a) if isinstance(a, array) else a.nbytes for a in arrays)
+
+        containers: List = [self.strings.strings, self.strings.ids]
+        objects = chain(self.strings.strings, self.strings.ids.values())
+        if self._name_index is not None:
+            containers.append(self._name_index)
+            objects = chain(objects, self._name_index.keys(), self._name_index.values())
+        total += sum(sys.getsizeof(c) for c in containers)
+        seen = set()
+        for obj in objects:
+            # Small ints (and None) are shared singletons.
+            if obj is None or (isinstance(obj, int) and -5 <= obj <= 256) or id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+        return total
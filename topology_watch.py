@@ -0,0 +1,372 @@
+"""
+Watch mode (--watch): keeps the discovered PCIe trees up to date from
+kernel uevents and re-renders only the NUMA graphs whose trees changed.
+
+Event sources:
+  - NetlinkUeventSource: the kernel's NETLINK_KOBJECT_UEVENT broadcast.
+  - PollUeventSource: rescans /sys/bus/pci/devices and reports added and
+    removed devices (fallback when netlink is unavailable).
+  - FileUeventSource: replays uevent lines ("add@/devices/pci0000:00/...",
+    optionally followed by " SUBSYSTEM=pci") from a file, FIFO or stdin.
+    Lines up to a blank line are handled as one burst.
+"""
+
+import os
+import select
+import socket
+import sys
+import time
+from typing import Callable, Dict, IO, List, Optional, Set
+from pcie_node import PcieNode, iter_tree, reset_lspci_snapshot
+from pcie_topo_gen import explore_pcie_container
+from sysfs_index import CHILD_SUBSYSTEMS, pci_container_pattern, refresh_sysfs_index
+
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_BUFFER_SIZE = 64 * 1024
+# Subsystems whose events can change the graphs.
+WATCHED_SUBSYSTEMS = ("pci",) + CHILD_SUBSYSTEMS
+# Events arriving within this window (seconds) are handled together.
+DEBOUNCE_SECONDS = 0.5
+# Classes of devices whose GPU index comes from the vendor probes (VGA and
+# 3D controllers, processing accelerators such as AMD Instinct GPUs).
+GPU_CLASS_PREFIXES = ("0x0300", "0x0302", "0x1200")
+
+
+class Uevent:
+    def __init__(self, action: str, devpath: str, subsystem: Optional[str] = None):
+        self.action = action  # E.g., "add", "remove", "change"
+        self.devpath = devpath  # E.g., "/devices/pci0000:00/0000:00:01.0/0000:01:00.0"
+        self.subsystem = subsystem  # E.g., "pci"; None if unknown
+
+    def __repr__(self) -> str:
+        return f"Uevent({self.action}@{self.devpath}, subsystem={self.subsystem})"
+
+    @classmethod
+    def parse(cls, message: bytes) -> Optional["Uevent"]:
+        """Parses a kernel uevent ("action@devpath\\0KEY=VALUE\\0...")."""
+        parts = message.split(b"\0")
+        header = parts[0].decode(errors="replace")
+        action, sep, devpath = header.partition("@")
+        if not sep:
+            return None
+        env = {}
+        for part in parts[1:]:
+            key, sep, value = part.decode(errors="replace").partition("=")
+            if sep:
+                env[key] = value
+        return cls(env.get("ACTION", action), env.get("DEVPATH", devpath), env.get("SUBSYSTEM"))
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional["Uevent"]:
+        """Parses "action@devpath [SUBSYSTEM=...]"; the subsystem is guessed if missing."""
+        fields = line.split()
+        if not fields:
+            return None
+        event = cls.parse(fields[0].encode() + b"\0" + b"\0".join(f.encode() for f in fields[1:]))
+        if event is not None and event.subsystem is None:
+            parent_dir = os.path.basename(os.path.dirname(event.devpath))
+            event.subsystem = parent_dir if parent_dir in CHILD_SUBSYSTEMS else "pci"
+        return event
+
+
+class NetlinkUeventSource:
+    def __init__(self) -> None:
+        # Raises OSError (e.g., PermissionError) if netlink is unavailable.
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+        self.sock.bind((0, 1))  # Multicast group 1: kernel events
+
+    def read(self, timeout: Optional[float]) -> Optional[List[Uevent]]:
+        """Events received within `timeout` seconds; None when the source is closed."""
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        events = []
+        while ready:
+            try:
+                message = self.sock.recv(UEVENT_BUFFER_SIZE, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            event = Uevent.parse(message)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class PollUeventSource:
+    def __init__(self, interval: float = 2.0, sysfs_root: str = "/sys") -> None:
+        self.interval = interval
+        self.sysfs_root = sysfs_root
+        self.pci_devices_dir = os.path.join(sysfs_root, "bus", "pci", "devices")
+        self.devices = self._scan()
+        self._next_poll = time.monotonic() + interval
+
+    def _scan(self) -> Dict[str, str]:
+        """BDF -> devpath of every PCI device."""
+        devices = {}
+        try:
+            with os.scandir(self.pci_devices_dir) as it:
+                for entry in it:
+                    devices[entry.name] = os.path.realpath(entry.path)[len(self.sysfs_root):]
+        except OSError:
+            pass
+        return devices
+
+    def read(self, timeout: Optional[float]) -> Optional[List[Uevent]]:
+        delay = max(0.0, self._next_poll - time.monotonic())
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(delay)
+        self._next_poll = time.monotonic() + self.interval
+
+        devices = self._scan()
+        events = [Uevent("remove", path, "pci") for bdf, path in self.devices.items() if bdf not in devices]
+        events += [Uevent("add", path, "pci") for bdf, path in devices.items() if bdf not in self.devices]
+        self.devices = devices
+        return events
+
+    def close(self) -> None:
+        pass
+
+
+class FileUeventSource:
+    def __init__(self, f: IO[str]) -> None:
+        self.f = f
+
+    def read(self, timeout: Optional[float]) -> Optional[List[Uevent]]:
+        # Bursts are delimited by the writer, so there is nothing to wait for.
+        if timeout is not None:
+            return []
+        events = []
+        for line in iter(self.f.readline, ""):
+            if not line.strip():
+                if events:
+                    break
+                continue
+            event = Uevent.parse_line(line)
+            if event is not None:
+                events.append(event)
+        return events or None
+
+    def close(self) -> None:
+        if self.f is not sys.stdin:
+            self.f.close()
+
+
+def open_uevent_source(spec: str = "auto", poll_interval: float = 2.0):
+    """
+    `spec` is "auto" (netlink, else polling), "netlink", "poll", "-" (uevent
+    lines on stdin) or the path of a file of uevent lines.
+    """
+    if spec in ("auto", "netlink"):
+        try:
+            return NetlinkUeventSource()
+        except (OSError, AttributeError) as e:
+            if spec == "netlink":
+                raise
+            print(f"Warning: netlink uevents are unavailable ({e}); polling every {poll_interval:g}s", flush=True)
+        return PollUeventSource(poll_interval)
+    if spec == "poll":
+        return PollUeventSource(poll_interval)
+    if spec == "-":
+        return FileUeventSource(sys.stdin)
+    return FileUeventSource(open(spec, "r"))
+
+
+def _find_container(path: str) -> Optional[str]:
+    while path and path != "/":
+        if pci_container_pattern.match(os.path.basename(path)):
+            return path
+        path = os.path.dirname(path)
+    return None
+
+
+def _get_root(node: PcieNode) -> PcieNode:
+    while node.parent is not None:
+        node = node.parent
+    return node
+
+
+class TopologyWatcher:
+    """
+    Holds every discovered tree (with synthetic multifunction nodes) and
+    patches them in place. `render(numa_key, roots)` is called for every
+    NUMA group whose trees changed, with that group's visible roots.
+    """
+
+    def __init__(
+        self,
+        roots: List[PcieNode],
+        render: Callable[[str, List[PcieNode]], None],
+        node_filter=None,
+        sysfs_root: str = "/sys",
+    ) -> None:
+        self.roots = roots
+        self.sysfs_root = sysfs_root
+        self.render = render
+        self.node_filter = node_filter
+        self.nodes: Dict[str, PcieNode] = {}  # sysfs path -> node
+        self._index(roots)
+
+    def _index(self, roots: List[PcieNode]) -> None:
+        for node in iter_tree(roots):
+            if node.bdf is not None:
+                self.nodes[node.path] = node
+
+    def _unindex(self, roots: List[PcieNode]) -> None:
+        for node in iter_tree(roots):
+            if self.nodes.get(node.path) is node:
+                del self.nodes[node.path]
+
+    def _find_tracked_ancestor(self, path: str) -> Optional[PcieNode]:
+        """Closest tracked node strictly above `path` that still exists in sysfs."""
+        path = os.path.dirname(path)
+        while path and path != "/":
+            node = self.nodes.get(path)
+            if node is not None and os.path.isdir(path):
+                return node
+            path = os.path.dirname(path)
+        return None
+
+    def visible_roots(self) -> List[PcieNode]:
+        """The roots drawn by the CLI: childless roots dropped (unless all are), then filtered."""
+        roots = [r for r in self.roots if r.children] or self.roots
+        if self.node_filter is not None:
+            roots = self.node_filter.filter_trees(roots)
+        return roots
+
+    def numa_groups(self) -> Dict[str, List[PcieNode]]:
+        from pcie_topo_vis import group_by_numa
+        return group_by_numa(self.visible_roots())
+
+    def _rescan_node(self, node: PcieNode) -> None:
+        """Rebuilds the subtree below `node` from sysfs."""
+        from pcie_topo_vis import add_synth_mf_nodes
+        self._unindex(node.children)
+        node.children = explore_pcie_container(node.path)
+        add_synth_mf_nodes(node)
+        self._index(node.children)
+
+    def _rescan_container(self, container: str) -> None:
+        """Rebuilds the trees of the PCI container `container` (e.g., after a root port appeared)."""
+        from pcie_topo_vis import add_synth_mf_nodes
+        old = [r for r in self.roots if os.path.dirname(r.path) == container]
+        self._unindex(old)
+        new = explore_pcie_container(container)
+        for root in new:
+            add_synth_mf_nodes(root)
+        self._index(new)
+        position = self.roots.index(old[0]) if old else len(self.roots)
+        self.roots = [r for r in self.roots if r not in old]
+        self.roots[position:position] = new
+
+    def apply(self, events: List[Uevent]) -> Set[str]:
+        """Patches the trees for `events`. Returns the NUMA keys whose graphs changed."""
+        from pcie_topo_vis import get_numa_key
+
+        events = [e for e in events if e.subsystem in WATCHED_SUBSYSTEMS]
+        if not events:
+            return set()
+
+        before = {id(r): get_numa_key(r) for r in self.roots}
+        dirty_roots: List[PcieNode] = []
+        rescans: Dict[str, PcieNode] = {}  # path -> node whose subtree is rebuilt
+        containers: Set[str] = set()
+        identifiers_changed = False
+
+        for event in events:
+            path = self.sysfs_root + event.devpath
+            if event.subsystem != "pci":
+                # A netdev/RDMA/NVMe/DRM child of a device came or went.
+                identifiers_changed = True
+                owner = self._find_tracked_ancestor(path)
+                if owner is not None:
+                    dirty_roots.append(_get_root(owner))
+                continue
+
+            node = self.nodes.get(path)
+            if event.action == "change" and node is not None:
+                node.load()
+                dirty_roots.append(_get_root(node))
+                continue
+
+            identifiers_changed = True
+            ancestor = self._find_tracked_ancestor(path)
+            if ancestor is not None:
+                rescans[ancestor.path] = ancestor
+            else:
+                container = _find_container(path)
+                if container is not None:
+                    containers.add(container)
+
+        if identifiers_changed:
+            # New devices need fresh lspci records and identifier maps.
+            reset_lspci_snapshot()
+            from system_identifiers import get_system_resolver
+            get_system_resolver().refresh_sysfs(
+                refresh_sysfs_index(os.path.join(self.sysfs_root, "bus", "pci", "devices"))
+            )
+
+        # Rebuild only the outermost affected subtrees.
+        for path, node in sorted(rescans.items()):
+            if any(path.startswith(other + "/") for other in rescans) or _find_container(path) in containers:
+                continue
+            self._rescan_node(node)
+            dirty_roots.append(_get_root(node))
+        for container in sorted(containers):
+            self._rescan_container(container)
+
+        dirty = {get_numa_key(r) for r in dirty_roots}
+        after = {id(r): get_numa_key(r) for r in self.roots}
+
+        added_gpus = [
+            node for node in (self.nodes.get(self.sysfs_root + e.devpath) for e in events if e.action == "add")
+            if node is not None and (node.class_ or "").startswith(GPU_CLASS_PREFIXES)
+        ]
+        if added_gpus:
+            # GPU indices and NVLink connections only come from the vendor probes.
+            from system_identifiers import get_system_resolver, warn_probe_timeouts
+            resolver = get_system_resolver()
+            gpus = (resolver.gpu_to_pci, resolver.nvlink_connections)
+            resolver.refresh_gpus()
+            if resolver.probes is not None:
+                warn_probe_timeouts(resolver.probes)
+            if (resolver.gpu_to_pci, resolver.nvlink_connections) != gpus:
+                # NVLink edges may join GPUs in any graph.
+                dirty.update(after.values())
+        # Roots added or removed by container rescans.
+        dirty.update(key for root_id, key in before.items() if root_id not in after)
+        dirty.update(key for root_id, key in after.items() if root_id not in before)
+        return dirty
+
+    def run(self, source, debounce: float = DEBOUNCE_SECONDS) -> None:
+        """Handles events from `source` until it is closed or interrupted."""
+        try:
+            while True:
+                events = source.read(None)
+                if events is None:
+                    break
+                # Collect the rest of a burst (e.g., a switch and its children).
+                deadline = time.monotonic() + debounce
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    more = source.read(remaining)
+                    if not more:
+                        break
+                    events.extend(more)
+
+                dirty = self.apply(events)
+                if not dirty:
+                    continue
+                groups = self.numa_groups()
+                for numa_key in sorted(dirty, key=str):
+                    self.render(numa_key, groups.get(numa_key, []))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.close()